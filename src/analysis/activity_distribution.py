@@ -2,13 +2,14 @@ import os
 import csv
 from collections import defaultdict
 
+from src.storage.sqlite_store import read_video_rows, replace_video_rows
+
 # =========================
 # CONFIG
 # =========================
 INPUT_FILE = "data/processed/activity_ml_predictions.csv"
 OUTPUT_FILE = "data/processed/activity_distribution.csv"
 
-os.makedirs(os.path.dirname(OUTPUT_FILE), exist_ok=True)
 FIELDNAMES = [
     "video",
     "sitting_percent",
@@ -18,37 +19,28 @@ FIELDNAMES = [
 ]
 
 
+def _distribution_row(video, counts):
+    total = sum(counts.values())
+    return {
+        "video": video,
+        "sitting_percent": round((counts.get("sitting", 0) / total) * 100, 2),
+        "walking_percent": round((counts.get("walking", 0) / total) * 100, 2),
+        "high_activity_percent": round((counts.get("high_activity", 0) / total) * 100, 2),
+        "dominant_activity": max(counts, key=counts.get),
+    }
+
+
 def compute_activity_distribution(input_file=INPUT_FILE, output_file=OUTPUT_FILE):
     activity_counts = defaultdict(lambda: defaultdict(int))
-    total_counts = defaultdict(int)
 
     with open(input_file, newline="", encoding="utf-8") as f:
         reader = csv.DictReader(f)
         for row in reader:
-            video = row["video"]
-            activity = row["predicted_activity"]
-            activity_counts[video][activity] += 1
-            total_counts[video] += 1
-
-    rows = []
-    for video in activity_counts:
-        total = total_counts[video]
-        sitting_pct = round((activity_counts[video].get("sitting", 0) / total) * 100, 2)
-        walking_pct = round((activity_counts[video].get("walking", 0) / total) * 100, 2)
-        high_pct = round((activity_counts[video].get("high_activity", 0) / total) * 100, 2)
-        dominant_activity = max(activity_counts[video], key=activity_counts[video].get)
-
-        rows.append(
-            {
-                "video": video,
-                "sitting_percent": sitting_pct,
-                "walking_percent": walking_pct,
-                "high_activity_percent": high_pct,
-                "dominant_activity": dominant_activity,
-            }
-        )
+            activity_counts[row["video"]][row["predicted_activity"]] += 1
 
+    rows = [_distribution_row(video, counts) for video, counts in activity_counts.items()]
     rows = sorted(rows, key=lambda x: x["video"])
+    os.makedirs(os.path.dirname(output_file), exist_ok=True)
     with open(output_file, "w", newline="", encoding="utf-8") as f:
         writer = csv.DictWriter(f, fieldnames=FIELDNAMES)
         writer.writeheader()
@@ -56,6 +48,15 @@ def compute_activity_distribution(input_file=INPUT_FILE, output_file=OUTPUT_FILE
     return output_file
 
 
+def upsert_activity_distribution_for_video(video_name, db_path):
+    counts = defaultdict(int)
+    for row in read_video_rows("activity_ml_predictions", video_name, db_path=db_path):
+        counts[row["predicted_activity"]] += 1
+    rows = [_distribution_row(video_name, counts)] if counts else []
+    replace_video_rows("activity_distribution", video_name, rows, db_path=db_path)
+    return db_path
+
+
 if __name__ == "__main__":
     compute_activity_distribution()
     print("Activity distribution analysis complete.")
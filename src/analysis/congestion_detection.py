@@ -1,11 +1,15 @@
 import os
 import csv
 
+from src.storage.sqlite_store import replace_video_rows
+
 # =========================
 # CONFIG (EDITABLE)
 # =========================
 PEOPLE_THRESHOLD = 7      # congestion if >= 10 people
 DURATION_THRESHOLD = 10    # for at least 10 consecutive seconds
+EXIT_THRESHOLD = None      # stay congested while >= this (None: same as PEOPLE_THRESHOLD)
+GAP_TOLERANCE = 0          # seconds below EXIT_THRESHOLD tolerated inside a window
 
 INPUT_DIR = "data/processed/people_per_second"
 OUTPUT_FILE = "data/processed/congestion_windows.csv"
@@ -13,60 +17,143 @@ OUTPUT_FILE = "data/processed/congestion_windows.csv"
 FIELDNAMES = ["video", "start_second", "end_second", "duration_seconds", "max_people"]
 
 
-def detect_congestion_windows_for_video(
-    people_csv_path,
-    video_name,
-    people_threshold=PEOPLE_THRESHOLD,
-    duration_threshold=DURATION_THRESHOLD,
-):
+class CongestionDetector:
+    """Incremental congestion state machine fed one per-second count at a time.
+
+    A window starts at a count ``>= enter_threshold`` and continues while counts
+    stay ``>= exit_threshold`` (hysteresis), tolerating up to ``gap_tolerance``
+    consecutive seconds below it. It is reported once it has lasted
+    ``min_duration`` seconds.
+
+    ``update`` returns the events the new second triggered: an ``"open"``
+    event as soon as a window reaches ``min_duration`` and a ``"close"`` event
+    (carrying the finished window row) ``gap_tolerance + 1`` seconds after its
+    last congested second. Closed windows are also collected in ``windows``.
+
+    With the default exit threshold and no gap tolerance the windows match the
+    original batch detection: rows are counted as consecutive even if seconds
+    are missing, and a window ends one second before the first row that broke it.
+    """
+
+    def __init__(
+        self,
+        video_name,
+        enter_threshold=PEOPLE_THRESHOLD,
+        min_duration=DURATION_THRESHOLD,
+        exit_threshold=EXIT_THRESHOLD,
+        gap_tolerance=GAP_TOLERANCE,
+    ):
+        if exit_threshold is None:
+            exit_threshold = enter_threshold
+        if exit_threshold > enter_threshold:
+            raise ValueError("exit_threshold must not be above enter_threshold")
+        self.video_name = video_name
+        self.enter_threshold = enter_threshold
+        self.exit_threshold = exit_threshold
+        self.min_duration = min_duration
+        self.gap_tolerance = gap_tolerance
+        self.windows = []
+        self.last_second = None
+        self._reset()
+
+    def _reset(self):
+        self.start_second = None
+        self.opened = False
+        self._rows = 0
+        self._max_people = 0
+        self._gap_rows = 0
+        self._gap_start = None
+
+    def update(self, second, people_count):
+        events = []
+        self.last_second = second
+        if self.start_second is None:
+            if people_count >= self.enter_threshold:
+                self.start_second = second
+                self._rows = 1
+                self._max_people = people_count
+                self._maybe_open(second, events)
+            return events
+
+        if people_count >= self.exit_threshold:
+            # Tolerated gap rows become part of the window.
+            self._rows += self._gap_rows + 1
+            self._gap_rows = 0
+            self._max_people = max(self._max_people, people_count)
+            self._maybe_open(second, events)
+            return events
+
+        if self._gap_rows == 0:
+            self._gap_start = second
+        self._gap_rows += 1
+        if self._gap_rows > self.gap_tolerance:
+            self._close(self._gap_start - 1, second, events)
+        return events
+
+    def finish(self):
+        """Close the window still in progress when the stream ends."""
+        events = []
+        if self.start_second is not None:
+            end_second = self._gap_start - 1 if self._gap_rows else self.last_second
+            self._close(end_second, self.last_second, events)
+        return events
+
+    def _maybe_open(self, second, events):
+        if not self.opened and self._rows >= self.min_duration:
+            self.opened = True
+            events.append(
+                {
+                    "event": "open",
+                    "video": self.video_name,
+                    "start_second": self.start_second,
+                    "second": second,
+                    "max_people": self._max_people,
+                }
+            )
+
+    def _close(self, end_second, second, events):
+        if self.opened:
+            window = {
+                "video": self.video_name,
+                "start_second": self.start_second,
+                "end_second": end_second,
+                "duration_seconds": self._rows,
+                "max_people": self._max_people,
+            }
+            self.windows.append(window)
+            events.append({"event": "close", "second": second, **window})
+        self._reset()
+
+
+def _read_people_counts(people_csv_path):
     seconds_data = {}
     with open(people_csv_path, newline="", encoding="utf-8") as f:
         reader = csv.DictReader(f)
         for row in reader:
             seconds_data[int(row["second"])] = int(row["people_count"])
+    return sorted(seconds_data.items())
 
-    sorted_seconds = sorted(seconds_data.keys())
-    windows = []
-    current_start = None
-    consecutive_count = 0
-    max_people_in_window = 0
-
-    for sec in sorted_seconds:
-        people = seconds_data[sec]
-        if people >= people_threshold:
-            if current_start is None:
-                current_start = sec
-                consecutive_count = 1
-                max_people_in_window = people
-            else:
-                consecutive_count += 1
-                max_people_in_window = max(max_people_in_window, people)
-        else:
-            if consecutive_count >= duration_threshold:
-                windows.append(
-                    {
-                        "video": video_name,
-                        "start_second": current_start,
-                        "end_second": sec - 1,
-                        "duration_seconds": consecutive_count,
-                        "max_people": max_people_in_window,
-                    }
-                )
-            current_start = None
-            consecutive_count = 0
-            max_people_in_window = 0
-
-    if sorted_seconds and consecutive_count >= duration_threshold:
-        windows.append(
-            {
-                "video": video_name,
-                "start_second": current_start,
-                "end_second": sorted_seconds[-1],
-                "duration_seconds": consecutive_count,
-                "max_people": max_people_in_window,
-            }
-        )
-    return windows
+
+def detect_congestion_windows_for_video(
+    people_csv_path,
+    video_name,
+    people_threshold=PEOPLE_THRESHOLD,
+    duration_threshold=DURATION_THRESHOLD,
+    exit_threshold=EXIT_THRESHOLD,
+    gap_tolerance=GAP_TOLERANCE,
+):
+    # Batch mode of the live detector, so saved windows match live alerts.
+    detector = CongestionDetector(
+        video_name,
+        enter_threshold=people_threshold,
+        min_duration=duration_threshold,
+        exit_threshold=exit_threshold,
+        gap_tolerance=gap_tolerance,
+    )
+    for second, people in _read_people_counts(people_csv_path):
+        detector.update(second, people)
+    detector.finish()
+    return detector.windows
 
 
 def detect_congestion_all_videos(
@@ -74,6 +161,8 @@ def detect_congestion_all_videos(
     output_file=OUTPUT_FILE,
     people_threshold=PEOPLE_THRESHOLD,
     duration_threshold=DURATION_THRESHOLD,
+    exit_threshold=EXIT_THRESHOLD,
+    gap_tolerance=GAP_TOLERANCE,
 ):
     os.makedirs(os.path.dirname(output_file), exist_ok=True)
     all_windows = []
@@ -88,6 +177,8 @@ def detect_congestion_all_videos(
                 video_name,
                 people_threshold=people_threshold,
                 duration_threshold=duration_threshold,
+                exit_threshold=exit_threshold,
+                gap_tolerance=gap_tolerance,
             )
         )
     _write_windows(all_windows, output_file)
@@ -100,11 +191,26 @@ def upsert_congestion_for_video(
     output_file=OUTPUT_FILE,
     people_threshold=PEOPLE_THRESHOLD,
     duration_threshold=DURATION_THRESHOLD,
+    exit_threshold=EXIT_THRESHOLD,
+    gap_tolerance=GAP_TOLERANCE,
+    db_path=None,
 ):
     people_csv = os.path.join(input_dir, f"{video_name}_people.csv")
     if not os.path.exists(people_csv):
         return output_file
 
+    if db_path is not None:
+        windows = detect_congestion_windows_for_video(
+            people_csv,
+            video_name,
+            people_threshold=people_threshold,
+            duration_threshold=duration_threshold,
+            exit_threshold=exit_threshold,
+            gap_tolerance=gap_tolerance,
+        )
+        replace_video_rows("congestion_windows", video_name, windows, db_path=db_path)
+        return db_path
+
     existing = []
     if os.path.exists(output_file):
         with open(output_file, newline="", encoding="utf-8") as f:
@@ -127,6 +233,8 @@ def upsert_congestion_for_video(
             video_name,
             people_threshold=people_threshold,
             duration_threshold=duration_threshold,
+            exit_threshold=exit_threshold,
+            gap_tolerance=gap_tolerance,
         )
     )
     _write_windows(existing, output_file)
@@ -0,0 +1,135 @@
+import argparse
+import csv
+import os
+
+import numpy as np
+
+INPUT_DIR = "data/processed/people_per_second"
+# Default grid for threshold-sensitivity curves.
+PEOPLE_THRESHOLDS = tuple(range(1, 21))
+DURATION_THRESHOLDS = (1, 5, 10, 15, 20, 30, 60, 120)
+
+
+def load_people_counts(people_csv):
+    """Per-second people counts sorted by second; a repeated second keeps its last row."""
+    seconds = []
+    counts = []
+    with open(people_csv, newline="", encoding="utf-8") as f:
+        for row in csv.DictReader(f):
+            seconds.append(int(row["second"]))
+            counts.append(int(row["people_count"]))
+    seconds = np.asarray(seconds, dtype=np.int64)
+    counts = np.asarray(counts, dtype=np.int64)
+    # np.unique keeps the first occurrence, so look it up on the reversed arrays.
+    unique_seconds, last = np.unique(seconds[::-1], return_index=True)
+    return unique_seconds, counts[::-1][last]
+
+
+def congestion_runs(seconds, counts, people_thresholds):
+    """Runs of consecutive seconds with ``counts >= threshold``, for every threshold at once.
+
+    ``seconds`` is sorted and unique, as from ``load_people_counts``; a jump
+    of more than one second between rows breaks a run. Returns
+    ``(threshold_index, start, end)`` arrays; ``start`` and ``end`` are row
+    positions with ``end`` exclusive.
+    """
+    thresholds = np.asarray(people_thresholds, dtype=np.int64)
+    above = counts[np.newaxis, :] >= thresholds[:, np.newaxis]
+    gap_after = np.zeros(len(seconds), dtype=bool)
+    gap_after[:-1] = np.diff(seconds) > 1
+    gap_before = np.roll(gap_after, 1)
+    prev_above = np.pad(above, ((0, 0), (1, 0)))[:, :-1]
+    next_above = np.pad(above, ((0, 0), (0, 1)))[:, 1:]
+    # Run starts and ends come out of nonzero in the same row-major order,
+    # so the i-th start pairs with the i-th end.
+    threshold_index, start = np.nonzero(above & (~prev_above | gap_before))
+    _, last = np.nonzero(above & (~next_above | gap_after))
+    return threshold_index, start, last + 1
+
+
+def threshold_sensitivity(
+    seconds,
+    counts,
+    people_thresholds=PEOPLE_THRESHOLDS,
+    duration_thresholds=DURATION_THRESHOLDS,
+):
+    """Window count and congested seconds for every (people, duration) threshold pair.
+
+    Returns two ``(len(people_thresholds), len(duration_thresholds))`` integer
+    arrays computed from a single run-length pass over ``counts``. Run
+    lengths are measured on ``seconds``, so sparser rows are not mistaken
+    for shorter windows.
+    """
+    durations = np.asarray(duration_thresholds, dtype=np.int64)
+    order = np.argsort(durations, kind="stable")
+    threshold_index, start, end = congestion_runs(seconds, counts, people_thresholds)
+    lengths = seconds[end - 1] - seconds[start] + 1
+
+    # A run of length L is a window for every duration threshold <= L; with
+    # thresholds sorted that is a prefix, so histogram the prefix length and
+    # take a reverse cumulative sum.
+    qualifying = np.searchsorted(durations[order], lengths, side="right")
+    shape = (len(people_thresholds), len(durations) + 1)
+    window_hist = np.zeros(shape, dtype=np.int64)
+    seconds_hist = np.zeros(shape, dtype=np.int64)
+    np.add.at(window_hist, (threshold_index, qualifying), 1)
+    np.add.at(seconds_hist, (threshold_index, qualifying), lengths)
+
+    windows = np.cumsum(window_hist[:, ::-1], axis=1)[:, ::-1][:, 1:]
+    congested = np.cumsum(seconds_hist[:, ::-1], axis=1)[:, ::-1][:, 1:]
+    inverse = np.argsort(order)
+    return windows[:, inverse], congested[:, inverse]
+
+
+def sensitivity_rows(
+    seconds,
+    counts,
+    people_thresholds=PEOPLE_THRESHOLDS,
+    duration_thresholds=DURATION_THRESHOLDS,
+):
+    windows, congested = threshold_sensitivity(seconds, counts, people_thresholds, duration_thresholds)
+    return [
+        {
+            "people_threshold": int(people),
+            "duration_threshold": int(duration),
+            "windows": int(windows[i, j]),
+            "congested_seconds": int(congested[i, j]),
+        }
+        for i, people in enumerate(people_thresholds)
+        for j, duration in enumerate(duration_thresholds)
+    ]
+
+
+def sensitivity_all_videos(
+    input_dir=INPUT_DIR,
+    people_thresholds=PEOPLE_THRESHOLDS,
+    duration_thresholds=DURATION_THRESHOLDS,
+):
+    """Sum window counts and congested seconds over every people CSV, reading each file once."""
+    shape = (len(people_thresholds), len(duration_thresholds))
+    windows = np.zeros(shape, dtype=np.int64)
+    congested = np.zeros(shape, dtype=np.int64)
+    for file_name in sorted(os.listdir(input_dir)):
+        if not file_name.endswith("_people.csv"):
+            continue
+        seconds, counts = load_people_counts(os.path.join(input_dir, file_name))
+        video_windows, video_congested = threshold_sensitivity(
+            seconds, counts, people_thresholds, duration_thresholds
+        )
+        windows += video_windows
+        congested += video_congested
+    return windows, congested
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Congestion window counts for a grid of thresholds.")
+    parser.add_argument("--input-dir", default=INPUT_DIR)
+    parser.add_argument("--people", type=int, nargs="+", default=list(PEOPLE_THRESHOLDS))
+    parser.add_argument("--durations", type=int, nargs="+", default=list(DURATION_THRESHOLDS))
+    args = parser.parse_args()
+
+    windows, congested = sensitivity_all_videos(args.input_dir, args.people, args.durations)
+    print("people,duration,windows,congested_seconds")
+    for i, people in enumerate(args.people):
+        for j, duration in enumerate(args.durations):
+            print(f"{people},{duration},{windows[i, j]},{congested[i, j]}")
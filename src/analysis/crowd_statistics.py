@@ -1,6 +1,8 @@
 import os
 import csv
 
+from src.storage.sqlite_store import replace_video_rows
+
 INPUT_DIR = "data/processed/people_per_second"
 OUTPUT_FILE = "data/processed/crowd_statistics.csv"
 
@@ -56,12 +58,17 @@ def upsert_crowd_statistics_for_video(
     video_name,
     input_dir=INPUT_DIR,
     output_file=OUTPUT_FILE,
+    db_path=None,
 ):
     target_file = os.path.join(input_dir, f"{video_name}_people.csv")
     if not os.path.exists(target_file):
         return output_file
 
     new_stat = _stats_for_people_csv(target_file, video_name)
+    if db_path is not None:
+        replace_video_rows("crowd_statistics", video_name, [new_stat] if new_stat else [], db_path=db_path)
+        return db_path
+
     existing = []
     if os.path.exists(output_file):
         with open(output_file, newline="", encoding="utf-8") as f:
@@ -1,8 +1,7 @@
-import joblib
-import pandas as pd
-import matplotlib.pyplot as plt
 import os
 
+from src.ml_pipeline.model_registry import get_activity_model
+
 # =========================
 # CONFIG
 # =========================
@@ -10,14 +9,16 @@ MODEL_PATH = "models/activity_rf_model.pkl"
 DATA_PATH = "data/processed/master_labeled.csv"
 OUTPUT_IMAGE = "data/processed/feature_importance.png"
 
-os.makedirs(os.path.dirname(OUTPUT_IMAGE), exist_ok=True)
 
 def generate_feature_importance_plot(
     model_path=MODEL_PATH,
     data_path=DATA_PATH,
     output_image=OUTPUT_IMAGE,
 ):
-    model = joblib.load(model_path)
+    import matplotlib.pyplot as plt
+    import pandas as pd
+
+    model = get_activity_model(model_path)
     df = pd.read_csv(data_path)
     feature_columns = ["avg_motion_ratio", "motion_std", "people_count"]
     _ = df[feature_columns]
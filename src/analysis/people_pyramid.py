@@ -0,0 +1,117 @@
+import argparse
+import csv
+import os
+
+import numpy as np
+
+INPUT_DIR = "data/processed/people_per_second"
+OUTPUT_DIR = "data/processed/people_pyramid"
+# Bucket sizes in seconds: raw, 10 s, 1 min and 10 min.
+PYRAMID_LEVELS = (1, 10, 60, 600)
+FIELDS = ("start", "min", "max", "mean")
+# Roughly one point per horizontal pixel of the dashboard chart.
+MAX_CHART_POINTS = 1500
+
+
+def pyramid_path(output_dir, video_name):
+    return os.path.join(output_dir, f"{video_name}_pyramid.npz")
+
+
+def read_people_series(people_csv):
+    seconds = []
+    counts = []
+    with open(people_csv, newline="", encoding="utf-8") as f:
+        for row in csv.DictReader(f):
+            seconds.append(int(row["second"]))
+            counts.append(int(row["people_count"]))
+    return np.asarray(seconds, dtype=np.int64), np.asarray(counts, dtype=np.float64)
+
+
+def build_pyramid(seconds, counts, levels=PYRAMID_LEVELS):
+    """Return ``{level: {"start", "min", "max", "mean"}}`` with one entry per non-empty bucket."""
+    order = np.argsort(seconds, kind="stable")
+    seconds = seconds[order]
+    counts = counts[order]
+
+    pyramid = {}
+    for level in levels:
+        buckets = seconds // level
+        if len(buckets):
+            starts = np.flatnonzero(np.r_[True, buckets[1:] != buckets[:-1]])
+            sums = np.add.reduceat(counts, starts)
+            sizes = np.diff(np.r_[starts, len(counts)])
+            pyramid[level] = {
+                "start": buckets[starts] * level,
+                "min": np.minimum.reduceat(counts, starts),
+                "max": np.maximum.reduceat(counts, starts),
+                "mean": sums / sizes,
+            }
+        else:
+            pyramid[level] = {field: np.zeros(0) for field in FIELDS}
+    return pyramid
+
+
+def save_pyramid(pyramid, path):
+    os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+    arrays = {
+        f"l{level}_{field}": values
+        for level, columns in pyramid.items()
+        for field, values in columns.items()
+    }
+    tmp_path = f"{path}.tmp.npz"
+    np.savez(tmp_path, **arrays)
+    os.replace(tmp_path, path)
+    return path
+
+
+def load_pyramid(path):
+    pyramid = {}
+    with np.load(path) as data:
+        for key in data.files:
+            level, field = key[1:].split("_", 1)
+            pyramid.setdefault(int(level), {})[field] = data[key]
+    return pyramid
+
+
+def build_people_pyramid(people_csv, output_path):
+    seconds, counts = read_people_series(people_csv)
+    return save_pyramid(build_pyramid(seconds, counts), output_path)
+
+
+def choose_level(span_seconds, max_points=MAX_CHART_POINTS, levels=PYRAMID_LEVELS):
+    """Pick the finest bucket size that keeps ``span_seconds`` within ``max_points``."""
+    for level in sorted(levels):
+        if span_seconds / level <= max_points:
+            return level
+    return max(levels)
+
+
+def pyramid_window(pyramid, level, start=None, end=None):
+    """Slice one level to the buckets overlapping ``[start, end]`` seconds."""
+    columns = pyramid[level]
+    bucket_starts = columns["start"]
+    lo = 0 if start is None else np.searchsorted(bucket_starts, start - level + 1, side="left")
+    hi = len(bucket_starts) if end is None else np.searchsorted(bucket_starts, end, side="right")
+    return {field: values[lo:hi] for field, values in columns.items()}
+
+
+def build_all_pyramids(input_dir=INPUT_DIR, output_dir=OUTPUT_DIR):
+    outputs = []
+    for file_name in sorted(os.listdir(input_dir)):
+        if not file_name.endswith("_people.csv"):
+            continue
+        video_name = file_name.replace("_people.csv", "")
+        outputs.append(
+            build_people_pyramid(os.path.join(input_dir, file_name), pyramid_path(output_dir, video_name))
+        )
+    return outputs
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Precompute downsampled people-count pyramids for the dashboard.")
+    parser.add_argument("--input-dir", default=INPUT_DIR)
+    parser.add_argument("--output-dir", default=OUTPUT_DIR)
+    args = parser.parse_args()
+
+    outputs = build_all_pyramids(args.input_dir, args.output_dir)
+    print(f"Built {len(outputs)} people pyramids.")
@@ -1,51 +1,61 @@
 import csv
 import os
-import matplotlib.pyplot as plt
 from collections import defaultdict
 
 INPUT_FILE = "data/processed/motion_aggregated.csv"
 OUTPUT_DIR = "data/processed/plots_motion_timeline"
 
-os.makedirs(OUTPUT_DIR, exist_ok=True)
 
-video_seconds = defaultdict(list)
-video_motion_ratio = defaultdict(list)
+def plot_motion_timelines(input_file=INPUT_FILE, output_dir=OUTPUT_DIR):
+    import matplotlib.pyplot as plt
 
-# LOAD DATA
-with open(INPUT_FILE, newline="", encoding="utf-8") as f:
-    reader = csv.DictReader(f)
-    for row in reader:
-        video = row["video"]
-        video_seconds[video].append(int(row["second"]))
-        video_motion_ratio[video].append(float(row["avg_motion_ratio"]))
+    os.makedirs(output_dir, exist_ok=True)
 
-#PLOT
-for video in video_seconds:
+    video_seconds = defaultdict(list)
+    video_motion_ratio = defaultdict(list)
 
-    seconds = video_seconds[video]
-    motion = video_motion_ratio[video]
+    # LOAD DATA
+    with open(input_file, newline="", encoding="utf-8") as f:
+        reader = csv.DictReader(f)
+        for row in reader:
+            video = row["video"]
+            video_seconds[video].append(int(row["second"]))
+            video_motion_ratio[video].append(float(row["avg_motion_ratio"]))
 
-    plt.figure(figsize=(12, 5))
+    #PLOT
+    output_paths = []
+    for video in video_seconds:
 
-    plt.plot(
-        seconds,
-        motion,
-        linewidth=1.5
-    )
+        seconds = video_seconds[video]
+        motion = video_motion_ratio[video]
 
-    plt.xlabel("Time (seconds)")
-    plt.ylabel("Average Motion Ratio")
-    plt.title(f"Motion Intensity Timeline — {video}")
-    plt.grid(alpha=0.3)
+        plt.figure(figsize=(12, 5))
 
-    plt.tight_layout()
+        plt.plot(
+            seconds,
+            motion,
+            linewidth=1.5
+        )
 
-    out_path = os.path.join(
-        OUTPUT_DIR,
-        f"{video}_motion_ratio.png"
-    )
+        plt.xlabel("Time (seconds)")
+        plt.ylabel("Average Motion Ratio")
+        plt.title(f"Motion Intensity Timeline — {video}")
+        plt.grid(alpha=0.3)
 
-    plt.savefig(out_path)
-    plt.close()
+        plt.tight_layout()
 
-print("Motion ratio timeline plots saved.")
\ No newline at end of file
+        out_path = os.path.join(
+            output_dir,
+            f"{video}_motion_ratio.png"
+        )
+
+        plt.savefig(out_path)
+        plt.close()
+        output_paths.append(out_path)
+
+    return output_paths
+
+
+if __name__ == "__main__":
+    plot_motion_timelines()
+    print("Motion ratio timeline plots saved.")
@@ -8,37 +8,45 @@ OUTPUT_FILE = "data/processed/activity_baseline.csv"
 LOW_THRESHOLD = 0.0015
 MEDIUM_THRESHOLD = 0.006
 
-os.makedirs(os.path.dirname(OUTPUT_FILE), exist_ok=True)
 
-with open(INPUT_FILE, newline="", encoding="utf-8") as f_in, \
-     open(OUTPUT_FILE, "w", newline="", encoding="utf-8") as f_out:
+def classify_ratio(ratio):
+    if ratio < LOW_THRESHOLD:
+        return "sitting"
+    if ratio < MEDIUM_THRESHOLD:
+        return "walking"
+    return "high_activity"   # playing/exercising combined for now
 
-    reader = csv.DictReader(f_in)
-    writer = csv.writer(f_out)
 
-    writer.writerow([
-        "video",
-        "second",
-        "avg_motion_ratio",
-        "activity"
-    ])
+def classify_baseline(input_file=INPUT_FILE, output_file=OUTPUT_FILE):
+    os.makedirs(os.path.dirname(output_file), exist_ok=True)
 
-    for row in reader:
-        ratio = float(row["avg_motion_ratio"])
+    with open(input_file, newline="", encoding="utf-8") as f_in, \
+         open(output_file, "w", newline="", encoding="utf-8") as f_out:
 
-        if ratio < LOW_THRESHOLD:
-            activity = "sitting"
-        elif ratio < MEDIUM_THRESHOLD:
-            activity = "walking"
-        else:
-            activity = "high_activity"   # playing/exercising combined for now
+        reader = csv.DictReader(f_in)
+        writer = csv.writer(f_out)
 
         writer.writerow([
-            row["video"],
-            row["second"],
-            ratio,
-            activity
+            "video",
+            "second",
+            "avg_motion_ratio",
+            "activity"
         ])
 
-print("Baseline activity classification complete.")
-print(f"Saved to {OUTPUT_FILE}")
\ No newline at end of file
+        for row in reader:
+            ratio = float(row["avg_motion_ratio"])
+
+            writer.writerow([
+                row["video"],
+                row["second"],
+                ratio,
+                classify_ratio(ratio)
+            ])
+
+    return output_file
+
+
+if __name__ == "__main__":
+    classify_baseline()
+    print("Baseline activity classification complete.")
+    print(f"Saved to {OUTPUT_FILE}")
@@ -0,0 +1,85 @@
+import argparse
+import os
+import shutil
+import tempfile
+import time
+
+import numpy as np
+
+from src.ml_pipeline.forest_engine import MODEL_FILE, export_forest, forest_path, load_forest
+from src.ml_pipeline.model_registry import PACKED_MAX_ROWS, get_activity_predictor
+from src.ml_pipeline.predict_activity import _predict
+
+
+def _timed(fn, *args):
+    start = time.perf_counter()
+    result = fn(*args)
+    return result, time.perf_counter() - start
+
+
+def synthetic_features(rows, seed=0):
+    rng = np.random.default_rng(seed)
+    return np.column_stack(
+        [
+            rng.exponential(0.01, rows),
+            rng.exponential(0.004, rows),
+            rng.integers(0, 15, rows),
+        ]
+    ).astype(np.float64)
+
+
+def benchmark_forest(model_file=MODEL_FILE, batch_sizes=(600, 3600, 43200)):
+    """Check the packed forest against sklearn and time loading and prediction for both.
+
+    ``registry_predict_s`` times the predictor ``get_activity_predictor``
+    picks for the batch (after a warm-up load); for batches above
+    ``PACKED_MAX_ROWS`` (such as a 12-hour upload of 43,200 rows)
+    ``registry_ok`` checks it is within 1.5x of sklearn.
+    """
+    import joblib
+    import pandas as pd
+
+    model, pickle_load_s = _timed(joblib.load, model_file)
+    work_dir = tempfile.mkdtemp(prefix="forest_")
+    registry_model = shutil.copy(model_file, os.path.join(work_dir, "model.pkl"))
+    packed_file = forest_path(registry_model)
+    export_forest(model, packed_file)
+    forest, packed_load_s = _timed(load_forest, packed_file)
+
+    report = [
+        {
+            "pickle_bytes": os.path.getsize(model_file),
+            "packed_bytes": os.path.getsize(packed_file),
+            "pickle_load_s": round(pickle_load_s, 4),
+            "packed_load_s": round(packed_load_s, 4),
+        }
+    ]
+    columns = list(getattr(model, "feature_names_in_", range(model.n_features_in_)))
+    for rows in batch_sizes:
+        features = synthetic_features(rows)
+        expected, sklearn_s = _timed(model.predict, pd.DataFrame(features, columns=columns))
+        predicted, packed_s = _timed(forest.predict, features)
+        predictor = get_activity_predictor(registry_model, rows=rows)
+        _predict(predictor, features[:1])
+        _, registry_s = _timed(_predict, predictor, features)
+        report.append(
+            {
+                "rows": rows,
+                "identical": bool(np.array_equal(expected, predicted)),
+                "sklearn_predict_s": round(sklearn_s, 4),
+                "packed_predict_s": round(packed_s, 4),
+                "registry_predict_s": round(registry_s, 4),
+                "registry_ok": rows <= PACKED_MAX_ROWS or registry_s <= 1.5 * sklearn_s,
+            }
+        )
+    return report
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Compare the packed NumPy forest with the sklearn pickle.")
+    parser.add_argument("--model", default=MODEL_FILE)
+    parser.add_argument("--rows", type=int, nargs="+", default=[600, 3600, 43200])
+    args = parser.parse_args()
+
+    for row in benchmark_forest(args.model, args.rows):
+        print(row)
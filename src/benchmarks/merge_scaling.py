@@ -0,0 +1,90 @@
+import argparse
+import csv
+import os
+import random
+import tempfile
+import time
+
+from src.preprocessing.aggregate_motion import FIELDNAMES as MOTION_FIELDNAMES
+from src.preprocessing.merge_motion_people import (
+    _load_motion_data,
+    _load_people_data,
+    build_master_dataset,
+    upsert_master_dataset_for_video,
+)
+
+
+def write_synthetic_archive(root, videos, seconds_per_video, seed=0):
+    rng = random.Random(seed)
+    people_dir = os.path.join(root, "people_per_second")
+    os.makedirs(people_dir, exist_ok=True)
+    motion_file = os.path.join(root, "motion_aggregated.csv")
+    names = [f"video_{i:05d}" for i in range(videos)]
+
+    with open(motion_file, "w", newline="", encoding="utf-8") as f:
+        writer = csv.DictWriter(f, fieldnames=MOTION_FIELDNAMES)
+        writer.writeheader()
+        for name in names:
+            for sec in range(seconds_per_video):
+                ratio = round(rng.random() * 0.02, 6)
+                writer.writerow(
+                    {
+                        "video": name,
+                        "second": sec,
+                        "avg_motion_ratio": ratio,
+                        "motion_std": round(ratio / 4, 6),
+                        "max_motion_ratio": ratio,
+                        "min_motion_ratio": ratio,
+                        "motion_range": 0.0,
+                    }
+                )
+
+    for name in names:
+        with open(os.path.join(people_dir, f"{name}_people.csv"), "w", newline="", encoding="utf-8") as f:
+            writer = csv.writer(f)
+            writer.writerow(["video", "second", "people_count"])
+            writer.writerows([name, sec, rng.randint(0, 12)] for sec in range(1, seconds_per_video))
+
+    return motion_file, people_dir, names
+
+
+def _timed(fn, *args, **kwargs):
+    start = time.perf_counter()
+    fn(*args, **kwargs)
+    return time.perf_counter() - start
+
+
+def benchmark_merge_scaling(archive_sizes=(10, 50, 200), seconds_per_video=600, repeats=3):
+    report = []
+    for videos in archive_sizes:
+        root = tempfile.mkdtemp(prefix="merge_scaling_")
+        motion_file, people_dir, names = write_synthetic_archive(root, videos, seconds_per_video)
+        master_file = os.path.join(root, "master_dataset.csv")
+        build_master_dataset(motion_file=motion_file, people_dir=people_dir, output_file=master_file)
+        target = names[len(names) // 2]
+        kwargs = {"motion_file": motion_file, "people_dir": people_dir, "output_file": master_file}
+
+        # The first upsert also builds the per-video byte-range indexes.
+        first = _timed(upsert_master_dataset_for_video, target, **kwargs)
+        steady = min(_timed(upsert_master_dataset_for_video, target, **kwargs) for _ in range(repeats))
+        full_load = _timed(_load_motion_data, motion_file) + _timed(_load_people_data, people_dir)
+        report.append(
+            {
+                "videos": videos,
+                "archive_rows": videos * seconds_per_video,
+                "first_upsert_s": round(first, 4),
+                "upsert_s": round(steady, 4),
+                "full_input_parse_s": round(full_load, 4),
+            }
+        )
+    return report
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Time a per-video master upsert as the archive grows.")
+    parser.add_argument("--sizes", type=int, nargs="+", default=[10, 50, 200])
+    parser.add_argument("--seconds-per-video", type=int, default=600)
+    args = parser.parse_args()
+
+    for row in benchmark_merge_scaling(args.sizes, args.seconds_per_video):
+        print(row)
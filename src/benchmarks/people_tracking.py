@@ -0,0 +1,67 @@
+import argparse
+import csv
+import os
+import tempfile
+import time
+
+from src.benchmarks.synthetic_video import write_synthetic_video
+from src.detection.people_tracker import TRACK_DETECT_EVERY_SECONDS, TRACK_SAMPLE_HZ, PeopleTracker
+from src.detection.yolo_people_detection import DEFAULT_MODEL_PATH, DEFAULT_SAMPLE_HZ, detect_people_in_video
+from src.ml_pipeline.model_registry import get_yolo_model
+
+
+def _counts(people_csv):
+    with open(people_csv, newline="", encoding="utf-8") as f:
+        return {int(row["second"]): int(row["people_count"]) for row in csv.DictReader(f)}
+
+
+def benchmark_tracking(
+    video_path,
+    model_path=DEFAULT_MODEL_PATH,
+    detect_every_seconds=TRACK_DETECT_EVERY_SECONDS,
+    track_hz=TRACK_SAMPLE_HZ,
+):
+    """Compare per-second YOLO with detect-and-track on time, inferences and per-second counts."""
+    model = get_yolo_model(model_path)
+    work_dir = tempfile.mkdtemp(prefix="tracking_")
+    full_csv = os.path.join(work_dir, "full_people.csv")
+    tracked_csv = os.path.join(work_dir, "tracked_people.csv")
+
+    start = time.perf_counter()
+    detect_people_in_video(video_path, full_csv, model, sample_hz=DEFAULT_SAMPLE_HZ)
+    full_s = time.perf_counter() - start
+
+    tracker = PeopleTracker(detect_every_seconds)
+    start = time.perf_counter()
+    detect_people_in_video(video_path, tracked_csv, model, sample_hz=track_hz, tracker=tracker)
+    tracked_s = time.perf_counter() - start
+
+    full = _counts(full_csv)
+    tracked = _counts(tracked_csv)
+    seconds = sorted(set(full) & set(tracked))
+    errors = [abs(full[second] - tracked[second]) for second in seconds]
+    stats = tracker.stats()
+    return {
+        "full_s": round(full_s, 3),
+        "full_inferences": len(full),
+        "tracked_s": round(tracked_s, 3),
+        "tracked_inferences": stats["inferences"],
+        "tracked_samples": stats["samples"],
+        "unique_tracks": stats["unique_tracks"],
+        "mean_abs_count_error": round(sum(errors) / len(errors), 3) if errors else 0.0,
+    }
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Compare per-second YOLO counting with detect-and-track.")
+    parser.add_argument("--video", default=None, help="Clip to use (default: a generated synthetic clip)")
+    parser.add_argument("--seconds", type=int, default=60)
+    parser.add_argument("--model", default=DEFAULT_MODEL_PATH)
+    parser.add_argument("--detect-every", type=int, default=TRACK_DETECT_EVERY_SECONDS)
+    parser.add_argument("--track-hz", type=float, default=TRACK_SAMPLE_HZ)
+    args = parser.parse_args()
+
+    video = args.video or write_synthetic_video(
+        os.path.join(tempfile.mkdtemp(prefix="tracking_"), "clip.mp4"), seconds=args.seconds
+    )
+    print(benchmark_tracking(video, args.model, args.detect_every, args.track_hz))
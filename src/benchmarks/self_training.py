@@ -0,0 +1,58 @@
+import argparse
+import os
+import tempfile
+import time
+
+import numpy as np
+import pandas as pd
+
+from src.ml_pipeline.train_activity_class import RESERVOIR_ROWS, train_activity_model
+
+LABELS = np.array(["sitting", "walking", "high_activity"])
+
+
+def synthetic_labeled(rows, seed=0):
+    rng = np.random.default_rng(seed)
+    motion = rng.exponential(0.01, rows)
+    return pd.DataFrame(
+        {
+            "video": [f"video_{i // 3600}" for i in range(rows)],
+            "second": np.arange(rows) % 3600,
+            "avg_motion_ratio": motion,
+            "motion_std": motion * rng.uniform(0.2, 0.6, rows),
+            "people_count": rng.integers(0, 15, rows),
+            "activity_label": LABELS[np.digitize(motion, [0.005, 0.02])],
+            "is_pseudo_label": (np.arange(rows) >= 3600).astype(int),
+        }
+    )
+
+
+def benchmark_self_training(sizes=(10000, 40000, 160000), max_rows=RESERVOIR_ROWS):
+    """Time full retraining against the bounded reservoir as the labeled set grows."""
+    work_dir = tempfile.mkdtemp(prefix="self_train_")
+    report = []
+    for rows in sizes:
+        labeled_file = os.path.join(work_dir, f"labeled_{rows}.csv")
+        synthetic_labeled(rows).to_csv(labeled_file, index=False)
+        timings = {}
+        for mode, limit in (("full", None), ("reservoir", max_rows)):
+            start = time.perf_counter()
+            result = train_activity_model(
+                input_file=labeled_file,
+                model_output=os.path.join(work_dir, f"model_{mode}.pkl"),
+                max_rows=limit,
+            )
+            timings[f"{mode}_s"] = round(time.perf_counter() - start, 2)
+            timings[f"{mode}_rows"] = result["training_rows"]
+        report.append({"labeled_rows": rows, **timings})
+    return report
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Compare full and reservoir retraining time for self-training.")
+    parser.add_argument("--sizes", type=int, nargs="+", default=[10000, 40000, 160000])
+    parser.add_argument("--max-rows", type=int, default=RESERVOIR_ROWS)
+    args = parser.parse_args()
+
+    for row in benchmark_self_training(args.sizes, args.max_rows):
+        print(row)
@@ -0,0 +1,54 @@
+import argparse
+import csv
+import os
+import tempfile
+
+from src.benchmarks.synthetic_video import write_synthetic_video
+from src.pipeline.sharded_analysis import DEFAULT_WARMUP_SECONDS, analyze_video_sharded
+from src.preprocessing.motion_analysis import analyze_motion_in_video
+
+
+def _read_motion(path):
+    with open(path, newline="", encoding="utf-8") as f:
+        return [(int(r["frame"]), int(r["second"]), float(r["motion_ratio"])) for r in csv.DictReader(f)]
+
+
+def compare_sharded_motion(video_path, shards=4, warmup_seconds=DEFAULT_WARMUP_SECONDS, work_dir=None):
+    work_dir = work_dir or tempfile.mkdtemp(prefix="sharding_parity_")
+    single_csv = os.path.join(work_dir, "single_motion.csv")
+    sharded_csv = os.path.join(work_dir, "sharded_motion.csv")
+
+    analyze_motion_in_video(video_path, single_csv)
+    analyze_video_sharded(video_path, motion_csv=sharded_csv, shards=shards, warmup_seconds=warmup_seconds)
+
+    single = _read_motion(single_csv)
+    sharded = _read_motion(sharded_csv)
+    if [row[:2] for row in single] != [row[:2] for row in sharded]:
+        raise AssertionError("Sharded output does not cover the same frames/seconds as a single pass.")
+
+    diffs = [abs(a[2] - b[2]) for a, b in zip(single, sharded)]
+    return {
+        "frames": len(single),
+        "shards": shards,
+        "warmup_seconds": warmup_seconds,
+        "max_abs_diff": max(diffs) if diffs else 0.0,
+        "mean_abs_diff": sum(diffs) / len(diffs) if diffs else 0.0,
+    }
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Compare sharded and single-pass motion output.")
+    parser.add_argument("--video", help="video to compare (defaults to a synthetic clip)")
+    parser.add_argument("--seconds", type=int, default=120)
+    parser.add_argument("--shards", type=int, default=4)
+    parser.add_argument("--warmup-seconds", type=float, default=DEFAULT_WARMUP_SECONDS)
+    parser.add_argument("--tolerance", type=float, default=0.005)
+    args = parser.parse_args()
+
+    work_dir = tempfile.mkdtemp(prefix="sharding_parity_")
+    video_path = args.video or write_synthetic_video(os.path.join(work_dir, "synthetic.mp4"), seconds=args.seconds)
+    report = compare_sharded_motion(video_path, args.shards, args.warmup_seconds, work_dir)
+    print(report)
+    if report["max_abs_diff"] > args.tolerance:
+        raise SystemExit(f"Motion ratio drift {report['max_abs_diff']} exceeds tolerance {args.tolerance}")
+    print("Sharded motion output matches the single-pass run.")
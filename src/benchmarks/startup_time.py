@@ -0,0 +1,88 @@
+import argparse
+import json
+import statistics
+import subprocess
+import sys
+from pathlib import Path
+
+PROJECT_ROOT = Path(__file__).resolve().parents[2]
+HEAVY_MODULES = ("numpy", "cv2", "pandas", "sklearn", "joblib", "matplotlib", "torch", "ultralytics", "streamlit")
+
+# The dashboard script cannot be imported outside `streamlit run`, so its
+# startup is measured as the imports at the top of src/dashboard/app.py.
+DASHBOARD_IMPORTS = (
+    "streamlit",
+    "pandas",
+    "src.analysis.people_pyramid",
+    "src.pipeline.job_queue",
+    "src.pipeline.video_workflow",
+)
+CLI_MODULES = (
+    "src.pipeline.backfill",
+    "src.pipeline.sharded_analysis",
+    "src.pipeline.live_ingest",
+    "src.detection.yolo_people_detection",
+    "src.detection.detection_store",
+    "src.preprocessing.motion_analysis",
+    "src.preprocessing.motion_store",
+    "src.preprocessing.aggregate_motion",
+    "src.preprocessing.merge_motion_people",
+    "src.ml_pipeline.train_activity_class",
+    "src.ml_pipeline.predict_activity",
+    "src.analysis.crowd_statistics",
+    "src.analysis.congestion_detection",
+    "src.analysis.congestion_engine",
+    "src.analysis.activity_distribution",
+    "src.analysis.feature_importance",
+    "src.analysis.people_pyramid",
+    "src.analysis.plots",
+    "src.analysis.activity_stats",
+    "src.baseline.threshold_classifier",
+    "src.storage.sqlite_store",
+)
+
+_PROBE = """
+import importlib, json, sys, time
+start = time.perf_counter()
+for name in sys.argv[1:]:
+    try:
+        importlib.import_module(name)
+    except ImportError:
+        pass
+elapsed = time.perf_counter() - start
+print(json.dumps({"seconds": elapsed, "loaded": [m for m in %r if m in sys.modules]}))
+""" % (HEAVY_MODULES,)
+
+
+def time_imports(modules, repeats=5):
+    """Import ``modules`` in fresh interpreters and return the median time and heavy libraries loaded."""
+    samples = []
+    loaded = []
+    for _ in range(repeats):
+        output = subprocess.run(
+            [sys.executable, "-c", _PROBE, *modules],
+            cwd=PROJECT_ROOT,
+            capture_output=True,
+            text=True,
+            check=True,
+        ).stdout
+        result = json.loads(output.strip().splitlines()[-1])
+        samples.append(result["seconds"])
+        loaded = result["loaded"]
+    return {"median_s": round(statistics.median(samples), 4), "heavy_loaded": loaded}
+
+
+def benchmark_startup(repeats=5):
+    report = [{"entry": "dashboard", **time_imports(DASHBOARD_IMPORTS, repeats)}]
+    for module in CLI_MODULES:
+        report.append({"entry": module, **time_imports((module,), repeats)})
+    return report
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Measure import-time startup of the dashboard and CLI entry points.")
+    parser.add_argument("--repeats", type=int, default=5)
+    args = parser.parse_args()
+
+    for row in benchmark_startup(args.repeats):
+        print(row)
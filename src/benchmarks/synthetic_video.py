@@ -0,0 +1,29 @@
+import cv2
+import numpy as np
+
+
+def write_synthetic_video(path, seconds=60, fps=25.0, size=(640, 360), walkers=3, seed=0):
+    """Write an mp4 with a noisy static background and rectangles crossing it.
+
+    The walkers give MOG2 real foreground to track, and a slow brightness
+    drift keeps the background model adapting across the whole clip.
+    """
+    width, height = size
+    rng = np.random.default_rng(seed)
+    background = rng.integers(60, 120, size=(height, width, 3), dtype=np.uint8)
+    speeds = rng.uniform(1.0, 4.0, size=walkers)
+    rows = rng.integers(0, height - 60, size=walkers)
+
+    writer = cv2.VideoWriter(str(path), cv2.VideoWriter_fourcc(*"mp4v"), fps, (width, height))
+    if not writer.isOpened():
+        raise RuntimeError(f"Could not create video: {path}")
+
+    for i in range(int(seconds * fps)):
+        frame = cv2.add(background, int(10 * np.sin(i / (fps * 7))) + 10)
+        for speed, row in zip(speeds, rows):
+            x = int(i * speed) % (width - 20)
+            cv2.rectangle(frame, (x, int(row)), (x + 20, int(row) + 60), (230, 230, 230), -1)
+        writer.write(frame)
+
+    writer.release()
+    return str(path)
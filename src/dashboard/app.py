@@ -1,8 +1,9 @@
+import io
 import os
 import sys
+import time
 from pathlib import Path
 
-import matplotlib.pyplot as plt
 import pandas as pd
 import streamlit as st
 
@@ -11,11 +12,18 @@ PROJECT_ROOT = Path(__file__).resolve().parents[2]
 if str(PROJECT_ROOT) not in sys.path:
     sys.path.insert(0, str(PROJECT_ROOT))
 
-from src.pipeline.video_workflow import (
-    run_analysis_for_video,
-    save_uploaded_video,
-    self_train_after_upload,
+from src.analysis.congestion_detection import DURATION_THRESHOLD, PEOPLE_THRESHOLD
+from src.analysis.people_pyramid import (
+    OUTPUT_DIR as PYRAMID_DIR,
+    build_pyramid,
+    choose_level,
+    load_pyramid,
+    pyramid_path,
+    pyramid_window,
+    read_people_series,
 )
+from src.pipeline.job_queue import JobQueue
+from src.pipeline.video_workflow import save_uploaded_video
 
 # =========================
 # CONFIG PATHS
@@ -25,19 +33,124 @@ CONGESTION_PATH = "data/processed/congestion_windows.csv"
 ACTIVITY_DIST_PATH = "data/processed/activity_distribution.csv"
 FEATURE_IMPORTANCE_IMG = "data/processed/feature_importance.png"
 PEOPLE_DIR = "data/processed/people_per_second"
+JOB_POLL_SECONDS = 2
+JOBS_SHOWN = 10
+CACHED_FILES = 64
+CACHED_CHARTS = 32
 
 st.set_page_config(layout="wide")
 st.title("Smart Park Monitoring System")
 st.caption("Upload a new park video, analyze it, and optionally self-train the model.")
 
 
-def safe_read_csv(path, required_columns=None):
-    if not os.path.exists(path):
-        return pd.DataFrame(columns=required_columns or [])
+def file_mtime(path):
+    try:
+        return os.stat(path).st_mtime_ns
+    except OSError:
+        return None
+
+
+# Reads and charts are cached per (path, mtime): reruns caused by widget
+# interaction reuse them, and a pipeline run that rewrites a file changes its
+# mtime, so the next rerun picks up the new outputs.
+@st.cache_data(max_entries=CACHED_FILES, show_spinner=False)
+def _read_csv_cached(path, mtime, required_columns):
+    if mtime is None:
+        return pd.DataFrame(columns=list(required_columns))
     try:
         return pd.read_csv(path)
     except Exception:
-        return pd.DataFrame(columns=required_columns or [])
+        return pd.DataFrame(columns=list(required_columns))
+
+
+def safe_read_csv(path, required_columns=None):
+    return _read_csv_cached(path, file_mtime(path), tuple(required_columns or []))
+
+
+def _figure_png(fig):
+    import matplotlib.pyplot as plt
+
+    buffer = io.BytesIO()
+    fig.savefig(buffer, format="png")
+    plt.close(fig)
+    return buffer.getvalue()
+
+
+@st.cache_data(max_entries=CACHED_FILES, show_spinner=False)
+def load_people_pyramid(video_name, pyramid_mtime, people_mtime):
+    if pyramid_mtime is not None:
+        return load_pyramid(pyramid_path(PYRAMID_DIR, video_name))
+    # Videos analysed before pyramids existed: build one in memory.
+    return build_pyramid(*read_people_series(os.path.join(PEOPLE_DIR, f"{video_name}_people.csv")))
+
+
+@st.cache_data(max_entries=CACHED_CHARTS, show_spinner=False)
+def crowd_chart_png(video_name, pyramid_mtime, people_mtime, level, start, end):
+    # At most MAX_CHART_POINTS buckets are drawn, whatever the video length.
+    import matplotlib.pyplot as plt
+
+    window = pyramid_window(load_people_pyramid(video_name, pyramid_mtime, people_mtime), level, start, end)
+    fig, ax = plt.subplots()
+    if level > 1:
+        ax.fill_between(window["start"], window["min"], window["max"], step="post", alpha=0.3, linewidth=0)
+        ax.step(window["start"], window["mean"], where="post", linewidth=2)
+    else:
+        ax.plot(window["start"], window["mean"], linewidth=2)
+    ax.set_xlim(start, end)
+    ax.set_xlabel("Second")
+    ax.set_ylabel("People Count")
+    ax.set_title("Crowd Density Over Time")
+    fig.set_size_inches(10, 3)
+    fig.tight_layout()
+    return _figure_png(fig)
+
+
+@st.cache_data(max_entries=CACHED_FILES, show_spinner=False)
+def congestion_sensitivity(video_name, people_mtime):
+    from src.analysis.congestion_engine import (
+        DURATION_THRESHOLDS,
+        PEOPLE_THRESHOLDS,
+        load_people_counts,
+        threshold_sensitivity,
+    )
+
+    seconds, counts = load_people_counts(os.path.join(PEOPLE_DIR, f"{video_name}_people.csv"))
+    windows, congested = threshold_sensitivity(seconds, counts, PEOPLE_THRESHOLDS, DURATION_THRESHOLDS)
+    return PEOPLE_THRESHOLDS, DURATION_THRESHOLDS, windows, congested
+
+
+@st.cache_data(max_entries=CACHED_CHARTS, show_spinner=False)
+def sensitivity_chart_png(video_name, people_mtime):
+    import matplotlib.pyplot as plt
+
+    people, durations, windows, congested = congestion_sensitivity(video_name, people_mtime)
+    fig, (ax_windows, ax_seconds) = plt.subplots(1, 2, sharex=True)
+    for j, duration in enumerate(durations):
+        ax_windows.plot(people, windows[:, j], label=f"{duration}s")
+        ax_seconds.plot(people, congested[:, j], label=f"{duration}s")
+    ax_windows.set_ylabel("Congestion windows")
+    ax_seconds.set_ylabel("Congested seconds")
+    for ax in (ax_windows, ax_seconds):
+        ax.set_xlabel("People threshold")
+    ax_seconds.legend(title="Min duration", fontsize="small")
+    fig.suptitle("Threshold Sensitivity")
+    fig.set_size_inches(10, 3.5)
+    fig.tight_layout()
+    return _figure_png(fig)
+
+
+@st.cache_data(max_entries=CACHED_CHARTS, show_spinner=False)
+def activity_pie_png(sitting, walking, high):
+    import matplotlib.pyplot as plt
+
+    labels = ["Sitting", "Walking", "High Activity"]
+    sizes = [sitting, walking, high]
+    fig, ax = plt.subplots()
+    ax.pie(sizes, labels=labels, autopct="%1.1f%%", startangle=90)
+    ax.set_title("Activity Breakdown")
+    fig.set_size_inches(5, 4)
+    fig.tight_layout()
+    return _figure_png(fig)
 
 
 def rerun_app():
@@ -47,6 +160,12 @@ def rerun_app():
         st.experimental_rerun()
 
 
+@st.cache_resource
+def get_job_queue():
+    # One worker pool per dashboard server, shared by every browser session.
+    return JobQueue()
+
+
 def load_dashboard_data():
     crowd_stats = safe_read_csv(
         CROWD_STATS_PATH,
@@ -93,26 +212,78 @@ def upload_and_analyze_ui():
 
         if uploaded_video is not None and (analyze_clicked or self_train_clicked):
             try:
-                with st.spinner("Saving, analyzing, and updating dataset..."):
-                    saved_path, saved_video_name = save_uploaded_video(uploaded_video)
-                    analysis_result = run_analysis_for_video(saved_path)
-                    st.success(
-                        f"Analysis completed for '{saved_video_name}'. "
-                        f"Added/updated {analysis_result['dataset_rows']} rows."
-                    )
-                    st.session_state["selected_video_after_upload"] = saved_video_name
-
-                    if self_train_clicked:
-                        train_result = self_train_after_upload(saved_video_name)
-                        if train_result["trained"]:
-                            st.success(
-                                f"Self-training complete. Added {train_result['rows_added']} pseudo-labeled rows."
-                            )
-                        else:
-                            st.warning(f"Self-training skipped: {train_result['reason']}")
-                rerun_app()
+                saved_path, saved_video_name = save_uploaded_video(uploaded_video)
+                get_job_queue().submit(saved_path, saved_video_name, self_train=self_train_clicked)
+                st.success(f"Queued '{saved_video_name}' for analysis.")
             except Exception as exc:
-                st.error(f"Upload analysis failed: {exc}")
+                st.error(f"Upload failed: {exc}")
+
+        render_jobs()
+
+
+def _job_label(job):
+    label = f"{job['video_name']}: {job['status']}"
+    if job["status"] == "running":
+        label += f" ({job['stage']}"
+        if job["stage"] == "frames" and job.get("frames_done"):
+            label += f", {job['frames_done']}/{job.get('total_frames') or '?'} frames"
+        label += ")"
+    return label
+
+
+def _render_jobs():
+    jobs = get_job_queue().list_jobs(limit=JOBS_SHOWN)
+    if not jobs:
+        return
+
+    st.subheader("Analysis Jobs")
+    seen_done = st.session_state.setdefault("finished_jobs", set())
+    session_started = st.session_state.setdefault("session_started", time.time())
+    newly_finished = False
+    for job in jobs:
+        if job["status"] in ("queued", "running"):
+            st.progress(float(job.get("progress", 0.0)), text=_job_label(job))
+            window = job.get("congestion_open")
+            if window is not None:
+                st.warning(
+                    f"{job['video_name']}: congestion since second {window['start_second']} "
+                    f"(reached {window['max_people']} people)."
+                )
+            continue
+
+        if job["status"] == "failed":
+            st.error(f"{job['video_name']}: analysis failed: {job.get('error')}")
+        else:
+            result = job.get("result") or {}
+            st.success(
+                f"Analysis completed for '{job['video_name']}'. "
+                f"Added/updated {result.get('dataset_rows', 0)} rows."
+            )
+            train_result = result.get("self_train")
+            if train_result is not None:
+                if train_result["trained"]:
+                    st.success(f"Self-training complete. Added {train_result['rows_added']} pseudo-labeled rows.")
+                else:
+                    st.warning(f"Self-training skipped: {train_result['reason']}")
+        if job["id"] not in seen_done:
+            seen_done.add(job["id"])
+            if job.get("finished_at", 0) >= session_started:
+                st.session_state["selected_video_after_upload"] = job["video_name"]
+                newly_finished = True
+
+    if newly_finished:
+        # Reload the dashboard tab with the new outputs.
+        rerun_app()
+    if any(job["status"] in ("queued", "running") for job in jobs) and not hasattr(st, "fragment"):
+        st.button("Refresh job status")
+
+
+# Poll job status in place where Streamlit supports fragments; otherwise the
+# list refreshes on the next interaction.
+if hasattr(st, "fragment"):
+    render_jobs = st.fragment(run_every=JOB_POLL_SECONDS)(_render_jobs)
+else:
+    render_jobs = _render_jobs
 
 
 def render_dashboard():
@@ -196,35 +367,38 @@ def render_dashboard():
 
     with tab2:
         st.subheader("Crowd Over Time")
-        people_file = os.path.join(PEOPLE_DIR, selected_video + "_people.csv")
-        if not os.path.exists(people_file):
+        people_mtime = file_mtime(os.path.join(PEOPLE_DIR, selected_video + "_people.csv"))
+        pyramid_mtime = file_mtime(pyramid_path(PYRAMID_DIR, selected_video))
+        raw_seconds = None
+        if people_mtime is not None or pyramid_mtime is not None:
+            raw_seconds = load_people_pyramid(selected_video, pyramid_mtime, people_mtime)[1]["start"]
+        if raw_seconds is None or len(raw_seconds) == 0:
             st.warning(f"People data not found for '{selected_video}'.")
         else:
-            people_df = pd.read_csv(people_file)
-            fig, ax = plt.subplots()
-            ax.plot(people_df["second"], people_df["people_count"], linewidth=2)
-            ax.set_xlabel("Second")
-            ax.set_ylabel("People Count")
-            ax.set_title("Crowd Density Over Time")
-            fig.set_size_inches(10, 3)
-            fig.tight_layout()
-            st.pyplot(fig, use_container_width=True)
-            plt.close(fig)
+            first, last = int(raw_seconds[0]), int(raw_seconds[-1])
+            start, end = first, last
+            if last > first:
+                start, end = st.slider(
+                    "Time range (seconds)",
+                    min_value=first,
+                    max_value=last,
+                    value=(first, last),
+                    key=f"crowd_range_{selected_video}",
+                )
+            level = choose_level(end - start + 1)
+            st.image(
+                crowd_chart_png(selected_video, pyramid_mtime, people_mtime, level, start, end),
+                use_container_width=True,
+            )
+            if level > 1:
+                st.caption(f"Mean per {level}-second bucket; the shaded band spans the bucket min to max.")
 
     with tab3:
         st.subheader("Activity Distribution")
         if not video_activity.empty:
-            labels = ["Sitting", "Walking", "High Activity"]
-            sizes = [sitting, walking, high]
-            fig, ax = plt.subplots()
-            ax.pie(sizes, labels=labels, autopct="%1.1f%%", startangle=90)
-            ax.set_title("Activity Breakdown")
-            fig.set_size_inches(5, 4)
-            fig.tight_layout()
             col1, col2, col3 = st.columns([1, 2, 1])
             with col2:
-                st.pyplot(fig)
-            plt.close(fig)
+                st.image(activity_pie_png(sitting, walking, high))
         else:
             st.write("No activity data available.")
 
@@ -236,6 +410,33 @@ def render_dashboard():
         else:
             st.write("No congestion detected.")
 
+        st.subheader("Threshold Sensitivity")
+        people_mtime = file_mtime(os.path.join(PEOPLE_DIR, selected_video + "_people.csv"))
+        if people_mtime is None:
+            st.warning(f"People data not found for '{selected_video}'.")
+        else:
+            people, durations, windows, congested = congestion_sensitivity(selected_video, people_mtime)
+            col1, col2 = st.columns(2)
+            people_threshold = col1.select_slider(
+                "People threshold",
+                options=list(people),
+                value=PEOPLE_THRESHOLD if PEOPLE_THRESHOLD in people else people[0],
+                key=f"congestion_people_{selected_video}",
+            )
+            duration_threshold = col2.select_slider(
+                "Minimum duration (seconds)",
+                options=list(durations),
+                value=DURATION_THRESHOLD if DURATION_THRESHOLD in durations else durations[0],
+                key=f"congestion_duration_{selected_video}",
+            )
+            i, j = people.index(people_threshold), durations.index(duration_threshold)
+            col1.metric("Windows", int(windows[i, j]))
+            col2.metric("Congested Seconds", int(congested[i, j]))
+            st.image(sensitivity_chart_png(selected_video, people_mtime), use_container_width=True)
+            st.caption(
+                f"Saved windows above use {PEOPLE_THRESHOLD} people for {DURATION_THRESHOLD} seconds."
+            )
+
     with tab5:
         st.subheader("Feature Importance")
         if os.path.exists(FEATURE_IMPORTANCE_IMG):
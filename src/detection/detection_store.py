@@ -0,0 +1,252 @@
+import argparse
+import csv
+import os
+
+import numpy as np
+
+from src.detection.motion_gate import SOURCE_DETECTED, SOURCE_INFERRED
+
+DETECTIONS_DIR = "data/processed/detections"
+PEOPLE_DIR = "data/processed/people_per_second"
+PERSON_CLASS_ID = 0
+# Detections are stored down to RAW_CONF so the counting cutoff can be raised
+# or lowered later; COUNT_CONF matches YOLO's default predict threshold, which
+# is what people_per_second was produced with.
+RAW_CONF = 0.1
+COUNT_CONF = 0.25
+# Classes YOLO is asked for when detections are stored. Person only keeps
+# the class filter of the plain counting run; add class ids here to re-count
+# other classes later, at the cost of slower inference and larger files.
+STORED_CLASSES = (PERSON_CLASS_ID,)
+
+# One row per box, stored column by column in an uncompressed .npz: about 16
+# bytes per box. Boxes are pixel coordinates of the resized analysis frame.
+# ``sample_frame``/``sample_second`` list every sampled frame, including those
+# without detections, so re-counting still emits zero-count seconds.
+# ``sample_source`` indexes SAMPLE_SOURCES: samples a MotionGate skipped are
+# stored as inferred, so re-counting can hold the last detected count over
+# them. ``mode`` records how the run sampled (see DETECTION_MODES); tracked
+# runs only store their YOLO keyframes, so they cannot be re-counted.
+COLUMN_DTYPES = {
+    "frame": "<u4",
+    "second": "<u4",
+    "cls": "<i2",
+    "conf": "<f2",
+    "xyxy": "<i2",
+    "sample_frame": "<u4",
+    "sample_second": "<u4",
+    "sample_source": "<u1",
+}
+SAMPLE_SOURCES = (SOURCE_DETECTED, SOURCE_INFERRED)
+MODE_DETECT = "detect"
+MODE_GATED = "gated"
+MODE_TRACKED = "tracked"
+DETECTION_MODES = (MODE_DETECT, MODE_GATED, MODE_TRACKED)
+
+
+def _to_numpy(values):
+    if hasattr(values, "cpu"):
+        values = values.cpu().numpy()
+    return np.asarray(values)
+
+
+def detections_npz_path(detections_dir, video_name):
+    return os.path.join(detections_dir, f"{video_name}_detections.npz")
+
+
+def detection_video_name(path):
+    name = os.path.basename(path)
+    suffix = "_detections.npz"
+    return name[: -len(suffix)] if name.endswith(suffix) else os.path.splitext(name)[0]
+
+
+class DetectionWriter:
+    """Collect the boxes of every sampled frame and save them as one columnar ``.npz`` file."""
+
+    def __init__(self, path, mode=MODE_DETECT):
+        if mode not in DETECTION_MODES:
+            raise ValueError(f"Unknown detection mode '{mode}', expected one of {DETECTION_MODES}")
+        self.path = path
+        self.mode = mode
+        self._samples = []
+        self._boxes = []
+
+    def add(self, frame_id, second, boxes, source=SOURCE_DETECTED):
+        self._samples.append((frame_id, second, SAMPLE_SOURCES.index(source)))
+        if boxes is None or len(boxes) == 0:
+            return
+        cls = _to_numpy(boxes.cls)
+        self._boxes.append(
+            (
+                np.full(len(cls), frame_id),
+                np.full(len(cls), second),
+                cls,
+                _to_numpy(boxes.conf),
+                np.rint(_to_numpy(boxes.xyxy)).reshape(-1, 4),
+            )
+        )
+
+    def close(self):
+        if self._samples is None:
+            return
+        columns = list(zip(*self._boxes)) if self._boxes else [[] for _ in range(5)]
+        arrays = {}
+        for name, parts in zip(("frame", "second", "cls", "conf", "xyxy"), columns):
+            arrays[name] = np.concatenate(parts) if parts else np.empty(0)
+        arrays["xyxy"] = arrays["xyxy"].reshape(-1, 4)
+        samples = np.asarray(self._samples).reshape(-1, 3)
+        arrays["sample_frame"] = samples[:, 0]
+        arrays["sample_second"] = samples[:, 1]
+        arrays["sample_source"] = samples[:, 2]
+
+        os.makedirs(os.path.dirname(self.path) or ".", exist_ok=True)
+        tmp_path = f"{self.path}.tmp.npz"
+        np.savez(
+            tmp_path,
+            mode=np.asarray(self.mode),
+            **{name: arrays[name].astype(dtype) for name, dtype in COLUMN_DTYPES.items()},
+        )
+        os.replace(tmp_path, self.path)
+        self._samples = None
+        self._boxes = None
+
+
+def load_detections(path):
+    with np.load(path) as data:
+        detections = {name: data[name] for name in COLUMN_DTYPES if name in data.files}
+        # Files from before sample sources were recorded only hold detected samples.
+        detections["mode"] = str(data["mode"]) if "mode" in data.files else MODE_DETECT
+    if "sample_source" not in detections:
+        detections["sample_source"] = np.zeros(len(detections["sample_frame"]), dtype=COLUMN_DTYPES["sample_source"])
+    return detections
+
+
+def _second_starts(sample_second):
+    return np.flatnonzero(np.r_[True, sample_second[1:] != sample_second[:-1]])
+
+
+def count_people_per_second(detections, classes=(PERSON_CLASS_ID,), min_conf=COUNT_CONF, zone=None):
+    """Count matching boxes per sampled frame and keep the peak per second.
+
+    ``zone`` is an optional ``(x1, y1, x2, y2)`` rectangle in analysis-frame
+    pixels; only boxes whose centre falls inside it are counted. Returns
+    ``(seconds, counts)`` arrays with one entry per sampled second. Samples a
+    MotionGate skipped take the count of the last detected sample, as in the
+    live run.
+    """
+    keep = np.isin(detections["cls"], classes) & (detections["conf"] >= np.float16(min_conf))
+    if zone is not None:
+        xyxy = detections["xyxy"].astype(np.int32)
+        cx = (xyxy[:, 0] + xyxy[:, 2]) / 2
+        cy = (xyxy[:, 1] + xyxy[:, 3]) / 2
+        keep &= (cx >= zone[0]) & (cx <= zone[2]) & (cy >= zone[1]) & (cy <= zone[3])
+
+    sample_frame = detections["sample_frame"]
+    sample_second = detections["sample_second"]
+    if len(sample_frame) == 0:
+        return sample_second, np.zeros(0, dtype=np.int64)
+
+    sample_index = np.searchsorted(sample_frame, detections["frame"][keep])
+    per_sample = np.bincount(sample_index, minlength=len(sample_frame))
+    inferred = detections["sample_source"] == SAMPLE_SOURCES.index(SOURCE_INFERRED)
+    if inferred.any():
+        held = np.maximum.accumulate(np.where(inferred, -1, np.arange(len(sample_frame))))
+        per_sample = np.where(held >= 0, per_sample[np.maximum(held, 0)], 0)
+    starts = _second_starts(sample_second)
+    return sample_second[starts], np.maximum.reduceat(per_sample, starts)
+
+
+def second_sources(detections):
+    """``detected`` for each sampled second with at least one YOLO sample, else ``inferred``."""
+    sample_second = detections["sample_second"]
+    if len(sample_second) == 0:
+        return []
+    detected = (detections["sample_source"] == SAMPLE_SOURCES.index(SOURCE_DETECTED)).astype(np.int8)
+    any_detected = np.maximum.reduceat(detected, _second_starts(sample_second))
+    return [SOURCE_DETECTED if flag else SOURCE_INFERRED for flag in any_detected]
+
+
+def recount_people_csv(
+    detections_file,
+    output_csv_path,
+    video_name=None,
+    classes=(PERSON_CLASS_ID,),
+    min_conf=COUNT_CONF,
+    zone=None,
+):
+    """Rebuild a people_per_second CSV from persisted detections without running YOLO.
+
+    Gated runs keep their ``source`` column. Tracked runs raise ``ValueError``:
+    the people counts between their keyframes came from the tracker.
+    """
+    if video_name is None:
+        video_name = detection_video_name(detections_file)
+    detections = load_detections(detections_file)
+    if detections["mode"] == MODE_TRACKED:
+        raise ValueError(f"{detections_file} is from a tracked run and only holds its YOLO keyframes.")
+    seconds, counts = count_people_per_second(detections, classes=classes, min_conf=min_conf, zone=zone)
+    header = ["video", "second", "people_count"]
+    columns = [[video_name] * len(seconds), seconds.tolist(), counts.tolist()]
+    if detections["mode"] == MODE_GATED:
+        header.append("source")
+        columns.append(second_sources(detections))
+    with open(output_csv_path, "w", newline="", encoding="utf-8") as f:
+        writer = csv.writer(f)
+        writer.writerow(header)
+        writer.writerows(zip(*columns))
+    return output_csv_path
+
+
+def recount_all(
+    detections_dir=DETECTIONS_DIR,
+    output_dir=PEOPLE_DIR,
+    classes=(PERSON_CLASS_ID,),
+    min_conf=COUNT_CONF,
+    zone=None,
+):
+    os.makedirs(output_dir, exist_ok=True)
+    outputs = []
+    for file_name in sorted(os.listdir(detections_dir)):
+        if not file_name.endswith("_detections.npz"):
+            continue
+        video_name = detection_video_name(file_name)
+        detections_file = os.path.join(detections_dir, file_name)
+        if load_detections(detections_file)["mode"] == MODE_TRACKED:
+            print(f"Skipping {file_name}: tracked runs cannot be re-counted.")
+            continue
+        outputs.append(
+            recount_people_csv(
+                detections_file,
+                os.path.join(output_dir, f"{video_name}_people.csv"),
+                video_name=video_name,
+                classes=classes,
+                min_conf=min_conf,
+                zone=zone,
+            )
+        )
+    return outputs
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Rebuild people_per_second CSVs from persisted detections.")
+    parser.add_argument("--detections-dir", default=DETECTIONS_DIR)
+    parser.add_argument("--output-dir", default=PEOPLE_DIR)
+    parser.add_argument(
+        "--classes",
+        type=int,
+        nargs="+",
+        default=[PERSON_CLASS_ID],
+        help=f"class ids to count; only {list(STORED_CLASSES)} are stored by default",
+    )
+    parser.add_argument("--min-conf", type=float, default=COUNT_CONF)
+    parser.add_argument("--zone", type=int, nargs=4, metavar=("X1", "Y1", "X2", "Y2"))
+    args = parser.parse_args()
+
+    outputs = recount_all(
+        args.detections_dir,
+        args.output_dir,
+        classes=args.classes,
+        min_conf=args.min_conf,
+        zone=args.zone,
+    )
+    print(f"Re-counted {len(outputs)} videos from persisted detections.")
@@ -0,0 +1,56 @@
+SOURCE_DETECTED = "detected"
+SOURCE_INFERRED = "inferred"
+# A sample is static when no frame since the previous sample had a MOG2
+# motion ratio at or above this.
+GATE_MOTION_THRESHOLD = 0.005
+# Longest a count is reused before YOLO is forced to run again.
+GATE_MAX_REUSE_SECONDS = 10
+
+
+class MotionGate:
+    """Decide per sampled frame whether YOLO must run or the last count can be reused.
+
+    ``MotionConsumer`` reports every frame's motion ratio through ``observe``;
+    it runs before ``PeopleConsumer`` on the same frame, so when the people
+    consumer asks ``should_detect`` the gate has seen all motion up to and
+    including the sampled frame. A sample is skipped only when the scene
+    stayed below ``motion_threshold`` since the previous sample and the last
+    real detection is less than ``max_reuse_seconds`` old. ``stats()``
+    reports how many YOLO inferences were run and saved.
+    """
+
+    def __init__(self, motion_threshold=GATE_MOTION_THRESHOLD, max_reuse_seconds=GATE_MAX_REUSE_SECONDS):
+        self.motion_threshold = motion_threshold
+        self.max_reuse_seconds = max_reuse_seconds
+        self.last_detection_second = None
+        self.inferences = 0
+        self.inferences_saved = 0
+        self._peak_motion = 0.0
+
+    def observe(self, motion_ratio):
+        if motion_ratio > self._peak_motion:
+            self._peak_motion = motion_ratio
+
+    def should_detect(self, second):
+        peak_motion = self._peak_motion
+        self._peak_motion = 0.0
+        detect = (
+            self.last_detection_second is None
+            or peak_motion >= self.motion_threshold
+            or second - self.last_detection_second >= self.max_reuse_seconds
+        )
+        if detect:
+            self.last_detection_second = second
+            self.inferences += 1
+        else:
+            self.inferences_saved += 1
+        return detect
+
+    def stats(self):
+        samples = self.inferences + self.inferences_saved
+        return {
+            "samples": samples,
+            "inferences": self.inferences,
+            "inferences_saved": self.inferences_saved,
+            "saved_percent": round(100.0 * self.inferences_saved / samples, 1) if samples else 0.0,
+        }
@@ -0,0 +1,175 @@
+import cv2
+import numpy as np
+
+from src.detection.detection_store import PERSON_CLASS_ID, _to_numpy
+
+# Full YOLO detection runs every TRACK_DETECT_EVERY_SECONDS; the sampled
+# frames in between (at TRACK_SAMPLE_HZ) only move the boxes with optical flow.
+TRACK_DETECT_EVERY_SECONDS = 5
+TRACK_SAMPLE_HZ = 5.0
+# A detection continues a track when their boxes overlap at least this much.
+TRACK_IOU_THRESHOLD = 0.3
+# Detections a track may go unmatched (YOLO missed it, or flow lost it) before
+# it is dropped; a re-matched track keeps its id, so it is not counted twice.
+TRACK_MAX_MISSED = 1
+# Each box is followed through a 3x3 grid of points; fewer surviving points
+# than this and the track is treated as lost until the next detection.
+MIN_FLOW_POINTS = 3
+_GRID = np.array([0.25, 0.5, 0.75], dtype=np.float32)
+_LK_PARAMS = {"winSize": (15, 15), "maxLevel": 2}
+
+
+def person_boxes(boxes, min_conf=None):
+    """``(n, 4)`` float32 xyxy array of the person boxes in a YOLO ``Boxes`` object."""
+    if boxes is None or len(boxes) == 0:
+        return np.empty((0, 4), dtype=np.float32)
+    keep = _to_numpy(boxes.cls) == PERSON_CLASS_ID
+    if min_conf is not None:
+        keep &= _to_numpy(boxes.conf) >= min_conf
+    return _to_numpy(boxes.xyxy).reshape(-1, 4)[keep].astype(np.float32)
+
+
+def iou_matrix(a, b):
+    """Pairwise intersection-over-union of two ``(n, 4)`` and ``(m, 4)`` xyxy arrays."""
+    x1 = np.maximum(a[:, None, 0], b[None, :, 0])
+    y1 = np.maximum(a[:, None, 1], b[None, :, 1])
+    x2 = np.minimum(a[:, None, 2], b[None, :, 2])
+    y2 = np.minimum(a[:, None, 3], b[None, :, 3])
+    inter = np.clip(x2 - x1, 0, None) * np.clip(y2 - y1, 0, None)
+    area_a = (a[:, 2] - a[:, 0]) * (a[:, 3] - a[:, 1])
+    area_b = (b[:, 2] - b[:, 0]) * (b[:, 3] - b[:, 1])
+    union = area_a[:, None] + area_b[None, :] - inter
+    return np.divide(inter, union, out=np.zeros_like(inter), where=union > 0)
+
+
+def greedy_match(iou, threshold):
+    """``(row, col)`` pairs taken in descending IoU order, each row and column used once."""
+    rows, cols = np.nonzero(iou >= threshold)
+    order = np.argsort(-iou[rows, cols], kind="stable")
+    used_rows = set()
+    used_cols = set()
+    matches = []
+    for row, col in zip(rows[order], cols[order]):
+        if row in used_rows or col in used_cols:
+            continue
+        used_rows.add(row)
+        used_cols.add(col)
+        matches.append((int(row), int(col)))
+    return matches
+
+
+def _gray(frame):
+    return frame if frame.ndim == 2 else cv2.cvtColor(frame, cv2.COLOR_BGR2GRAY)
+
+
+def _box_points(boxes):
+    """The 3x3 grid of each box as an ``(n * 9, 1, 2)`` float32 array for ``calcOpticalFlowPyrLK``."""
+    xs = boxes[:, None, 0] + (boxes[:, None, 2] - boxes[:, None, 0]) * _GRID
+    ys = boxes[:, None, 1] + (boxes[:, None, 3] - boxes[:, None, 1]) * _GRID
+    grid_x = np.repeat(xs, 3, axis=1)
+    grid_y = np.tile(ys, (1, 3))
+    return np.stack([grid_x, grid_y], axis=-1).reshape(-1, 1, 2).astype(np.float32)
+
+
+class _Track:
+    __slots__ = ("track_id", "box", "missed")
+
+    def __init__(self, track_id, box):
+        self.track_id = track_id
+        self.box = box
+        self.missed = 0
+
+
+class PeopleTracker:
+    """Carry YOLO person boxes between sparse detections with IoU association and optical flow.
+
+    ``PeopleConsumer`` asks ``should_detect`` for each sampled frame. On a
+    detection frame it passes YOLO's person boxes to ``update``, which matches
+    them to existing tracks by IoU and starts a new track for each unmatched
+    box. Every other sampled frame goes to ``propagate``, which shifts each
+    live box by the median Lucas-Kanade flow of a point grid inside it. Both
+    return the number of people currently tracked; ``unique_tracks`` counts
+    every track started so far and ``stats()`` reports the inferences saved.
+    """
+
+    def __init__(
+        self,
+        detect_every_seconds=TRACK_DETECT_EVERY_SECONDS,
+        iou_threshold=TRACK_IOU_THRESHOLD,
+        max_missed=TRACK_MAX_MISSED,
+    ):
+        self.detect_every_seconds = detect_every_seconds
+        self.iou_threshold = iou_threshold
+        self.max_missed = max_missed
+        self.last_detection_second = None
+        self.unique_tracks = 0
+        self.inferences = 0
+        self.tracked_frames = 0
+        self._tracks = []
+        self._prev_gray = None
+
+    def should_detect(self, second):
+        if self.last_detection_second is None or second - self.last_detection_second >= self.detect_every_seconds:
+            self.last_detection_second = second
+            return True
+        return False
+
+    def update(self, boxes, frame):
+        self.inferences += 1
+        boxes = np.asarray(boxes, dtype=np.float32).reshape(-1, 4)
+        matched_tracks = set()
+        matched_boxes = set()
+        if self._tracks and len(boxes):
+            track_boxes = np.stack([track.box for track in self._tracks])
+            for row, col in greedy_match(iou_matrix(track_boxes, boxes), self.iou_threshold):
+                self._tracks[row].box = boxes[col]
+                self._tracks[row].missed = 0
+                matched_tracks.add(row)
+                matched_boxes.add(col)
+
+        kept = []
+        for index, track in enumerate(self._tracks):
+            if index not in matched_tracks:
+                track.missed += 1
+            if track.missed <= self.max_missed:
+                kept.append(track)
+        for col in range(len(boxes)):
+            if col not in matched_boxes:
+                kept.append(_Track(self.unique_tracks, boxes[col]))
+                self.unique_tracks += 1
+        self._tracks = kept
+        self._prev_gray = _gray(frame)
+        return len(boxes)
+
+    def propagate(self, frame):
+        self.tracked_frames += 1
+        gray = _gray(frame)
+        live = [track for track in self._tracks if track.missed == 0]
+        if live and self._prev_gray is not None:
+            points = _box_points(np.stack([track.box for track in live]))
+            moved, status, _ = cv2.calcOpticalFlowPyrLK(self._prev_gray, gray, points, None, **_LK_PARAMS)
+            shifts = (moved - points).reshape(len(live), -1, 2)
+            found = status.reshape(len(live), -1).astype(bool)
+            height, width = gray.shape[:2]
+            for track, shift, ok in zip(live, shifts, found):
+                if ok.sum() < MIN_FLOW_POINTS:
+                    track.missed = 1
+                    continue
+                dx, dy = np.median(shift[ok], axis=0)
+                track.box = track.box + np.array([dx, dy, dx, dy], dtype=np.float32)
+                center_x = (track.box[0] + track.box[2]) / 2
+                center_y = (track.box[1] + track.box[3]) / 2
+                if not (0 <= center_x < width and 0 <= center_y < height):
+                    track.missed = 1
+        self._prev_gray = gray
+        return sum(1 for track in self._tracks if track.missed == 0)
+
+    def stats(self):
+        samples = self.inferences + self.tracked_frames
+        return {
+            "samples": samples,
+            "inferences": self.inferences,
+            "tracked_frames": self.tracked_frames,
+            "unique_tracks": self.unique_tracks,
+            "saved_percent": round(100.0 * self.tracked_frames / samples, 1) if samples else 0.0,
+        }
@@ -1,61 +1,366 @@
 import os
 import csv
+import time
 from pathlib import Path
 
 import cv2
-from ultralytics import YOLO
+
+from src.detection.detection_store import (
+    COUNT_CONF,
+    MODE_DETECT,
+    MODE_GATED,
+    MODE_TRACKED,
+    PERSON_CLASS_ID,
+    RAW_CONF,
+    STORED_CLASSES,
+    DetectionWriter,
+    detections_npz_path,
+)
+from src.detection.motion_gate import SOURCE_DETECTED, SOURCE_INFERRED, MotionGate
+from src.detection.people_tracker import TRACK_SAMPLE_HZ, PeopleTracker, person_boxes
+from src.ml_pipeline.model_registry import get_yolo_model
+from src.preprocessing.frame_engine import (
+    TimestampSampler,
+    frame_second,
+    open_video,
+    run_frame_engine,
+    video_fps,
+)
 
 VIDEO_DIR = "data/raw_videos"
 OUTPUT_DIR = "data/processed/people_per_second"
 DEFAULT_MODEL_PATH = "yolov8n.pt"
+DEFAULT_SAMPLE_HZ = 1.0
+DEFAULT_BATCH_SIZE = 1
 
 
-def detect_people_in_video(video_path, output_csv_path, model, resize=(640, 360)):
-    cap = cv2.VideoCapture(str(video_path))
-    if not cap.isOpened():
-        raise RuntimeError(f"Could not open video: {video_path}")
+def count_people(result, min_conf=None):
+    is_person = result.boxes.cls == PERSON_CLASS_ID
+    if min_conf is not None:
+        is_person = is_person & (result.boxes.conf >= min_conf)
+    return int(is_person.sum())
 
-    fps = cap.get(cv2.CAP_PROP_FPS)
-    fps = int(fps) if fps > 0 else 25
-    frame_id = 0
-    video_name = Path(video_path).stem
 
-    with open(output_csv_path, "w", newline="", encoding="utf-8") as f:
-        writer = csv.writer(f)
-        writer.writerow(["video", "second", "people_count"])
+def _inference_kwargs(imgsz, keep_detections=False):
+    # Persisted detections go down to RAW_CONF so they can be re-counted with
+    # another cutoff later; the live count still applies the default one.
+    if keep_detections:
+        kwargs = {"verbose": False, "conf": RAW_CONF, "classes": list(STORED_CLASSES)}
+    else:
+        kwargs = {"verbose": False, "classes": [PERSON_CLASS_ID]}
+    if imgsz is not None:
+        kwargs["imgsz"] = imgsz
+    return kwargs
 
-        while True:
-            ret, frame = cap.read()
-            if not ret:
-                break
 
+def count_people_batch(model, frames, imgsz=None):
+    results = model(list(frames), **_inference_kwargs(imgsz))
+    return [count_people(result) for result in results]
+
+
+class PeopleConsumer:
+    """Frame-engine consumer that runs YOLO on timestamp-sampled frames and writes people_per_second rows.
+
+    The peak count of each second is written, in batches of ``batch_size``
+    at inference resolution ``imgsz``. Optional collaborators: a
+    ``DetectionWriter`` path for raw boxes, a ``CongestionDetector`` fed each
+    written second, and at most one of a ``MotionGate`` (adds a ``source``
+    column) or a ``PeopleTracker`` (adds ``unique_tracks``; detects one frame
+    at a time) deciding which samples skip YOLO.
+    """
+
+    warms_up = False
+
+    def __init__(
+        self,
+        output_csv_path,
+        video_name,
+        model,
+        sample_hz=None,
+        batch_size=DEFAULT_BATCH_SIZE,
+        imgsz=None,
+        detections_path=None,
+        congestion_detector=None,
+        on_congestion=None,
+        motion_gate=None,
+        tracker=None,
+    ):
+        if motion_gate is not None and tracker is not None:
+            raise ValueError("PeopleConsumer takes either a motion_gate or a tracker, not both.")
+        self.output_csv_path = output_csv_path
+        self.video_name = video_name
+        self.model = model
+        if sample_hz is None:
+            # Optical flow needs samples close together; 1 Hz is too sparse to track.
+            sample_hz = TRACK_SAMPLE_HZ if tracker is not None else DEFAULT_SAMPLE_HZ
+        self.sample_hz = sample_hz
+        self.batch_size = max(int(batch_size), 1)
+        self.imgsz = imgsz
+        self.detections_path = detections_path
+        self.congestion_detector = congestion_detector
+        self.on_congestion = on_congestion
+        self.motion_gate = motion_gate
+        self.tracker = tracker
+        self.fps = None
+        self.sampler = None
+        self._batch = []
+        self._pending = None
+        self._file = None
+        self._writer = None
+        self._detections = None
+
+    def start(self, fps, first_frame=1):
+        self.fps = fps
+        self.sampler = TimestampSampler(fps, self.sample_hz, first_frame=first_frame)
+        self._batch = []
+        self._pending = None
+        self._last_count = None
+        self._file = open(self.output_csv_path, "w", newline="", encoding="utf-8")
+        self._writer = csv.writer(self._file)
+        header = ["video", "second", "people_count"]
+        if self.motion_gate is not None:
+            header.append("source")
+        if self.tracker is not None:
+            header.append("unique_tracks")
+        self._writer.writerow(header)
+        if self.detections_path is not None:
+            if self.tracker is not None:
+                mode = MODE_TRACKED
+            else:
+                mode = MODE_GATED if self.motion_gate is not None else MODE_DETECT
+            self._detections = DetectionWriter(self.detections_path, mode=mode)
+
+    def wants_frame(self, frame_id):
+        return self.sampler.due(frame_id)
+
+    def next_frame_id(self, frame_id):
+        return self.sampler.next_frame
+
+    def warm_up(self, frame):
+        pass
+
+    def process(self, frame_id, frame):
+        second = frame_second(frame_id, self.fps)
+        if self.tracker is not None:
+            self._track(frame_id, second, frame)
+            return
+        if self.motion_gate is not None and not self.motion_gate.should_detect(second):
+            # The first sample always runs YOLO; flushing the batch makes the
+            # reused count the latest one.
+            self._flush_batch()
+            if self._detections is not None:
+                self._detections.add(frame_id, second, None, source=SOURCE_INFERRED)
+            self._record(second, self._last_count, SOURCE_INFERRED)
+            return
+        if self.batch_size > 1:
+            # Kept past this call, and the frame engine may reuse the buffer.
+            frame = frame.copy()
+        self._batch.append((frame_id, second, frame))
+        if len(self._batch) >= self.batch_size:
+            self._flush_batch()
+
+    def _flush_batch(self):
+        if not self._batch:
+            return
+        frame_ids, seconds, frames = zip(*self._batch)
+        self._batch = []
+        if self._detections is None:
+            for second, people_count in zip(seconds, count_people_batch(self.model, frames, self.imgsz)):
+                self._record(second, people_count)
+            return
+
+        results = self.model(list(frames), **_inference_kwargs(self.imgsz, keep_detections=True))
+        for frame_id, second, result in zip(frame_ids, seconds, results):
+            self._detections.add(frame_id, second, result.boxes)
+            self._record(second, count_people(result, min_conf=COUNT_CONF))
+
+    def _track(self, frame_id, second, frame):
+        if not self.tracker.should_detect(second):
+            self._record(second, self.tracker.propagate(frame))
+            return
+        keep_detections = self._detections is not None
+        result = self.model([frame], **_inference_kwargs(self.imgsz, keep_detections=keep_detections))[0]
+        if keep_detections:
+            self._detections.add(frame_id, second, result.boxes)
+        boxes = person_boxes(result.boxes, min_conf=COUNT_CONF if keep_detections else None)
+        self._record(second, self.tracker.update(boxes, frame))
+
+    def _record(self, second, people_count, source=SOURCE_DETECTED):
+        if source == SOURCE_DETECTED:
+            self._last_count = people_count
+        if self._pending is not None and self._pending[0] != second:
+            self._write_second(*self._pending)
+            self._pending = None
+        unique_tracks = self.tracker.unique_tracks if self.tracker is not None else None
+        if self._pending is None:
+            self._pending = (second, people_count, source, unique_tracks)
+        else:
+            _, pending_count, pending_source, _ = self._pending
+            if SOURCE_DETECTED in (source, pending_source):
+                source = SOURCE_DETECTED
+            self._pending = (second, max(people_count, pending_count), source, unique_tracks)
+
+    def _write_second(self, second, people_count, source, unique_tracks):
+        row = [self.video_name, second, people_count]
+        if self.motion_gate is not None:
+            row.append(source)
+        if self.tracker is not None:
+            row.append(unique_tracks)
+        self._writer.writerow(row)
+        if self.congestion_detector is not None:
+            self._emit_congestion(self.congestion_detector.update(second, people_count))
+
+    def _emit_congestion(self, events):
+        if self.on_congestion is not None:
+            for event in events:
+                self.on_congestion(event)
+
+    def finish(self):
+        if self._file is not None:
+            self._flush_batch()
+            if self._pending is not None:
+                self._write_second(*self._pending)
+                self._pending = None
+            if self.congestion_detector is not None:
+                self._emit_congestion(self.congestion_detector.finish())
+            self._file.close()
+            self._file = None
+        if self._detections is not None:
+            self._detections.close()
+            self._detections = None
+
+
+def detect_people_in_video(
+    video_path,
+    output_csv_path,
+    model,
+    resize=(640, 360),
+    sample_hz=None,
+    skip_mode="grab",
+    batch_size=DEFAULT_BATCH_SIZE,
+    imgsz=None,
+    detections_path=None,
+    motion_gate=None,
+    tracker=None,
+):
+    """Write people_per_second rows for one video; see ``PeopleConsumer`` for ``motion_gate``/``tracker``."""
+    consumers = [
+        PeopleConsumer(
+            output_csv_path,
+            Path(video_path).stem,
+            model,
+            sample_hz=sample_hz,
+            batch_size=batch_size,
+            imgsz=imgsz,
+            detections_path=detections_path,
+            motion_gate=motion_gate,
+            tracker=tracker,
+        )
+    ]
+    if motion_gate is not None:
+        from src.preprocessing.motion_analysis import MotionConsumer
+
+        # Registered first so the gate has seen each frame's motion before the sample is gated.
+        consumers.insert(0, MotionConsumer(gate=motion_gate))
+    run_frame_engine(video_path, consumers, resize=resize, skip_mode=skip_mode)
+    return output_csv_path
+
+
+def collect_sampled_frames(video_path, max_frames, resize=(640, 360), sample_hz=DEFAULT_SAMPLE_HZ):
+    cap = open_video(video_path)
+    sampler = TimestampSampler(video_fps(cap), sample_hz)
+    frames = []
+    frame_id = 0
+    try:
+        while len(frames) < max_frames and cap.grab():
             frame_id += 1
-            if frame_id % fps != 0:
+            if not sampler.due(frame_id):
                 continue
+            ret, frame = cap.retrieve()
+            if not ret:
+                break
+            frames.append(cv2.resize(frame, resize))
+    finally:
+        cap.release()
+    return frames
 
-            second = frame_id // fps
-            frame = cv2.resize(frame, resize)
-            results = model(frame, verbose=False)
 
-            people_count = 0
-            for result in results:
-                for box in result.boxes:
-                    if int(box.cls[0]) == 0:
-                        people_count += 1
+def benchmark_batch_sizes(
+    video_path,
+    model,
+    batch_sizes=(1, 2, 4, 8, 16),
+    imgsz=None,
+    max_frames=64,
+    resize=(640, 360),
+):
+    frames = collect_sampled_frames(video_path, max_frames, resize=resize)
+    if not frames:
+        raise RuntimeError(f"No frames could be sampled from: {video_path}")
 
-            writer.writerow([video_name, second, people_count])
+    # Warm-up pass so lazy model setup is not charged to the first batch size.
+    count_people_batch(model, frames[:1], imgsz)
 
-    cap.release()
-    return output_csv_path
+    report = []
+    for batch_size in batch_sizes:
+        start = time.perf_counter()
+        for i in range(0, len(frames), batch_size):
+            count_people_batch(model, frames[i:i + batch_size], imgsz)
+        elapsed = time.perf_counter() - start
+        report.append(
+            {
+                "batch_size": batch_size,
+                "imgsz": imgsz,
+                "frames": len(frames),
+                "seconds": round(elapsed, 4),
+                "frames_per_second": round(len(frames) / elapsed, 2) if elapsed > 0 else 0.0,
+            }
+        )
+    return report
 
 
 def process_all_videos(
     video_dir=VIDEO_DIR,
     output_dir=OUTPUT_DIR,
     model_path=DEFAULT_MODEL_PATH,
+    sample_hz=None,
+    skip_mode="grab",
+    batch_size=DEFAULT_BATCH_SIZE,
+    imgsz=None,
+    workers=1,
+    detections_dir=None,
+    gate_options=None,
+    tracker_options=None,
 ):
+    """Write people_per_second CSVs for every video in ``video_dir``.
+
+    ``gate_options`` / ``tracker_options`` are ``MotionGate`` /
+    ``PeopleTracker`` keyword arguments (``{}`` for the defaults), as in
+    ``backfill_videos``; ``None`` runs YOLO on every sample.
+    """
+    if workers > 1:
+        from src.pipeline.backfill import backfill_videos
+
+        results = backfill_videos(
+            video_dir=video_dir,
+            people_dir=output_dir,
+            model_path=model_path,
+            workers=workers,
+            stages=("people",),
+            people_options={"sample_hz": sample_hz, "batch_size": batch_size, "imgsz": imgsz},
+            skip_mode=skip_mode,
+            detections_dir=detections_dir,
+            gate_options=gate_options,
+            tracker_options=tracker_options,
+        )
+        for result in results:
+            if "inference_stats" in result:
+                print(f"{os.path.basename(result['people_csv'])}: {result['inference_stats']}")
+        return [result["people_csv"] for result in results]
+
     os.makedirs(output_dir, exist_ok=True)
-    model = YOLO(model_path)
+    if detections_dir is not None:
+        os.makedirs(detections_dir, exist_ok=True)
+    model = get_yolo_model(model_path)
     processed_files = []
 
     for video_name in os.listdir(video_dir):
@@ -64,7 +369,25 @@ def process_all_videos(
         video_path = os.path.join(video_dir, video_name)
         output_csv = os.path.join(output_dir, f"{Path(video_name).stem}_people.csv")
         print(f"Processing: {video_name}")
-        detect_people_in_video(video_path, output_csv, model=model)
+        motion_gate = MotionGate(**gate_options) if gate_options is not None else None
+        tracker = PeopleTracker(**tracker_options) if tracker_options is not None else None
+        detect_people_in_video(
+            video_path,
+            output_csv,
+            model=model,
+            sample_hz=sample_hz,
+            skip_mode=skip_mode,
+            batch_size=batch_size,
+            imgsz=imgsz,
+            detections_path=(
+                detections_npz_path(detections_dir, Path(video_name).stem) if detections_dir is not None else None
+            ),
+            motion_gate=motion_gate,
+            tracker=tracker,
+        )
+        for schedule in (motion_gate, tracker):
+            if schedule is not None:
+                print(f"  {schedule.stats()}")
         processed_files.append(output_csv)
 
     return processed_files
@@ -0,0 +1,134 @@
+import argparse
+import os
+
+import numpy as np
+
+MODEL_FILE = "models/activity_rf_model.pkl"
+FOREST_SUFFIX = ".forest.npz"
+CHUNK_ROWS = 4096
+
+# The forest is flattened into one set of node arrays shared by all trees:
+# ``roots[t]`` is the first node of tree t, ``children[2 * n]`` and
+# ``children[2 * n + 1]`` are the left and right child of node n (global
+# indices), and leaves point to themselves.
+
+
+def forest_path(model_path):
+    return os.path.splitext(model_path)[0] + FOREST_SUFFIX
+
+
+def export_forest(model, output_path):
+    """Flatten a fitted sklearn ``RandomForestClassifier`` into packed NumPy node arrays."""
+    features, thresholds, children, values, roots = [], [], [], [], []
+    offset = 0
+    for estimator in model.estimators_:
+        tree = estimator.tree_
+        is_leaf = tree.children_left < 0
+        own_index = np.arange(tree.node_count) + offset
+
+        features.append(np.where(is_leaf, 0, tree.feature))
+        thresholds.append(np.where(is_leaf, np.inf, tree.threshold))
+        children.append(
+            np.column_stack(
+                [
+                    np.where(is_leaf, own_index, tree.children_left + offset),
+                    np.where(is_leaf, own_index, tree.children_right + offset),
+                ]
+            ).reshape(-1)
+        )
+
+        # Same normalisation as DecisionTreeClassifier.predict_proba.
+        proba = tree.value[:, 0, :]
+        normalizer = proba.sum(axis=1)[:, np.newaxis]
+        normalizer[normalizer == 0.0] = 1.0
+        values.append(proba / normalizer)
+
+        roots.append(offset)
+        offset += tree.node_count
+
+    os.makedirs(os.path.dirname(output_path) or ".", exist_ok=True)
+    tmp_path = f"{output_path}.tmp.npz"
+    np.savez(
+        tmp_path,
+        feature=np.concatenate(features).astype(np.int32),
+        threshold=np.concatenate(thresholds).astype(np.float64),
+        children=np.concatenate(children).astype(np.int32),
+        value=np.concatenate(values).astype(np.float64),
+        roots=np.asarray(roots, dtype=np.int32),
+        n_features=np.asarray(model.n_features_in_),
+        classes=np.asarray(model.classes_).astype(str),
+    )
+    os.replace(tmp_path, output_path)
+    return output_path
+
+
+class ForestPredictor:
+    """Vectorized evaluation of an exported forest, matching ``RandomForestClassifier.predict``.
+
+    Like sklearn, inputs are cast to float32 and compared against float64
+    thresholds, and leaf probabilities are summed in tree order.
+    """
+
+    def __init__(self, arrays):
+        self.feature = arrays["feature"]
+        self.threshold = arrays["threshold"]
+        self.children = arrays["children"]
+        self.value = arrays["value"]
+        self.roots = arrays["roots"]
+        self.n_features = int(arrays["n_features"])
+        self.classes_ = arrays["classes"]
+        self.is_leaf = self.children[0::2] == np.arange(len(self.feature))
+
+    def _leaves(self, X):
+        """Return the leaf reached in every tree, shape ``(n_trees, n_samples)``."""
+        rows = len(X)
+        columns = np.ascontiguousarray(X.T).reshape(-1)
+        # (tree, sample) pairs in tree-major order; pairs that reach a leaf
+        # are dropped so each step only touches samples still descending.
+        sample = np.tile(np.arange(rows, dtype=np.int32), len(self.roots))
+        node = np.repeat(self.roots, rows)
+        position = np.arange(len(node))
+        leaves = np.empty(len(node), dtype=np.int32)
+        while len(node):
+            x = columns[self.feature[node] * rows + sample]
+            node = self.children[2 * node + (x > self.threshold[node])]
+            done = self.is_leaf[node]
+            if done.any():
+                leaves[position[done]] = node[done]
+                active = ~done
+                node, sample, position = node[active], sample[active], position[active]
+        return leaves.reshape(len(self.roots), rows)
+
+    def predict_proba(self, X):
+        X = np.ascontiguousarray(X, dtype=np.float32)
+        if X.ndim != 2 or X.shape[1] != self.n_features:
+            raise ValueError(f"Expected input with {self.n_features} features, got shape {X.shape}")
+
+        proba = np.zeros((len(X), len(self.classes_)), dtype=np.float64)
+        for start in range(0, len(X), CHUNK_ROWS):
+            leaves = self._leaves(X[start:start + CHUNK_ROWS])
+            chunk = proba[start:start + CHUNK_ROWS]
+            for tree_leaves in leaves:
+                chunk += self.value[tree_leaves]
+        proba /= len(self.roots)
+        return proba
+
+    def predict(self, X):
+        return self.classes_.take(np.argmax(self.predict_proba(X), axis=1))
+
+
+def load_forest(path):
+    with np.load(path, allow_pickle=False) as data:
+        return ForestPredictor({name: data[name] for name in data.files})
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Export a trained activity RandomForest to packed NumPy arrays.")
+    parser.add_argument("--model", default=MODEL_FILE)
+    parser.add_argument("--output", default=None)
+    args = parser.parse_args()
+
+    import joblib
+
+    output = export_forest(joblib.load(args.model), args.output or forest_path(args.model))
+    print(f"Exported forest to {output}")
@@ -0,0 +1,109 @@
+import os
+import threading
+
+# Models are cached per process and keyed by (kind, absolute path). Each entry
+# remembers the file signature it was loaded from, so a retrained model file
+# (e.g. after self_train_after_upload) is picked up on the next lookup.
+_LOCK = threading.Lock()
+_MODELS = {}
+_STATS = {"hits": 0, "misses": 0, "reloads": 0}
+# Above this many rows sklearn's compiled predict beats the packed forest by
+# more than the one-off pickle load (~1 s), e.g. a 12-hour upload of 43,200
+# rows: 0.3 s with sklearn against 2 s packed.
+PACKED_MAX_ROWS = 10000
+
+
+def _file_signature(path):
+    try:
+        stat = os.stat(path)
+    except OSError:
+        return None
+    return (stat.st_mtime_ns, stat.st_size)
+
+
+# Loaders import their libraries on first use, so importing the registry (and
+# the pipeline modules that use it) does not pull in torch or joblib.
+def _load_yolo(path):
+    from ultralytics import YOLO
+
+    return YOLO(path)
+
+
+def _load_joblib(path):
+    import joblib
+
+    return joblib.load(path)
+
+
+def _load_forest(path):
+    from src.ml_pipeline.forest_engine import load_forest
+
+    return load_forest(path)
+
+
+_LOADERS = {
+    "yolo": _load_yolo,
+    "joblib": _load_joblib,
+    "forest": _load_forest,
+}
+
+
+def get_model(kind, path):
+    if kind not in _LOADERS:
+        raise ValueError(f"Unknown model kind '{kind}', expected one of {sorted(_LOADERS)}")
+
+    key = (kind, os.path.abspath(path))
+    with _LOCK:
+        entry = _MODELS.get(key)
+        signature = _file_signature(path)
+        if entry is not None and entry["signature"] == signature:
+            _STATS["hits"] += 1
+            return entry["model"]
+
+        _STATS["reloads" if entry is not None else "misses"] += 1
+        model = _LOADERS[kind](path)
+        # Re-read the signature: loaders such as YOLO may download the file.
+        _MODELS[key] = {"model": model, "signature": _file_signature(path)}
+        return model
+
+
+def get_yolo_model(path):
+    return get_model("yolo", path)
+
+
+def get_activity_model(path):
+    return get_model("joblib", path)
+
+
+def get_activity_predictor(path, rows=None):
+    """Return the packed NumPy forest exported next to ``path`` when it is current, else the pickle.
+
+    The packed forest loads in milliseconds but predicts several times slower
+    than sklearn, so batches of more than ``PACKED_MAX_ROWS`` rows go to the
+    (cached) pickle whenever it exists.
+    """
+    from src.ml_pipeline.forest_engine import forest_path
+
+    packed = forest_path(path)
+    packed_signature = _file_signature(packed)
+    model_signature = _file_signature(path)
+    if rows is not None and rows > PACKED_MAX_ROWS and model_signature is not None:
+        return get_activity_model(path)
+    # A pickle retrained after the last export is newer; fall back to it.
+    if packed_signature is not None and (model_signature is None or packed_signature[0] >= model_signature[0]):
+        return get_model("forest", packed)
+    return get_activity_model(path)
+
+
+def registry_stats():
+    with _LOCK:
+        stats = dict(_STATS)
+        stats["loaded"] = len(_MODELS)
+    return stats
+
+
+def clear_registry():
+    with _LOCK:
+        _MODELS.clear()
+        for name in _STATS:
+            _STATS[name] = 0
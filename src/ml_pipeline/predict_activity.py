@@ -1,7 +1,11 @@
-import pandas as pd
-import joblib
 import os
 
+import numpy as np
+
+from src.ml_pipeline.model_registry import get_activity_predictor
+from src.preprocessing.csv_video_index import read_csv_video_rows, splice_csv_video_rows
+from src.storage.sqlite_store import read_video_rows, replace_video_rows
+
 INPUT_FILE = "data/processed/master_dataset.csv"
 MODEL_FILE = "models/activity_rf_model.pkl"
 OUTPUT_FILE = "data/processed/activity_ml_predictions.csv"
@@ -9,32 +13,42 @@ OUTPUT_FILE = "data/processed/activity_ml_predictions.csv"
 FEATURE_COLUMNS = ["avg_motion_ratio", "motion_std", "people_count"]
 
 
+def _predict(model, features):
+    # A pickled sklearn model (used until the forest is exported) was fitted
+    # on a DataFrame and expects the same column names.
+    if hasattr(model, "feature_names_in_"):
+        import pandas as pd
+
+        features = pd.DataFrame(features, columns=FEATURE_COLUMNS)
+    return model.predict(features)
+
+
+def _feature_matrix(rows):
+    return np.array([[float(row[column]) for column in FEATURE_COLUMNS] for row in rows], dtype=np.float64)
+
+
 def predict_activity(
     input_file=INPUT_FILE,
     model_file=MODEL_FILE,
     output_file=OUTPUT_FILE,
 ):
-    model = joblib.load(model_file)
+    import pandas as pd
+
     df = pd.read_csv(input_file)
-    df["predicted_activity"] = model.predict(df[FEATURE_COLUMNS])
+    model = get_activity_predictor(model_file, rows=len(df))
+    df["predicted_activity"] = _predict(model, df[FEATURE_COLUMNS].to_numpy(dtype=np.float64))
     os.makedirs(os.path.dirname(output_file), exist_ok=True)
     df.to_csv(output_file, index=False)
     return output_file
 
 
-def upsert_predictions_for_video(
-    video_name,
-    input_file=INPUT_FILE,
-    model_file=MODEL_FILE,
-    output_file=OUTPUT_FILE,
-):
-    model = joblib.load(model_file)
-    df = pd.read_csv(input_file)
-    video_df = df[df["video"] == video_name].copy()
-    if video_df.empty:
-        return output_file
+def _rewrite_predictions_csv(video_name, rows, output_file):
+    import pandas as pd
 
-    video_df["predicted_activity"] = model.predict(video_df[FEATURE_COLUMNS])
+    video_df = pd.DataFrame(rows)
+    for column in video_df.columns:
+        if column not in ("video", "predicted_activity"):
+            video_df[column] = pd.to_numeric(video_df[column])
 
     if os.path.exists(output_file):
         existing = pd.read_csv(output_file)
@@ -46,6 +60,36 @@ def upsert_predictions_for_video(
     merged = merged.sort_values(["video", "second"]).reset_index(drop=True)
     os.makedirs(os.path.dirname(output_file), exist_ok=True)
     merged.to_csv(output_file, index=False)
+
+
+def upsert_predictions_for_video(
+    video_name,
+    input_file=INPUT_FILE,
+    model_file=MODEL_FILE,
+    output_file=OUTPUT_FILE,
+    db_path=None,
+):
+    if db_path is not None:
+        rows = read_video_rows("master_dataset", video_name, db_path=db_path)
+        if not rows:
+            return db_path
+        model = get_activity_predictor(model_file, rows=len(rows))
+        for row, label in zip(rows, _predict(model, _feature_matrix(rows))):
+            row["predicted_activity"] = str(label)
+        replace_video_rows("activity_ml_predictions", video_name, rows, db_path=db_path)
+        return db_path
+
+    rows = read_csv_video_rows(input_file, video_name)
+    if not rows:
+        return output_file
+
+    model = get_activity_predictor(model_file, rows=len(rows))
+    for row, label in zip(rows, _predict(model, _feature_matrix(rows))):
+        row["predicted_activity"] = str(label)
+
+    os.makedirs(os.path.dirname(output_file), exist_ok=True)
+    if not splice_csv_video_rows(output_file, video_name, list(rows[0]), rows):
+        _rewrite_predictions_csv(video_name, rows, output_file)
     return output_file
 
 
@@ -1,17 +1,170 @@
+import argparse
+import json
+import os
+import shutil
+import tempfile
+import time
+
+import numpy as np
 import pandas as pd
-from sklearn.model_selection import train_test_split
+from sklearn.model_selection import ParameterGrid, train_test_split
 from sklearn.ensemble import RandomForestClassifier
-from sklearn.metrics import classification_report, confusion_matrix
+from sklearn.metrics import accuracy_score, classification_report, confusion_matrix
 import joblib
-import os
+from joblib import Parallel, delayed
+
+from src.ml_pipeline.forest_engine import FOREST_SUFFIX, export_forest, forest_path, load_forest
+from src.storage.sqlite_store import read_video_rows
 
 INPUT_FILE = "data/processed/master_labeled.csv"
 MODEL_OUTPUT = "models/activity_rf_model.pkl"
 FEATURE_COLUMNS = ["avg_motion_ratio", "motion_std", "people_count"]
+KEY_COLUMNS = ["video", "second"]
+# Row budget for retraining after uploads; keeps self-training time flat as
+# pseudo-labels accumulate in master_labeled.csv.
+RESERVOIR_ROWS = 20000
+METRICS_SUFFIX = ".metrics.json"
+# Hyperparameter search: candidates within ACCURACY_TOLERANCE of the most
+# accurate one compete on packed model size (or per-row latency).
+ACCURACY_TOLERANCE = 0.01
+# Share of the training split held out to rank search candidates, so the
+# test split is only used for the final report.
+VALIDATION_SIZE = 0.2
+SEARCH_GRID = {
+    "n_estimators": [25, 50, 100, 150],
+    "max_depth": [8, 12, 16, None],
+    "min_samples_leaf": [1, 5, 20],
+}
+
+
+def training_reservoir(df, max_rows=RESERVOIR_ROWS, random_state=42):
+    """Deduplicated, class-stratified sample of at most ``max_rows`` labeled rows.
+
+    Hand-labeled rows win over pseudo-labels for the same (video, second) and
+    are kept before any pseudo-labels when a class is over its share.
+    """
+    if "is_pseudo_label" in df.columns:
+        df = df.sort_values("is_pseudo_label", kind="stable")
+    df = df.drop_duplicates(subset=KEY_COLUMNS, keep="first")
+    if len(df) <= max_rows:
+        return df.reset_index(drop=True)
+
+    classes = df["activity_label"].value_counts(sort=False)
+    quotas = _class_quotas(classes, max_rows)
+    # Shuffle once, then a stable sort on is_pseudo_label puts hand labels
+    # first while keeping the random order within each group.
+    shuffled = df.sample(frac=1.0, random_state=random_state)
+    if "is_pseudo_label" in shuffled.columns:
+        shuffled = shuffled.sort_values("is_pseudo_label", kind="stable")
+    rank = shuffled.groupby("activity_label", sort=False).cumcount()
+    quota = shuffled["activity_label"].map(quotas)
+    return shuffled[rank < quota].sort_values(KEY_COLUMNS).reset_index(drop=True)
+
+
+def _class_quotas(class_counts, max_rows):
+    """Split ``max_rows`` evenly across classes, passing unused share of small classes on."""
+    quotas = {}
+    remaining = max_rows
+    pending = class_counts.sort_values()
+    while len(pending):
+        share = remaining // len(pending)
+        label, count = pending.index[0], int(pending.iloc[0])
+        quotas[label] = min(count, share)
+        remaining -= quotas[label]
+        pending = pending.iloc[1:]
+    return quotas
+
+
+def _key_index(df):
+    return pd.MultiIndex.from_arrays([df["video"].astype(str), df["second"].astype("int64")])
 
-def train_activity_model(input_file=INPUT_FILE, model_output=MODEL_OUTPUT):
+
+def _fit_candidate(params, X_train, y_train):
+    model = RandomForestClassifier(random_state=42, class_weight="balanced", n_jobs=1, **params)
+    model.fit(X_train, y_train)
+    return model
+
+
+def _score_forest(packed_file, X_test, y_test, latency_repeats=3):
+    """Accuracy, on-disk size and per-row latency of the packed forest predict_activity uses."""
+    forest = load_forest(packed_file)
+    features = X_test.to_numpy(dtype=np.float64)
+    timings = []
+    for _ in range(latency_repeats):
+        start = time.perf_counter()
+        y_pred = forest.predict(features)
+        timings.append(time.perf_counter() - start)
+    return {
+        "accuracy": round(float(accuracy_score(y_test, y_pred)), 4),
+        "model_bytes": os.path.getsize(packed_file),
+        "latency_us_per_row": round(min(timings) / max(len(features), 1) * 1e6, 3),
+    }
+
+
+def _measure_candidate(model, X_test, y_test, work_dir, name):
+    packed_file = export_forest(model, os.path.join(work_dir, f"{name}{FOREST_SUFFIX}"))
+    return _score_forest(packed_file, X_test, y_test)
+
+
+def search_activity_forest(
+    X_train,
+    y_train,
+    X_val,
+    y_val,
+    param_grid=SEARCH_GRID,
+    accuracy_tolerance=ACCURACY_TOLERANCE,
+    objective="model_bytes",
+    n_jobs=-1,
+):
+    """Fit every grid candidate in parallel and pick the cheapest one within tolerance.
+
+    Candidates are scored on validation accuracy, packed model size and
+    per-row inference latency; keep the test split out of ``X_val``. Among those whose accuracy is within
+    ``accuracy_tolerance`` of the best, the one minimising ``objective``
+    (``"model_bytes"`` or ``"latency_us_per_row"``) wins, ties broken by the other.
+    """
+    candidates = list(ParameterGrid(param_grid))
+    models = Parallel(n_jobs=n_jobs)(
+        delayed(_fit_candidate)(params, X_train, y_train) for params in candidates
+    )
+
+    # Latency is measured one model at a time so the timings are not
+    # skewed by other candidates still training.
+    work_dir = tempfile.mkdtemp(prefix="forest_search_")
+    try:
+        scores = [
+            {"params": params, **_measure_candidate(model, X_val, y_val, work_dir, f"candidate_{index}")}
+            for index, (params, model) in enumerate(zip(candidates, models))
+        ]
+    finally:
+        shutil.rmtree(work_dir, ignore_errors=True)
+
+    best_accuracy = max(score["accuracy"] for score in scores)
+    eligible = [
+        index for index, score in enumerate(scores)
+        if score["accuracy"] >= best_accuracy - accuracy_tolerance
+    ]
+    tie_break = "latency_us_per_row" if objective == "model_bytes" else "model_bytes"
+    chosen = min(eligible, key=lambda index: (scores[index][objective], scores[index][tie_break]))
+    return models[chosen], scores[chosen], scores
+
+
+def metrics_path(model_path):
+    return os.path.splitext(model_path)[0] + METRICS_SUFFIX
+
+
+def train_activity_model(
+    input_file=INPUT_FILE,
+    model_output=MODEL_OUTPUT,
+    max_rows=None,
+    search=False,
+    accuracy_tolerance=ACCURACY_TOLERANCE,
+    objective="model_bytes",
+):
     df = pd.read_csv(input_file)
     df = df.dropna(subset=["activity_label"])
+    if max_rows is not None:
+        df = training_reservoir(df, max_rows)
     X = df[FEATURE_COLUMNS]
     y = df["activity_label"]
 
@@ -22,12 +175,28 @@ def train_activity_model(input_file=INPUT_FILE, model_output=MODEL_OUTPUT):
         stratify=y
     )
 
-    model = RandomForestClassifier(
-        n_estimators=150,
-        random_state=42,
-        class_weight="balanced"
-    )
-    model.fit(X_train, y_train)
+    search_results = None
+    if search:
+        X_fit, X_val, y_fit, y_val = train_test_split(
+            X_train, y_train,
+            test_size=VALIDATION_SIZE,
+            random_state=42,
+            stratify=y_train
+        )
+        _, best, search_results = search_activity_forest(
+            X_fit, y_fit, X_val, y_val,
+            accuracy_tolerance=accuracy_tolerance,
+            objective=objective,
+        )
+        # Refit the chosen settings on the whole training split.
+        model = _fit_candidate(best["params"], X_train, y_train)
+    else:
+        model = RandomForestClassifier(
+            n_estimators=150,
+            random_state=42,
+            class_weight="balanced"
+        )
+        model.fit(X_train, y_train)
 
     y_pred = model.predict(X_test)
     report = classification_report(y_test, y_pred)
@@ -35,11 +204,37 @@ def train_activity_model(input_file=INPUT_FILE, model_output=MODEL_OUTPUT):
 
     os.makedirs("models", exist_ok=True)
     joblib.dump(model, model_output)
+    # Packed copy loaded by predict_activity without sklearn or joblib.
+    forest_output = export_forest(model, forest_path(model_output))
+
+    metrics = _score_forest(forest_output, X_test, y_test)
+    metrics.update(
+        {
+            "params": {key: model.get_params()[key] for key in SEARCH_GRID},
+            "pickle_bytes": os.path.getsize(model_output),
+            "training_rows": len(df),
+        }
+    )
+    if search_results is not None:
+        metrics.update(
+            {
+                "objective": objective,
+                "accuracy_tolerance": accuracy_tolerance,
+                "candidates": search_results,
+            }
+        )
+    metrics_output = metrics_path(model_output)
+    with open(metrics_output, "w", encoding="utf-8") as f:
+        json.dump(metrics, f, indent=2, default=str)
 
     return {
         "model_path": model_output,
+        "forest_path": forest_output,
+        "metrics_path": metrics_output,
+        "metrics": {key: value for key, value in metrics.items() if key != "candidates"},
         "classification_report": report,
         "confusion_matrix": matrix.tolist(),
+        "training_rows": len(df),
     }
 
 
@@ -47,11 +242,14 @@ def self_train_from_predictions(
     video_name,
     master_labeled_file=INPUT_FILE,
     predictions_file="data/processed/activity_ml_predictions.csv",
+    db_path=None,
 ):
     labeled_df = pd.read_csv(master_labeled_file)
-    predictions_df = pd.read_csv(predictions_file)
-
-    video_preds = predictions_df[predictions_df["video"] == video_name].copy()
+    if db_path is not None:
+        video_preds = pd.DataFrame(read_video_rows("activity_ml_predictions", video_name, db_path=db_path))
+    else:
+        predictions_df = pd.read_csv(predictions_file)
+        video_preds = predictions_df[predictions_df["video"] == video_name].copy()
     if video_preds.empty:
         return {"rows_added": 0}
 
@@ -61,23 +259,42 @@ def self_train_from_predictions(
     )
     pseudo_df["is_pseudo_label"] = 1
 
-    if "is_pseudo_label" not in labeled_df.columns:
-        labeled_df["is_pseudo_label"] = 0
-
-    existing_keys = set(zip(labeled_df["video"], labeled_df["second"]))
-    pseudo_df = pseudo_df[
-        ~pseudo_df.apply(lambda r: (r["video"], r["second"]) in existing_keys, axis=1)
-    ]
+    pseudo_df = pseudo_df.drop_duplicates(subset=KEY_COLUMNS)
+    pseudo_df = pseudo_df[~_key_index(pseudo_df).isin(_key_index(labeled_df))]
     if pseudo_df.empty:
         return {"rows_added": 0}
 
-    merged = pd.concat([labeled_df, pseudo_df], ignore_index=True)
-    merged.to_csv(master_labeled_file, index=False)
+    if "is_pseudo_label" in labeled_df.columns:
+        # Only the new rows are written; the existing file is left as is.
+        pseudo_df = pseudo_df.reindex(columns=labeled_df.columns)
+        pseudo_df.to_csv(master_labeled_file, mode="a", header=False, index=False)
+    else:
+        labeled_df["is_pseudo_label"] = 0
+        merged = pd.concat([labeled_df, pseudo_df], ignore_index=True)
+        merged.to_csv(master_labeled_file, index=False)
     return {"rows_added": len(pseudo_df)}
 
 
 if __name__ == "__main__":
-    result = train_activity_model()
+    parser = argparse.ArgumentParser(description="Train the activity RandomForest.")
+    parser.add_argument("--input", default=INPUT_FILE)
+    parser.add_argument("--output", default=MODEL_OUTPUT)
+    parser.add_argument("--max-rows", type=int, default=None)
+    parser.add_argument("--search", action="store_true", help="Search forest size, depth and leaf settings in parallel.")
+    parser.add_argument("--tolerance", type=float, default=ACCURACY_TOLERANCE)
+    parser.add_argument("--objective", choices=["model_bytes", "latency_us_per_row"], default="model_bytes")
+    args = parser.parse_args()
+
+    result = train_activity_model(
+        input_file=args.input,
+        model_output=args.output,
+        max_rows=args.max_rows,
+        search=args.search,
+        accuracy_tolerance=args.tolerance,
+        objective=args.objective,
+    )
+    print("\nModel metrics:\n")
+    print(json.dumps(result["metrics"], indent=2, default=str))
     print("\nClassification Report:\n")
     print(result["classification_report"])
     print("\nConfusion Matrix:\n")
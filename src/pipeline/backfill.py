@@ -0,0 +1,267 @@
+import argparse
+import multiprocessing
+import os
+import threading
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from pathlib import Path
+
+import cv2
+
+from src.detection.detection_store import detections_npz_path
+from src.detection.motion_gate import MotionGate
+from src.detection.people_tracker import PeopleTracker
+from src.detection.yolo_people_detection import DEFAULT_MODEL_PATH, PeopleConsumer
+from src.ml_pipeline.model_registry import get_yolo_model
+from src.preprocessing.aggregate_motion import aggregate_all_motion
+from src.preprocessing.frame_engine import run_frame_engine
+from src.preprocessing.merge_motion_people import build_master_dataset
+from src.preprocessing.motion_analysis import MotionConsumer, motion_raw_path
+
+VIDEO_DIR = "data/raw_videos"
+PEOPLE_DIR = "data/processed/people_per_second"
+MOTION_RAW_DIR = "data/processed/motion_raw"
+MOTION_AGG_FILE = "data/processed/motion_aggregated.csv"
+MASTER_DATASET_FILE = "data/processed/master_dataset.csv"
+STAGES = ("people", "motion")
+THREADS_PER_WORKER = 1
+
+_progress_queue = None
+
+
+def limit_worker_threads(threads=THREADS_PER_WORKER):
+    # Every worker decodes and infers on its own core; letting each one spin up
+    # a full torch/OpenCV thread pool oversubscribes the machine.
+    for var in ("OMP_NUM_THREADS", "MKL_NUM_THREADS", "OPENBLAS_NUM_THREADS"):
+        os.environ[var] = str(threads)
+    cv2.setNumThreads(threads)
+    try:
+        import torch
+    except ImportError:
+        return
+    torch.set_num_threads(threads)
+
+
+def _init_worker(progress_queue, threads=None):
+    global _progress_queue
+    _progress_queue = progress_queue
+    if threads is not None:
+        limit_worker_threads(threads)
+
+
+def _report_progress(video_name):
+    def callback(frames_done, total_frames):
+        if _progress_queue is not None:
+            _progress_queue.put((video_name, frames_done, total_frames))
+
+    return callback
+
+
+def backfill_video(
+    video_path,
+    people_dir,
+    motion_dir,
+    model_path=DEFAULT_MODEL_PATH,
+    stages=STAGES,
+    people_options=None,
+    skip_mode="grab",
+    motion_format="csv",
+    detections_dir=None,
+    gate_options=None,
+    tracker_options=None,
+):
+    video_name = Path(video_path).stem
+    outputs = {}
+    consumers = []
+    # Motion-gated or detect-and-track people counting (see MotionGate and
+    # PeopleTracker); the options are their constructor kwargs.
+    gate = MotionGate(**gate_options) if gate_options is not None and "people" in stages else None
+    tracker = PeopleTracker(**tracker_options) if tracker_options is not None and "people" in stages else None
+
+    if "motion" in stages:
+        outputs["motion_csv"] = motion_raw_path(motion_dir, video_name, motion_format)
+        consumers.append(MotionConsumer(outputs["motion_csv"], gate=gate))
+    elif gate is not None:
+        consumers.append(MotionConsumer(gate=gate))
+    if "people" in stages:
+        outputs["people_csv"] = os.path.join(people_dir, f"{video_name}_people.csv")
+        if detections_dir is not None:
+            outputs["detections"] = detections_npz_path(detections_dir, video_name)
+        # Each worker process keeps its own warm YOLO instance via the registry.
+        consumers.append(
+            PeopleConsumer(
+                outputs["people_csv"],
+                video_name,
+                get_yolo_model(model_path),
+                detections_path=outputs.get("detections"),
+                motion_gate=gate,
+                tracker=tracker,
+                **(people_options or {}),
+            )
+        )
+
+    # Motion needs every frame; only an ungated people-only backfill can skip decoding.
+    if "motion" in stages or gate is not None:
+        skip_mode = "decode"
+    run_frame_engine(
+        video_path,
+        consumers,
+        skip_mode=skip_mode,
+        progress_callback=_report_progress(video_name),
+    )
+    if gate is not None:
+        outputs["inference_stats"] = gate.stats()
+    if tracker is not None:
+        outputs["inference_stats"] = tracker.stats()
+    return outputs
+
+
+def _print_progress(progress_queue):
+    while True:
+        message = progress_queue.get()
+        if message is None:
+            return
+        video_name, frames_done, total_frames = message
+        total = total_frames if total_frames else "?"
+        print(f"[{video_name}] {frames_done}/{total} frames")
+
+
+def backfill_videos(
+    video_dir=VIDEO_DIR,
+    people_dir=PEOPLE_DIR,
+    motion_dir=MOTION_RAW_DIR,
+    model_path=DEFAULT_MODEL_PATH,
+    workers=1,
+    stages=STAGES,
+    threads_per_worker=THREADS_PER_WORKER,
+    people_options=None,
+    skip_mode="grab",
+    motion_format="csv",
+    detections_dir=None,
+    gate_options=None,
+    tracker_options=None,
+):
+    unknown = set(stages) - set(STAGES)
+    if unknown:
+        raise ValueError(f"Unknown backfill stages {sorted(unknown)}, expected {STAGES}")
+    if gate_options is not None and tracker_options is not None:
+        raise ValueError("backfill_videos takes either gate_options or tracker_options, not both.")
+
+    if "people" in stages:
+        os.makedirs(people_dir, exist_ok=True)
+        if detections_dir is not None:
+            os.makedirs(detections_dir, exist_ok=True)
+    if "motion" in stages:
+        os.makedirs(motion_dir, exist_ok=True)
+    video_paths = [
+        os.path.join(video_dir, name)
+        for name in sorted(os.listdir(video_dir))
+        if name.lower().endswith(".mp4")
+    ]
+
+    manager = multiprocessing.Manager()
+    progress_queue = manager.Queue()
+    printer = threading.Thread(target=_print_progress, args=(progress_queue,), daemon=True)
+    printer.start()
+
+    task_args = (
+        people_dir,
+        motion_dir,
+        model_path,
+        stages,
+        people_options,
+        skip_mode,
+        motion_format,
+        detections_dir,
+        gate_options,
+        tracker_options,
+    )
+    results = []
+    try:
+        if workers <= 1:
+            _init_worker(progress_queue)
+            for video_path in video_paths:
+                results.append(backfill_video(video_path, *task_args))
+        else:
+            with ProcessPoolExecutor(
+                max_workers=workers,
+                initializer=_init_worker,
+                initargs=(progress_queue, threads_per_worker),
+            ) as pool:
+                futures = {
+                    pool.submit(backfill_video, path, *task_args): path
+                    for path in video_paths
+                }
+                for future in as_completed(futures):
+                    results.append(future.result())
+                    print(f"Finished: {os.path.basename(futures[future])}")
+    finally:
+        _init_worker(None)
+        progress_queue.put(None)
+        printer.join()
+        manager.shutdown()
+
+    return results
+
+
+def run_backfill(
+    video_dir=VIDEO_DIR,
+    workers=1,
+    model_path=DEFAULT_MODEL_PATH,
+    motion_agg_file=MOTION_AGG_FILE,
+    master_file=MASTER_DATASET_FILE,
+    motion_format="csv",
+    detections_dir=None,
+    gate_options=None,
+    tracker_options=None,
+):
+    results = backfill_videos(
+        video_dir=video_dir,
+        workers=workers,
+        model_path=model_path,
+        motion_format=motion_format,
+        detections_dir=detections_dir,
+        gate_options=gate_options,
+        tracker_options=tracker_options,
+    )
+    aggregate_all_motion(input_dir=MOTION_RAW_DIR, output_file=motion_agg_file)
+    build_master_dataset(motion_file=motion_agg_file, people_dir=PEOPLE_DIR, output_file=master_file)
+    return results
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Backfill people and motion outputs for all raw videos.")
+    parser.add_argument("--workers", type=int, default=1, help="number of worker processes")
+    parser.add_argument("--video-dir", default=VIDEO_DIR)
+    parser.add_argument("--model-path", default=DEFAULT_MODEL_PATH)
+    parser.add_argument("--motion-format", choices=("csv", "npy"), default="csv")
+    parser.add_argument(
+        "--detections-dir",
+        default=None,
+        help="also persist raw YOLO detections here for re-counting without inference",
+    )
+    sampling = parser.add_mutually_exclusive_group()
+    sampling.add_argument(
+        "--gated",
+        action="store_true",
+        help="reuse the last people count while the scene is static instead of running YOLO",
+    )
+    sampling.add_argument(
+        "--tracked",
+        action="store_true",
+        help="run YOLO every few seconds and track people in between, adding unique_tracks",
+    )
+    args = parser.parse_args()
+
+    results = run_backfill(
+        video_dir=args.video_dir,
+        workers=args.workers,
+        model_path=args.model_path,
+        motion_format=args.motion_format,
+        detections_dir=args.detections_dir,
+        gate_options={} if args.gated else None,
+        tracker_options={} if args.tracked else None,
+    )
+    for result in results:
+        if "inference_stats" in result:
+            print(f"{os.path.basename(result['people_csv'])}: {result['inference_stats']}")
+    print("Backfill complete.")
@@ -0,0 +1,41 @@
+import os
+from contextlib import contextmanager
+
+try:
+    import fcntl
+except ImportError:  # Windows
+    fcntl = None
+    import msvcrt
+
+PIPELINE_LOCK_FILE = "data/processed/.pipeline.lock"
+
+
+@contextmanager
+def file_lock(path=PIPELINE_LOCK_FILE):
+    """Hold an exclusive cross-process lock on ``path`` for the duration of the block.
+
+    Used to serialise writes to the shared processed files when several
+    analysis jobs run in separate worker processes. The lock is not reentrant.
+    """
+    os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+    with open(path, "a+b") as f:
+        if fcntl is not None:
+            fcntl.flock(f.fileno(), fcntl.LOCK_EX)
+            try:
+                yield
+            finally:
+                fcntl.flock(f.fileno(), fcntl.LOCK_UN)
+            return
+
+        f.seek(0)
+        while True:
+            try:
+                msvcrt.locking(f.fileno(), msvcrt.LK_LOCK, 1)
+                break
+            except OSError:
+                continue
+        try:
+            yield
+        finally:
+            f.seek(0)
+            msvcrt.locking(f.fileno(), msvcrt.LK_UNLCK, 1)
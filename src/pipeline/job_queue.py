@@ -0,0 +1,168 @@
+import json
+import multiprocessing
+import os
+import time
+import traceback
+import uuid
+from concurrent.futures import ProcessPoolExecutor
+
+JOBS_DIR = "data/jobs"
+JOB_WORKERS = 2
+ACTIVE_STATUSES = ("queued", "running")
+# Share of the progress bar given to frame analysis; the remaining stages are
+# short table updates.
+FRAMES_PROGRESS_SHARE = 0.9
+# Live congestion events kept in the job file for the dashboard.
+CONGESTION_EVENTS_KEPT = 20
+
+# Each job is one JSON file in JOBS_DIR, so job state survives browser
+# refreshes and dashboard restarts, and every session sees every operator's
+# jobs. The submitting process only creates the file; afterwards the worker
+# process running the job is its only writer.
+
+
+def _job_path(jobs_dir, job_id):
+    return os.path.join(jobs_dir, f"{job_id}.json")
+
+
+def read_job(job_id, jobs_dir=JOBS_DIR):
+    try:
+        with open(_job_path(jobs_dir, job_id), encoding="utf-8") as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return None
+
+
+def _write_job(job, jobs_dir):
+    path = _job_path(jobs_dir, job["id"])
+    tmp_path = f"{path}.tmp"
+    with open(tmp_path, "w", encoding="utf-8") as f:
+        json.dump(job, f, indent=1, default=str)
+    os.replace(tmp_path, path)
+
+
+def _update_job(job, jobs_dir, **changes):
+    job.update(changes)
+    _write_job(job, jobs_dir)
+
+
+def list_jobs(jobs_dir=JOBS_DIR, limit=None):
+    if not os.path.isdir(jobs_dir):
+        return []
+    jobs = []
+    for file_name in os.listdir(jobs_dir):
+        if file_name.endswith(".json"):
+            job = read_job(file_name[: -len(".json")], jobs_dir)
+            if job is not None:
+                jobs.append(job)
+    jobs.sort(key=lambda job: job["created_at"], reverse=True)
+    return jobs[:limit] if limit is not None else jobs
+
+
+def _init_job_worker(threads):
+    from src.pipeline.backfill import limit_worker_threads
+
+    limit_worker_threads(threads)
+
+
+def run_job(job_id, jobs_dir=JOBS_DIR):
+    """Run one queued analysis job in the current process, recording progress in its job file."""
+    # Imported here so the dashboard process does not load the pipeline
+    # (YOLO, sklearn) just to enqueue and poll jobs.
+    from src.pipeline.video_workflow import run_analysis_for_video, self_train_after_upload
+
+    job = read_job(job_id, jobs_dir)
+    _update_job(job, jobs_dir, status="running", stage="starting", started_at=time.time(), pid=os.getpid())
+
+    def on_progress(stage, frames_done, total_frames):
+        changes = {"stage": stage}
+        if stage == "frames":
+            changes.update(frames_done=frames_done, total_frames=total_frames)
+            if total_frames:
+                changes["progress"] = FRAMES_PROGRESS_SHARE * min(frames_done / total_frames, 1.0)
+        else:
+            changes["progress"] = max(job.get("progress", 0.0), FRAMES_PROGRESS_SHARE)
+        _update_job(job, jobs_dir, **changes)
+
+    def on_congestion(event):
+        events = job.get("congestion_events", [])[-(CONGESTION_EVENTS_KEPT - 1):]
+        _update_job(
+            job,
+            jobs_dir,
+            congestion_events=events + [event],
+            congestion_open=event if event["event"] == "open" else None,
+        )
+
+    try:
+        result = run_analysis_for_video(
+            job["video_path"],
+            progress_callback=on_progress,
+            congestion_callback=on_congestion,
+        )
+        if job["self_train"]:
+            on_progress("self_train", None, None)
+            result["self_train"] = self_train_after_upload(job["video_name"])
+    except Exception as exc:
+        _update_job(
+            job,
+            jobs_dir,
+            status="failed",
+            error=str(exc),
+            traceback=traceback.format_exc(),
+            finished_at=time.time(),
+        )
+        return job
+
+    _update_job(job, jobs_dir, status="done", stage="done", progress=1.0, result=result, finished_at=time.time())
+    return job
+
+
+class JobQueue:
+    """Local queue that runs video analysis jobs in a pool of worker processes.
+
+    Jobs still queued or running when the previous queue stopped (e.g. the
+    dashboard was restarted) are resubmitted when the queue is created.
+    """
+
+    def __init__(self, jobs_dir=JOBS_DIR, workers=JOB_WORKERS, threads_per_worker=None):
+        self.jobs_dir = jobs_dir
+        os.makedirs(jobs_dir, exist_ok=True)
+        if threads_per_worker is None:
+            threads_per_worker = max(1, (os.cpu_count() or 1) // workers)
+        # Spawned rather than forked: the dashboard process runs threads.
+        self._pool = ProcessPoolExecutor(
+            max_workers=workers,
+            mp_context=multiprocessing.get_context("spawn"),
+            initializer=_init_job_worker,
+            initargs=(threads_per_worker,),
+        )
+        for job in list_jobs(jobs_dir):
+            if job["status"] in ACTIVE_STATUSES:
+                _update_job(job, jobs_dir, status="queued", stage="queued")
+                self._pool.submit(run_job, job["id"], jobs_dir)
+
+    def submit(self, video_path, video_name, self_train=False):
+        job = {
+            "id": f"{time.strftime('%Y%m%d-%H%M%S')}-{uuid.uuid4().hex[:8]}",
+            "video_path": str(video_path),
+            "video_name": video_name,
+            "self_train": bool(self_train),
+            "status": "queued",
+            "stage": "queued",
+            "progress": 0.0,
+            "frames_done": 0,
+            "total_frames": None,
+            "created_at": time.time(),
+        }
+        _write_job(job, self.jobs_dir)
+        self._pool.submit(run_job, job["id"], self.jobs_dir)
+        return job["id"]
+
+    def get(self, job_id):
+        return read_job(job_id, self.jobs_dir)
+
+    def list_jobs(self, limit=None):
+        return list_jobs(self.jobs_dir, limit=limit)
+
+    def shutdown(self, wait=True):
+        self._pool.shutdown(wait=wait)
@@ -0,0 +1,494 @@
+import argparse
+import csv
+import json
+import os
+import queue
+import re
+import threading
+import time
+from collections import defaultdict
+from datetime import datetime
+from pathlib import Path
+
+import cv2
+
+from src.analysis.congestion_detection import (
+    DURATION_THRESHOLD,
+    EXIT_THRESHOLD,
+    GAP_TOLERANCE,
+    PEOPLE_THRESHOLD,
+    CongestionDetector,
+)
+from src.detection.yolo_people_detection import DEFAULT_MODEL_PATH, DEFAULT_SAMPLE_HZ, count_people_batch
+from src.ml_pipeline.model_registry import get_yolo_model
+from src.pipeline.file_lock import file_lock
+from src.preprocessing.aggregate_motion import FIELDNAMES as MOTION_FIELDNAMES
+from src.preprocessing.aggregate_motion import StreamingMotionAggregator
+from src.preprocessing.csv_video_index import append_csv_video_rows
+from src.preprocessing.frame_engine import TimestampSampler, frame_second, video_fps
+from src.preprocessing.merge_motion_people import FIELDNAMES as MASTER_FIELDNAMES
+from src.preprocessing.motion_analysis import MotionConsumer
+from src.storage.sqlite_store import upsert_rows
+
+PEOPLE_DIR = "data/processed/people_per_second"
+MOTION_AGG_FILE = "data/processed/motion_aggregated.csv"
+MASTER_DATASET_FILE = "data/processed/master_dataset.csv"
+METRICS_DIR = "data/processed/live"
+FRAME_RESIZE = (640, 360)
+# Queue bounds, in frames. For cameras and streams (and files replayed with
+# ``realtime``) a stage that falls behind has its oldest queued frame dropped
+# so the pipeline keeps working on the most recent footage; plain file sources
+# block the reader instead, so every frame is analysed.
+MOTION_QUEUE_FRAMES = 50
+DETECTION_QUEUE_FRAMES = 4
+FLUSH_SECONDS = 0.5
+LAG_WINDOW = 300
+COUNTERS = (
+    "frames_read",
+    "motion_frames",
+    "motion_dropped",
+    "detection_frames",
+    "detection_dropped",
+    "seconds_written",
+    "seconds_without_detection",
+    "congestion_open",
+    "congestion_close",
+)
+
+# Stream seconds are counted from the first frame (frame_id / fps), like
+# uploaded videos, so live rows line up with the rest of the pipeline.
+
+
+def live_video_name(source, started_at=None):
+    """Name a live session ``live_<source>_<start time>`` so restarts never collide."""
+    source = str(source)
+    if source.isdigit():
+        label = f"camera{source}"
+    elif "://" in source:
+        label = source.split("://", 1)[1].split("/", 1)[0]
+    else:
+        label = Path(source).stem
+    label = re.sub(r"[^A-Za-z0-9_-]+", "_", label).strip("_") or "stream"
+    stamp = datetime.fromtimestamp(started_at or time.time()).strftime("%Y%m%d_%H%M%S")
+    return f"live_{label}_{stamp}"
+
+
+def is_live_source(source):
+    """Camera indexes and URLs produce frames whether or not anyone keeps up; files wait."""
+    source = str(source)
+    return source.isdigit() or "://" in source
+
+
+def _open_source(source):
+    cap = cv2.VideoCapture(int(source) if str(source).isdigit() else str(source))
+    if not cap.isOpened():
+        raise RuntimeError(f"Could not open stream: {source}")
+    return cap
+
+
+class LiveIngest:
+    """Continuously analyse a ``cv2.VideoCapture`` source (RTSP URL, device index or file).
+
+    Decoding, MOG2 motion and sampled YOLO detection run in their own threads,
+    connected by bounded queues. For live sources (see ``is_live_source``) and
+    ``realtime`` replays a full queue drops its oldest frame; for other files
+    the reader waits for the workers instead. A
+    writer appends each completed second to the people CSV, motion_aggregated
+    and master_dataset (or the SQLite tables when ``db_path`` is set) and feeds
+    the congestion detector.
+
+    A second is written once the decoder has moved past it and both workers
+    have finished its frames. If every detection sample of a second was
+    dropped, the last detected count is repeated. ``metrics()`` reports frame
+    and drop counts, queue depths and the end-to-end lag: the time from
+    decoding a second's last frame to appending its row.
+
+    ``realtime`` paces file sources at their frame rate, as a stand-in for a camera.
+    """
+
+    def __init__(
+        self,
+        source,
+        video_name=None,
+        model_path=DEFAULT_MODEL_PATH,
+        sample_hz=DEFAULT_SAMPLE_HZ,
+        resize=FRAME_RESIZE,
+        realtime=False,
+        batch_size=1,
+        imgsz=None,
+        people_dir=PEOPLE_DIR,
+        motion_file=MOTION_AGG_FILE,
+        master_file=MASTER_DATASET_FILE,
+        db_path=None,
+        metrics_dir=METRICS_DIR,
+        on_congestion=None,
+    ):
+        self.source = source
+        self.video_name = video_name or live_video_name(source)
+        self.model_path = model_path
+        self.sample_hz = sample_hz
+        self.resize = resize
+        self.realtime = realtime
+        self.drop_frames = realtime or is_live_source(source)
+        self.batch_size = max(int(batch_size), 1)
+        self.imgsz = imgsz
+        self.people_csv = os.path.join(people_dir, f"{self.video_name}_people.csv")
+        self.motion_file = motion_file
+        self.master_file = master_file
+        self.db_path = db_path
+        self.metrics_path = os.path.join(metrics_dir, f"{self.video_name}_metrics.json") if metrics_dir else None
+        self.on_congestion = on_congestion
+        self.congestion = CongestionDetector(
+            self.video_name,
+            enter_threshold=PEOPLE_THRESHOLD,
+            min_duration=DURATION_THRESHOLD,
+            exit_threshold=EXIT_THRESHOLD,
+            gap_tolerance=GAP_TOLERANCE,
+        )
+
+        self._motion_queue = queue.Queue(maxsize=MOTION_QUEUE_FRAMES)
+        self._detection_queue = queue.Queue(maxsize=DETECTION_QUEUE_FRAMES)
+        self._stop = threading.Event()
+        self._lock = threading.Lock()
+        self._errors = []
+
+        self._motion_rows = {}
+        self._people_counts = {}
+        self._pending_samples = defaultdict(int)
+        self._capture_time = {}
+        self._read_second = -1
+        self._motion_second = -1
+        self._reader_done = False
+        self._motion_done = False
+        self._next_second = None
+        self._last_people = 0
+        self._lags = []
+        self._counters = dict.fromkeys(COUNTERS, 0)
+        self._started = None
+
+    # --- stage threads -------------------------------------------------
+
+    def _count(self, name, amount=1):
+        with self._lock:
+            self._counters[name] += amount
+
+    def _put(self, stage_queue, item, stage):
+        """Queue ``item``, dropping old frames for live sources and waiting for the worker otherwise."""
+        if self.drop_frames:
+            self._offer(stage_queue, item, stage)
+            return
+        while not self._stop.is_set():
+            try:
+                stage_queue.put(item, timeout=FLUSH_SECONDS)
+                return
+            except queue.Full:
+                pass
+        # A failed worker no longer drains its queue.
+        self._offer(stage_queue, item, stage)
+
+    def _offer(self, stage_queue, item, stage):
+        """Queue ``item`` without blocking, dropping the oldest queued frame if the queue is full."""
+        while True:
+            try:
+                stage_queue.put_nowait(item)
+                return
+            except queue.Full:
+                pass
+            try:
+                dropped = stage_queue.get_nowait()
+            except queue.Empty:
+                continue
+            with self._lock:
+                self._counters[f"{stage}_dropped"] += 1
+                if stage == "detection":
+                    self._pending_samples[dropped[1]] -= 1
+
+    def _read_frames(self, cap, fps, max_seconds):
+        sampler = TimestampSampler(fps, self.sample_hz)
+        frame_id = 0
+        started = time.monotonic()
+        try:
+            while not self._stop.is_set():
+                if self.realtime:
+                    delay = started + frame_id / fps - time.monotonic()
+                    if delay > 0:
+                        time.sleep(delay)
+                ret, frame = cap.read()
+                if not ret:
+                    break
+                frame_id += 1
+                second = frame_second(frame_id, fps)
+                if max_seconds is not None and second >= max_seconds:
+                    break
+                frame = cv2.resize(frame, self.resize)
+                captured = time.monotonic()
+
+                with self._lock:
+                    self._counters["frames_read"] += 1
+                    self._capture_time[second] = captured
+                    self._read_second = second
+                    if sampler.due(frame_id):
+                        self._pending_samples[second] += 1
+                        sampled = True
+                    else:
+                        sampled = False
+                self._put(self._motion_queue, (frame_id, frame), "motion")
+                if sampled:
+                    self._put(self._detection_queue, (frame_id, second, frame), "detection")
+        finally:
+            cap.release()
+            with self._lock:
+                self._reader_done = True
+            self._put(self._motion_queue, None, "motion")
+            self._put(self._detection_queue, None, "detection")
+
+    def _run_motion(self, fps):
+        def on_row(row):
+            with self._lock:
+                self._motion_rows[row["second"]] = row
+
+        consumer = MotionConsumer(aggregator=StreamingMotionAggregator(self.video_name, on_row=on_row))
+        consumer.start(fps)
+        try:
+            while True:
+                item = self._motion_queue.get()
+                if item is None:
+                    break
+                frame_id, frame = item
+                consumer.process(frame_id, frame)
+                with self._lock:
+                    self._counters["motion_frames"] += 1
+                    # The aggregator emits a second when the next one starts.
+                    self._motion_second = frame_second(frame_id, fps) - 1
+        finally:
+            consumer.finish()
+            with self._lock:
+                self._motion_done = True
+
+    def _run_detection(self):
+        model = get_yolo_model(self.model_path)
+        finished = False
+        while not finished:
+            batch = []
+            item = self._detection_queue.get()
+            while item is not None:
+                batch.append(item)
+                if len(batch) >= self.batch_size:
+                    break
+                try:
+                    item = self._detection_queue.get_nowait()
+                except queue.Empty:
+                    break
+            finished = item is None
+            if not batch:
+                continue
+
+            _, seconds, frames = zip(*batch)
+            counts = count_people_batch(model, frames, self.imgsz)
+            with self._lock:
+                self._counters["detection_frames"] += len(batch)
+                for second, people_count in zip(seconds, counts):
+                    self._people_counts[second] = max(self._people_counts.get(second, 0), people_count)
+                    self._pending_samples[second] -= 1
+
+    def _guarded(self, target, *args):
+        def run():
+            try:
+                target(*args)
+            except Exception as exc:
+                self._errors.append(exc)
+                self._stop.set()
+
+        return run
+
+    # --- writer ---------------------------------------------------------
+
+    def _ready_seconds(self):
+        """Pop the rows of every second that no stage will touch again."""
+        ready = []
+        with self._lock:
+            if self._next_second is None:
+                if not self._capture_time:
+                    return ready
+                self._next_second = min(self._capture_time)
+            # Seconds before the one being decoded (all of them once the
+            # source ended) and already passed by the motion worker.
+            end_second = self._read_second + 1 if self._reader_done else self._read_second
+            motion_second = self._read_second if self._motion_done else self._motion_second
+            while (
+                self._next_second < end_second
+                and self._next_second <= motion_second
+                and self._pending_samples.get(self._next_second, 0) <= 0
+            ):
+                second = self._next_second
+                self._next_second += 1
+                captured = self._capture_time.pop(second, None)
+                if captured is None:
+                    continue
+                self._pending_samples.pop(second, None)
+                ready.append(
+                    (second, captured, self._motion_rows.pop(second, None), self._people_counts.pop(second, None))
+                )
+        return ready
+
+    def _write_seconds(self, ready):
+        people_rows, motion_rows, master_rows = [], [], []
+        for second, _, motion_row, people_count in ready:
+            if people_count is None:
+                people_count = self._last_people
+                self._count("seconds_without_detection")
+            self._last_people = people_count
+            people_rows.append([self.video_name, second, people_count])
+            if motion_row is not None:
+                motion_rows.append(motion_row)
+            master_rows.append(
+                {
+                    "video": self.video_name,
+                    "second": second,
+                    "avg_motion_ratio": round(motion_row["avg_motion_ratio"], 6) if motion_row else 0.0,
+                    "motion_std": round(motion_row["motion_std"], 6) if motion_row else 0.0,
+                    "people_count": people_count,
+                }
+            )
+
+        # The people CSV belongs to this stream alone; the shared tables are
+        # locked against pipeline runs for uploaded videos.
+        new_file = not os.path.exists(self.people_csv)
+        with open(self.people_csv, "a", newline="", encoding="utf-8") as f:
+            writer = csv.writer(f)
+            if new_file:
+                writer.writerow(["video", "second", "people_count"])
+            writer.writerows(people_rows)
+        with file_lock():
+            if self.db_path is not None:
+                upsert_rows("motion_aggregated", motion_rows, db_path=self.db_path)
+                upsert_rows("master_dataset", master_rows, db_path=self.db_path)
+            else:
+                for output_file, fieldnames, rows in (
+                    (self.motion_file, MOTION_FIELDNAMES, motion_rows),
+                    (self.master_file, MASTER_FIELDNAMES, master_rows),
+                ):
+                    if rows and not append_csv_video_rows(output_file, self.video_name, fieldnames, rows):
+                        raise RuntimeError(f"{output_file} is not laid out by video; rebuild it before live ingestion")
+
+        written = time.monotonic()
+        for (second, captured, _, _), people_row in zip(ready, people_rows):
+            self._lags.append(written - captured)
+            for event in self.congestion.update(second, people_row[2]):
+                self._congestion_event(event)
+        del self._lags[:-LAG_WINDOW]
+        self._count("seconds_written", len(ready))
+
+    def _congestion_event(self, event):
+        self._count(f"congestion_{event['event']}")
+        if self.on_congestion is not None:
+            self.on_congestion(event)
+
+    def metrics(self):
+        lags = list(self._lags)
+        metrics = {
+            "video": self.video_name,
+            "source": str(self.source),
+            "running": self._started is not None and not self._stop.is_set(),
+            "uptime_s": round(time.monotonic() - self._started, 1) if self._started else 0.0,
+            "motion_queue": self._motion_queue.qsize(),
+            "detection_queue": self._detection_queue.qsize(),
+            "lag_s": round(lags[-1], 3) if lags else None,
+            "lag_mean_s": round(sum(lags) / len(lags), 3) if lags else None,
+            "lag_max_s": round(max(lags), 3) if lags else None,
+            "congested": self.congestion.opened,
+            "drop_frames": self.drop_frames,
+        }
+        with self._lock:
+            metrics.update(self._counters)
+        return metrics
+
+    def _write_metrics(self):
+        if self.metrics_path is None:
+            return
+        os.makedirs(os.path.dirname(self.metrics_path), exist_ok=True)
+        tmp_path = f"{self.metrics_path}.tmp"
+        with open(tmp_path, "w", encoding="utf-8") as f:
+            json.dump(self.metrics(), f, indent=1)
+        os.replace(tmp_path, self.metrics_path)
+
+    # --- control --------------------------------------------------------
+
+    def stop(self):
+        self._stop.set()
+
+    def run(self, max_seconds=None, on_metrics=None):
+        """Ingest until the source ends, ``stop()`` is called or ``max_seconds`` of stream time pass."""
+        os.makedirs(os.path.dirname(self.people_csv), exist_ok=True)
+        cap = _open_source(self.source)
+        fps = video_fps(cap)
+        self._started = time.monotonic()
+        threads = [
+            threading.Thread(target=self._guarded(self._read_frames, cap, fps, max_seconds), name="live-read"),
+            threading.Thread(target=self._guarded(self._run_motion, fps), name="live-motion"),
+            threading.Thread(target=self._guarded(self._run_detection), name="live-detect"),
+        ]
+        for thread in threads:
+            thread.daemon = True
+            thread.start()
+
+        try:
+            while any(thread.is_alive() for thread in threads):
+                time.sleep(FLUSH_SECONDS)
+                ready = self._ready_seconds()
+                if ready:
+                    self._write_seconds(ready)
+                self._write_metrics()
+                if on_metrics is not None:
+                    on_metrics(self.metrics())
+        except KeyboardInterrupt:
+            self.stop()
+        finally:
+            self._stop.set()
+            for thread in threads:
+                thread.join()
+
+        if self._errors:
+            raise self._errors[0]
+        ready = self._ready_seconds()
+        if ready:
+            self._write_seconds(ready)
+        for event in self.congestion.finish():
+            self._congestion_event(event)
+        self._write_metrics()
+        return self.metrics()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Ingest a live camera or stream into the per-second outputs.")
+    parser.add_argument("source", help="RTSP/HTTP URL, camera index or video file")
+    parser.add_argument("--name", default=None, help="Video name for the rows (default: live_<source>_<time>)")
+    parser.add_argument("--model", default=DEFAULT_MODEL_PATH)
+    parser.add_argument("--sample-hz", type=float, default=DEFAULT_SAMPLE_HZ)
+    parser.add_argument("--batch-size", type=int, default=1)
+    parser.add_argument("--realtime", action="store_true", help="Replay a file at its frame rate")
+    parser.add_argument("--max-seconds", type=int, default=None)
+    parser.add_argument("--db", default=None, help="Write motion and master rows to this SQLite database")
+    args = parser.parse_args()
+
+    ingest = LiveIngest(
+        args.source,
+        video_name=args.name,
+        model_path=args.model,
+        sample_hz=args.sample_hz,
+        batch_size=args.batch_size,
+        realtime=args.realtime,
+        db_path=args.db,
+        on_congestion=lambda event: print(f"congestion {event['event']}: {event}"),
+    )
+    print(f"Ingesting {args.source} as {ingest.video_name}")
+    final = ingest.run(
+        max_seconds=args.max_seconds,
+        on_metrics=lambda m: print(
+            f"\r{m['seconds_written']}s written, lag {m['lag_s']}s, "
+            f"dropped {m['motion_dropped']}/{m['detection_dropped']} frames",
+            end="",
+        ),
+    )
+    print()
+    print(json.dumps(final, indent=1))
@@ -0,0 +1,178 @@
+import argparse
+import math
+import os
+from concurrent.futures import ProcessPoolExecutor
+
+import numpy as np
+
+from src.detection.yolo_people_detection import DEFAULT_MODEL_PATH, PeopleConsumer
+from src.ml_pipeline.model_registry import get_yolo_model
+from src.pipeline.backfill import THREADS_PER_WORKER, limit_worker_threads
+from src.preprocessing.frame_engine import open_video, run_frame_engine, video_fps, video_frame_count
+from src.preprocessing.motion_analysis import MotionConsumer
+
+# MOG2 keeps history=500 frames (20 s at 25 fps); each shard replays this much
+# video before its first written frame so edge motion ratios match a single pass.
+DEFAULT_WARMUP_SECONDS = 20
+
+
+def plan_shards(total_frames, fps, shard_count, warmup_seconds=DEFAULT_WARMUP_SECONDS):
+    """Split ``total_frames`` into contiguous shards that start on whole-second boundaries.
+
+    Aligning boundaries to seconds keeps every per-second row inside a single
+    shard, so joined outputs never contain a second split across workers.
+    """
+    total_seconds = total_frames / fps
+    shard_count = max(1, min(int(shard_count), int(total_seconds) or 1))
+    warmup_frames = int(round(warmup_seconds * fps))
+
+    boundaries = []
+    for i in range(shard_count):
+        second = int(round(i * total_seconds / shard_count))
+        boundaries.append(max(1, math.ceil(second * fps - 1e-6)))
+    boundaries = sorted(set(boundaries))
+
+    shards = []
+    for i, start_frame in enumerate(boundaries):
+        end_frame = boundaries[i + 1] - 1 if i + 1 < len(boundaries) else total_frames
+        shards.append(
+            {
+                "index": i,
+                "start_frame": start_frame,
+                "end_frame": end_frame,
+                "warmup_frames": min(warmup_frames, start_frame - 1),
+            }
+        )
+    return shards
+
+
+def _shard_path(path, index):
+    root, ext = os.path.splitext(path)
+    return f"{root}.shard{index:03d}{ext}"
+
+
+def analyze_shard(
+    video_path,
+    shard,
+    people_csv=None,
+    motion_csv=None,
+    model_path=DEFAULT_MODEL_PATH,
+    resize=(640, 360),
+    people_options=None,
+):
+    video_name = os.path.splitext(os.path.basename(video_path))[0]
+    outputs = {}
+    consumers = []
+
+    if motion_csv is not None:
+        outputs["motion_csv"] = _shard_path(motion_csv, shard["index"])
+        consumers.append(MotionConsumer(outputs["motion_csv"]))
+    if people_csv is not None:
+        outputs["people_csv"] = _shard_path(people_csv, shard["index"])
+        consumers.append(
+            PeopleConsumer(
+                outputs["people_csv"],
+                video_name,
+                get_yolo_model(model_path),
+                **(people_options or {}),
+            )
+        )
+
+    run_frame_engine(
+        video_path,
+        consumers,
+        resize=resize,
+        start_frame=shard["start_frame"],
+        end_frame=shard["end_frame"],
+        warmup_frames=shard["warmup_frames"],
+    )
+    return outputs
+
+
+def join_shard_csvs(shard_paths, output_path):
+    if str(output_path).endswith(".npy"):
+        np.save(output_path, np.concatenate([np.load(path) for path in shard_paths]))
+        for path in shard_paths:
+            os.remove(path)
+        return output_path
+
+    with open(output_path, "w", newline="", encoding="utf-8") as out:
+        for i, shard_path in enumerate(shard_paths):
+            with open(shard_path, newline="", encoding="utf-8") as f:
+                header = f.readline()
+                if i == 0:
+                    out.write(header)
+                for line in f:
+                    out.write(line)
+            os.remove(shard_path)
+    return output_path
+
+
+def analyze_video_sharded(
+    video_path,
+    people_csv=None,
+    motion_csv=None,
+    shards=None,
+    warmup_seconds=DEFAULT_WARMUP_SECONDS,
+    model_path=DEFAULT_MODEL_PATH,
+    resize=(640, 360),
+    people_options=None,
+    threads_per_worker=THREADS_PER_WORKER,
+):
+    if people_csv is None and motion_csv is None:
+        raise ValueError("At least one of people_csv or motion_csv is required.")
+
+    cap = open_video(video_path)
+    fps = video_fps(cap)
+    total_frames = video_frame_count(cap)
+    cap.release()
+    if total_frames is None:
+        raise RuntimeError(f"Cannot shard a video without a frame count: {video_path}")
+
+    plan = plan_shards(total_frames, fps, shards or os.cpu_count() or 1, warmup_seconds)
+    with ProcessPoolExecutor(
+        max_workers=len(plan),
+        initializer=limit_worker_threads,
+        initargs=(threads_per_worker,),
+    ) as pool:
+        futures = [
+            pool.submit(
+                analyze_shard,
+                video_path,
+                shard,
+                people_csv,
+                motion_csv,
+                model_path,
+                resize,
+                people_options,
+            )
+            for shard in plan
+        ]
+        # Collect in submission order so joined rows stay sorted by frame.
+        results = [future.result() for future in futures]
+
+    outputs = {"shards": len(plan)}
+    if motion_csv is not None:
+        outputs["motion_csv"] = join_shard_csvs([r["motion_csv"] for r in results], motion_csv)
+    if people_csv is not None:
+        outputs["people_csv"] = join_shard_csvs([r["people_csv"] for r in results], people_csv)
+    return outputs
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Analyze one long video in parallel time shards.")
+    parser.add_argument("video_path")
+    parser.add_argument("--people-csv")
+    parser.add_argument("--motion-csv")
+    parser.add_argument("--shards", type=int, default=None)
+    parser.add_argument("--warmup-seconds", type=float, default=DEFAULT_WARMUP_SECONDS)
+    args = parser.parse_args()
+
+    result = analyze_video_sharded(
+        args.video_path,
+        people_csv=args.people_csv,
+        motion_csv=args.motion_csv,
+        shards=args.shards,
+        warmup_seconds=args.warmup_seconds,
+    )
+    print(f"Sharded analysis complete ({result['shards']} shards).")
@@ -0,0 +1,121 @@
+import hashlib
+import importlib.util
+import json
+import os
+
+from src.pipeline.file_lock import file_lock
+
+CACHE_FILE = "data/processed/stage_cache.json"
+HASH_CHUNK_BYTES = 1 << 20
+
+
+def _sha256(parts):
+    digest = hashlib.sha256()
+    digest.update(json.dumps(parts, sort_keys=True, default=str).encode("utf-8"))
+    return digest.hexdigest()
+
+
+def hash_bytes(data):
+    return hashlib.sha256(data).hexdigest()
+
+
+def module_version(*module_names):
+    """Fingerprint the source of the given modules so code changes invalidate their stages.
+
+    The source file is located without importing the module, so stages that
+    have not run yet in this process are fingerprinted too.
+    """
+    digest = hashlib.sha256()
+    for name in module_names:
+        spec = importlib.util.find_spec(name)
+        if spec is None or spec.origin is None:
+            raise ModuleNotFoundError(f"Cannot fingerprint {name}: module source not found", name=name)
+        with open(spec.origin, "rb") as f:
+            digest.update(f.read())
+    return digest.hexdigest()
+
+
+class StageCache:
+    """Per-video record of the fingerprint each pipeline stage last ran with.
+
+    A fingerprint combines the stage's input file hashes, parameters, code
+    version and the fingerprint of the stage before it, so changing anything
+    upstream re-runs every later stage. File hashes are memoised by path, size
+    and mtime so hour-long videos are only hashed once.
+    """
+
+    def __init__(self, cache_file=CACHE_FILE):
+        self.cache_file = cache_file
+        self._data = self._load()
+
+    def _load(self):
+        if os.path.exists(self.cache_file):
+            try:
+                with open(self.cache_file, encoding="utf-8") as f:
+                    return json.load(f)
+            except (OSError, ValueError):
+                pass
+        return {"files": {}, "stages": {}}
+
+    def save(self):
+        os.makedirs(os.path.dirname(self.cache_file) or ".", exist_ok=True)
+        tmp_path = f"{self.cache_file}.tmp"
+        with open(tmp_path, "w", encoding="utf-8") as f:
+            json.dump(self._data, f, indent=1, sort_keys=True)
+        os.replace(tmp_path, self.cache_file)
+
+    def file_hash(self, path):
+        if not os.path.exists(path):
+            return None
+        stat = os.stat(path)
+        key = os.path.abspath(path)
+        entry = self._data["files"].get(key)
+        if entry and entry["size"] == stat.st_size and entry["mtime_ns"] == stat.st_mtime_ns:
+            return entry["sha256"]
+
+        digest = hashlib.sha256()
+        with open(path, "rb") as f:
+            for chunk in iter(lambda: f.read(HASH_CHUNK_BYTES), b""):
+                digest.update(chunk)
+        self._data["files"][key] = {
+            "size": stat.st_size,
+            "mtime_ns": stat.st_mtime_ns,
+            "sha256": digest.hexdigest(),
+        }
+        return digest.hexdigest()
+
+    def fingerprint(self, upstream=None, input_files=(), params=None, code=None):
+        return _sha256(
+            {
+                "upstream": upstream,
+                "inputs": {os.path.basename(path): self.file_hash(path) for path in input_files},
+                "params": params or {},
+                "code": code,
+            }
+        )
+
+    def is_fresh(self, video_name, stage, fingerprint):
+        return self._data["stages"].get(video_name, {}).get(stage) == fingerprint
+
+    def _update(self, change):
+        # Other worker processes may have recorded stages since this cache was
+        # loaded, so merge into the file's current contents under a lock.
+        with file_lock(f"{self.cache_file}.lock"):
+            latest = self._load()
+            latest["files"].update(self._data["files"])
+            change(latest["stages"])
+            self._data = latest
+            self.save()
+
+    def record(self, video_name, stage, fingerprint):
+        def change(stages):
+            stages.setdefault(video_name, {})[stage] = fingerprint
+
+        self._update(change)
+
+    def record_file_hashes(self):
+        """Persist the file hashes computed so far, e.g. for an upload matched by hash."""
+        self._update(lambda stages: None)
+
+    def invalidate(self, video_name):
+        self._update(lambda stages: stages.pop(video_name, None))
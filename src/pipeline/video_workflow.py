@@ -1,37 +1,70 @@
 import os
 from pathlib import Path
 
-import pandas as pd
-from ultralytics import YOLO
-
-from src.analysis.activity_distribution import compute_activity_distribution
-from src.analysis.congestion_detection import upsert_congestion_for_video
-from src.analysis.crowd_statistics import upsert_crowd_statistics_for_video
-from src.analysis.feature_importance import generate_feature_importance_plot
-from src.detection.yolo_people_detection import detect_people_in_video
-from src.ml_pipeline.predict_activity import upsert_predictions_for_video
-from src.ml_pipeline.train_activity_class import (
-    self_train_from_predictions,
-    train_activity_model,
+from src.analysis.activity_distribution import OUTPUT_FILE as ACTIVITY_DIST_FILE
+from src.analysis.activity_distribution import (
+    compute_activity_distribution,
+    upsert_activity_distribution_for_video,
+)
+from src.analysis.congestion_detection import (
+    DURATION_THRESHOLD,
+    EXIT_THRESHOLD,
+    GAP_TOLERANCE,
+    PEOPLE_THRESHOLD,
+    CongestionDetector,
+    upsert_congestion_for_video,
 )
-from src.preprocessing.aggregate_motion import aggregate_motion_csv, upsert_motion_aggregated
+from src.analysis.crowd_statistics import OUTPUT_FILE as CROWD_STATS_FILE
+from src.analysis.crowd_statistics import upsert_crowd_statistics_for_video
+from src.detection.motion_gate import GATE_MAX_REUSE_SECONDS, GATE_MOTION_THRESHOLD, MotionGate
+from src.pipeline.file_lock import file_lock
+from src.pipeline.stage_cache import StageCache, hash_bytes, module_version
+from src.preprocessing.csv_video_index import read_csv_video_rows
 from src.preprocessing.merge_motion_people import upsert_master_dataset_for_video
-from src.preprocessing.motion_analysis import analyze_motion_in_video
+from src.storage.sqlite_store import count_video_rows, export_all_csv
+
+# Stages that need OpenCV, numpy, pandas or sklearn import them when they run,
+# so the dashboard can import this module (to save uploads) without loading
+# the whole analysis stack.
 
 RAW_VIDEO_DIR = "data/raw_videos"
 PEOPLE_DIR = "data/processed/people_per_second"
 MOTION_RAW_DIR = "data/processed/motion_raw"
+DETECTIONS_DIR = "data/processed/detections"
+PYRAMID_DIR = "data/processed/people_pyramid"
 MOTION_AGG_FILE = "data/processed/motion_aggregated.csv"
 MASTER_DATASET_FILE = "data/processed/master_dataset.csv"
 PREDICTIONS_FILE = "data/processed/activity_ml_predictions.csv"
 MODEL_FILE = "models/activity_rf_model.pkl"
 MASTER_LABELED_FILE = "data/processed/master_labeled.csv"
+# Per-second motion rows are aggregated while frames are decoded; the
+# per-frame motion_raw dump is only needed for debugging or re-aggregation,
+# and is then kept in the compact binary format.
+KEEP_MOTION_RAW = False
+MOTION_RAW_FORMAT = "npy"
+# Raw YOLO boxes are kept so people counts can be recomputed with another
+# confidence cutoff or zone without re-running inference (other classes only
+# if they are added to detection_store.STORED_CLASSES).
+KEEP_DETECTIONS = True
+# Set to a SQLite path (e.g. src.storage.sqlite_store.DB_PATH) to upsert into
+# the indexed store instead of rewriting the shared CSVs on every upload.
+DB_PATH = None
+# Small per-video summaries the dashboard reads as CSV in SQLite mode.
+DASHBOARD_TABLES = ("activity_distribution", "crowd_statistics", "congestion_windows")
+FRAME_RESIZE = (640, 360)
+# Reuse the last people count on static seconds instead of running YOLO
+# (see MotionGate); people CSVs then gain a detected/inferred source column.
+MOTION_GATE = False
+# Run YOLO every few seconds and track people in between (see PeopleTracker);
+# people CSVs then gain a unique_tracks column. Not combinable with MOTION_GATE.
+PEOPLE_TRACKING = False
 
 
 def ensure_pipeline_dirs():
     os.makedirs(RAW_VIDEO_DIR, exist_ok=True)
     os.makedirs(PEOPLE_DIR, exist_ok=True)
     os.makedirs(MOTION_RAW_DIR, exist_ok=True)
+    os.makedirs(DETECTIONS_DIR, exist_ok=True)
     os.makedirs("data/processed", exist_ok=True)
     os.makedirs("models", exist_ok=True)
 
@@ -43,52 +76,352 @@ def save_uploaded_video(uploaded_file, video_dir=RAW_VIDEO_DIR):
     if not safe_name:
         safe_name = "uploaded_video"
 
+    data = uploaded_file.getbuffer()
+    upload_hash = hash_bytes(data)
+    cache = StageCache()
+
     target = Path(video_dir) / f"{safe_name}.mp4"
     suffix = 1
     while target.exists():
+        # Re-uploading an identical file reuses the existing video, so its
+        # cached stages can be skipped.
+        if target.stat().st_size == len(data) and cache.file_hash(str(target)) == upload_hash:
+            cache.record_file_hashes()
+            return str(target), target.stem
         target = Path(video_dir) / f"{safe_name}_{suffix}.mp4"
         suffix += 1
 
-    target.write_bytes(uploaded_file.getbuffer())
+    target.write_bytes(data)
     return str(target), target.stem
 
 
-def run_analysis_for_video(video_path, model_path=MODEL_FILE):
+def analyze_video_frames(
+    video_path,
+    people_csv,
+    motion_csv,
+    yolo_model,
+    resize=(640, 360),
+    batch_size=1,
+    imgsz=None,
+    progress_callback=None,
+    motion_aggregator=None,
+    detections_path=None,
+    congestion_callback=None,
+    motion_gate=None,
+    tracker=None,
+):
+    from src.detection.yolo_people_detection import PeopleConsumer
+    from src.preprocessing.frame_engine import run_frame_engine
+    from src.preprocessing.motion_analysis import MotionConsumer
+
+    video_name = Path(video_path).stem
+    detector = None
+    if congestion_callback is not None:
+        detector = CongestionDetector(
+            video_name,
+            enter_threshold=PEOPLE_THRESHOLD,
+            min_duration=DURATION_THRESHOLD,
+            exit_threshold=EXIT_THRESHOLD,
+            gap_tolerance=GAP_TOLERANCE,
+        )
+    consumers = [
+        MotionConsumer(motion_csv, aggregator=motion_aggregator, gate=motion_gate),
+        PeopleConsumer(
+            people_csv,
+            video_name,
+            yolo_model,
+            batch_size=batch_size,
+            imgsz=imgsz,
+            detections_path=detections_path,
+            congestion_detector=detector,
+            on_congestion=congestion_callback,
+            motion_gate=motion_gate,
+            tracker=tracker,
+        ),
+    ]
+    return run_frame_engine(
+        video_path,
+        consumers,
+        resize=resize,
+        progress_callback=progress_callback,
+    )
+
+
+def _has_video_rows(table, csv_file, video_name, db_path):
+    if db_path is not None:
+        return count_video_rows(table, video_name, db_path=db_path) > 0
+    return bool(read_csv_video_rows(csv_file, video_name))
+
+
+def _run_stage(cache, video_name, stage, fingerprint, is_present, run, use_cache, stages_run, progress_callback):
+    if use_cache and cache.is_fresh(video_name, stage, fingerprint) and is_present():
+        return
+    if progress_callback is not None:
+        progress_callback(stage, None, None)
+    run()
+    cache.record(video_name, stage, fingerprint)
+    stages_run.append(stage)
+
+
+def run_analysis_for_video(
+    video_path,
+    model_path=MODEL_FILE,
+    keep_motion_raw=KEEP_MOTION_RAW,
+    db_path=DB_PATH,
+    use_cache=True,
+    progress_callback=None,
+    congestion_callback=None,
+):
+    """Run every analysis stage for one video, skipping stages whose fingerprint is unchanged.
+
+    Each stage's fingerprint chains the previous stage's fingerprint with its
+    own inputs, parameters and code version (see ``StageCache``), so swapping
+    the activity model only re-runs prediction and the analysis after it.
+
+    ``progress_callback(stage, frames_done, total_frames)`` is called when a
+    stage starts and, during frame analysis, as frames are processed. Frame
+    analysis runs unlocked; writes to the shared processed files are
+    serialised with ``file_lock`` so several videos can be analysed at once.
+
+    ``congestion_callback(event)`` receives live congestion open/close events
+    (see ``CongestionDetector``) while frames are analysed.
+    """
+    from src.analysis.people_pyramid import PYRAMID_LEVELS, build_people_pyramid, pyramid_path
+    from src.detection.detection_store import detections_npz_path
+    from src.detection.people_tracker import (
+        TRACK_DETECT_EVERY_SECONDS,
+        TRACK_IOU_THRESHOLD,
+        TRACK_MAX_MISSED,
+        TRACK_SAMPLE_HZ,
+        PeopleTracker,
+    )
+    from src.detection.yolo_people_detection import DEFAULT_MODEL_PATH, DEFAULT_SAMPLE_HZ
+    from src.ml_pipeline.forest_engine import forest_path
+    from src.ml_pipeline.model_registry import get_yolo_model
+    from src.ml_pipeline.predict_activity import upsert_predictions_for_video
+    from src.preprocessing.aggregate_motion import StreamingMotionAggregator, upsert_motion_aggregated
+    from src.preprocessing.motion_analysis import motion_raw_path
+
     ensure_pipeline_dirs()
     video_name = Path(video_path).stem
     people_csv = os.path.join(PEOPLE_DIR, f"{video_name}_people.csv")
-    motion_csv = os.path.join(MOTION_RAW_DIR, f"{video_name}_motion.csv")
+    motion_csv = motion_raw_path(MOTION_RAW_DIR, video_name, MOTION_RAW_FORMAT) if keep_motion_raw else None
+    detections_file = detections_npz_path(DETECTIONS_DIR, video_name) if KEEP_DETECTIONS else None
+    pyramid_file = pyramid_path(PYRAMID_DIR, video_name)
+    cache = StageCache()
+    stages_run = []
+    inference_stats = {}
+    # Load YOLO before fingerprinting: ultralytics downloads missing weights
+    # on first load, and the frames fingerprint must hash the file it used.
+    yolo_model = get_yolo_model(DEFAULT_MODEL_PATH)
+    weights_path = getattr(yolo_model, "ckpt_path", None) or DEFAULT_MODEL_PATH
 
-    yolo_model = YOLO("yolov8n.pt")
-    detect_people_in_video(video_path=video_path, output_csv_path=people_csv, model=yolo_model)
-    analyze_motion_in_video(video_path=video_path, output_csv_path=motion_csv)
+    def run_frames():
+        motion_aggregator = StreamingMotionAggregator(video_name)
+        gate = MotionGate() if MOTION_GATE else None
+        tracker = PeopleTracker() if PEOPLE_TRACKING else None
+        analyze_video_frames(
+            video_path,
+            people_csv,
+            motion_csv,
+            yolo_model,
+            resize=FRAME_RESIZE,
+            motion_aggregator=motion_aggregator,
+            detections_path=detections_file,
+            congestion_callback=congestion_callback,
+            motion_gate=gate,
+            tracker=tracker,
+            progress_callback=(
+                (lambda done, total: progress_callback("frames", done, total)) if progress_callback else None
+            ),
+        )
+        with file_lock():
+            upsert_motion_aggregated(motion_aggregator.rows, output_file=MOTION_AGG_FILE, db_path=db_path)
+        if gate is not None:
+            inference_stats.update(gate.stats())
+        if tracker is not None:
+            inference_stats.update(tracker.stats())
+
+    frames_fp = cache.fingerprint(
+        input_files=[video_path, weights_path],
+        params={
+            "resize": FRAME_RESIZE,
+            "sample_hz": TRACK_SAMPLE_HZ if PEOPLE_TRACKING else DEFAULT_SAMPLE_HZ,
+            "keep_motion_raw": keep_motion_raw,
+            "motion_raw_format": MOTION_RAW_FORMAT,
+            "keep_detections": KEEP_DETECTIONS,
+            "db_path": db_path,
+            "motion_gate": (GATE_MOTION_THRESHOLD, GATE_MAX_REUSE_SECONDS) if MOTION_GATE else None,
+            "tracking": (
+                (TRACK_DETECT_EVERY_SECONDS, TRACK_IOU_THRESHOLD, TRACK_MAX_MISSED) if PEOPLE_TRACKING else None
+            ),
+        },
+        code=module_version(
+            "src.preprocessing.frame_engine",
+            "src.detection.yolo_people_detection",
+            "src.detection.motion_gate",
+            "src.detection.people_tracker",
+            "src.detection.detection_store",
+            "src.preprocessing.motion_analysis",
+            "src.preprocessing.aggregate_motion",
+        ),
+    )
+    _run_stage(
+        cache,
+        video_name,
+        "frames",
+        frames_fp,
+        lambda: os.path.exists(people_csv)
+        and (motion_csv is None or os.path.exists(motion_csv))
+        and (detections_file is None or os.path.exists(detections_file))
+        and _has_video_rows("motion_aggregated", MOTION_AGG_FILE, video_name, db_path),
+        run_frames,
+        use_cache,
+        stages_run,
+        progress_callback,
+    )
+
+    # Only this video's files are written, so no lock is needed.
+    _run_stage(
+        cache,
+        video_name,
+        "pyramid",
+        cache.fingerprint(
+            upstream=frames_fp,
+            params={"levels": PYRAMID_LEVELS},
+            code=module_version("src.analysis.people_pyramid"),
+        ),
+        lambda: os.path.exists(pyramid_file),
+        lambda: build_people_pyramid(people_csv, pyramid_file),
+        use_cache,
+        stages_run,
+        progress_callback,
+    )
 
-    motion_rows = aggregate_motion_csv(motion_csv_path=motion_csv, video_name=video_name)
-    upsert_motion_aggregated(motion_rows, output_file=MOTION_AGG_FILE)
-    upsert_master_dataset_for_video(video_name=video_name, output_file=MASTER_DATASET_FILE)
-    upsert_predictions_for_video(video_name=video_name, model_file=model_path, output_file=PREDICTIONS_FILE)
-    compute_activity_distribution(input_file=PREDICTIONS_FILE)
-    upsert_crowd_statistics_for_video(video_name=video_name)
-    upsert_congestion_for_video(video_name=video_name)
+    with file_lock():
+        merge_fp = cache.fingerprint(
+            upstream=frames_fp,
+            code=module_version("src.preprocessing.merge_motion_people"),
+        )
+        _run_stage(
+            cache,
+            video_name,
+            "merge",
+            merge_fp,
+            lambda: _has_video_rows("master_dataset", MASTER_DATASET_FILE, video_name, db_path),
+            lambda: upsert_master_dataset_for_video(
+                video_name=video_name,
+                people_dir=PEOPLE_DIR,
+                output_file=MASTER_DATASET_FILE,
+                db_path=db_path,
+            ),
+            use_cache,
+            stages_run,
+            progress_callback,
+        )
+
+        predict_fp = cache.fingerprint(
+            upstream=merge_fp,
+            input_files=[model_path, forest_path(model_path)],
+            code=module_version("src.ml_pipeline.predict_activity", "src.ml_pipeline.forest_engine"),
+        )
+        _run_stage(
+            cache,
+            video_name,
+            "predict",
+            predict_fp,
+            lambda: _has_video_rows("activity_ml_predictions", PREDICTIONS_FILE, video_name, db_path),
+            lambda: upsert_predictions_for_video(
+                video_name=video_name,
+                model_file=model_path,
+                output_file=PREDICTIONS_FILE,
+                db_path=db_path,
+            ),
+            use_cache,
+            stages_run,
+            progress_callback,
+        )
 
-    dataset_rows = 0
-    if os.path.exists(MASTER_DATASET_FILE):
-        df = pd.read_csv(MASTER_DATASET_FILE)
-        dataset_rows = int((df["video"] == video_name).sum())
+        def run_distribution():
+            if db_path is not None:
+                upsert_activity_distribution_for_video(video_name, db_path=db_path)
+            else:
+                compute_activity_distribution(input_file=PREDICTIONS_FILE)
+
+        _run_stage(
+            cache,
+            video_name,
+            "activity_distribution",
+            cache.fingerprint(upstream=predict_fp, code=module_version("src.analysis.activity_distribution")),
+            lambda: _has_video_rows("activity_distribution", ACTIVITY_DIST_FILE, video_name, db_path),
+            run_distribution,
+            use_cache,
+            stages_run,
+            progress_callback,
+        )
+
+        def run_crowd_analysis():
+            upsert_crowd_statistics_for_video(video_name=video_name, db_path=db_path)
+            upsert_congestion_for_video(video_name=video_name, db_path=db_path)
+
+        _run_stage(
+            cache,
+            video_name,
+            "crowd_analysis",
+            cache.fingerprint(
+                upstream=frames_fp,
+                params={
+                    "people_threshold": PEOPLE_THRESHOLD,
+                    "duration_threshold": DURATION_THRESHOLD,
+                    "exit_threshold": EXIT_THRESHOLD,
+                    "gap_tolerance": GAP_TOLERANCE,
+                },
+                code=module_version("src.analysis.crowd_statistics", "src.analysis.congestion_detection"),
+            ),
+            lambda: _has_video_rows("crowd_statistics", CROWD_STATS_FILE, video_name, db_path),
+            run_crowd_analysis,
+            use_cache,
+            stages_run,
+            progress_callback,
+        )
+
+        if db_path is not None:
+            if stages_run:
+                export_all_csv(db_path=db_path, tables=DASHBOARD_TABLES)
+            dataset_rows = count_video_rows("master_dataset", video_name, db_path=db_path)
+        else:
+            dataset_rows = len(read_csv_video_rows(MASTER_DATASET_FILE, video_name))
 
     return {
         "video_name": video_name,
         "people_csv": people_csv,
         "motion_csv": motion_csv,
+        "detections": detections_file,
+        "pyramid": pyramid_file,
         "dataset_rows": dataset_rows,
+        "stages_run": stages_run,
+        "inference_stats": inference_stats or None,
     }
 
 
-def self_train_after_upload(video_name):
+def self_train_after_upload(video_name, db_path=DB_PATH):
+    with file_lock():
+        return _self_train(video_name, db_path)
+
+
+def _self_train(video_name, db_path):
+    from src.analysis.feature_importance import generate_feature_importance_plot
+    from src.ml_pipeline.train_activity_class import (
+        RESERVOIR_ROWS,
+        self_train_from_predictions,
+        train_activity_model,
+    )
+
     result = self_train_from_predictions(
         video_name=video_name,
         master_labeled_file=MASTER_LABELED_FILE,
         predictions_file=PREDICTIONS_FILE,
+        db_path=db_path,
     )
     rows_added = result.get("rows_added", 0)
     if rows_added == 0:
@@ -102,6 +435,7 @@ def self_train_after_upload(video_name):
         train_result = train_activity_model(
             input_file=MASTER_LABELED_FILE,
             model_output=MODEL_FILE,
+            max_rows=RESERVOIR_ROWS,
         )
         generate_feature_importance_plot(model_path=MODEL_FILE, data_path=MASTER_LABELED_FILE)
     except Exception as exc:
@@ -113,5 +447,6 @@ def self_train_after_upload(video_name):
     return {
         "rows_added": rows_added,
         "trained": True,
+        "training_rows": train_result["training_rows"],
         "classification_report": train_result["classification_report"],
     }
@@ -1,8 +1,15 @@
 import os
 import csv
+import math
 import statistics
 from collections import defaultdict
 
+import numpy as np
+
+from src.preprocessing.csv_video_index import read_csv_video_rows, splice_csv_video_rows
+from src.preprocessing.motion_store import load_motion_array, motion_video_name
+from src.storage.sqlite_store import replace_video_rows
+
 INPUT_DIR = "data/processed/motion_raw"
 OUTPUT_FILE = "data/processed/motion_aggregated.csv"
 FIELDNAMES = [
@@ -16,9 +23,116 @@ FIELDNAMES = [
 ]
 
 
+def _aggregated_row(video_name, sec, avg_ratio, motion_std, max_ratio, min_ratio):
+    max_ratio = round(max_ratio, 6)
+    min_ratio = round(min_ratio, 6)
+    return {
+        "video": video_name,
+        "second": sec,
+        "avg_motion_ratio": round(avg_ratio, 6),
+        "motion_std": motion_std,
+        "max_motion_ratio": max_ratio,
+        "min_motion_ratio": min_ratio,
+        "motion_range": round(max_ratio - min_ratio, 6),
+    }
+
+
+class StreamingMotionAggregator:
+    """Build motion_aggregated rows while frames are processed.
+
+    Frames arrive in order, so only the current second's running count, sum,
+    Welford M2, min and max are kept; memory stays constant however long the
+    video is. Rows match ``aggregate_motion_csv`` on the equivalent motion_raw
+    CSV. Completed rows go to ``on_row`` if given, otherwise to ``self.rows``.
+    """
+
+    def __init__(self, video_name, on_row=None):
+        self.video_name = video_name
+        self.rows = []
+        self._on_row = on_row if on_row is not None else self.rows.append
+        self._second = None
+
+    def _reset(self, second):
+        self._second = second
+        self._count = 0
+        self._total = 0.0
+        self._mean = 0.0
+        self._m2 = 0.0
+        self._min = math.inf
+        self._max = -math.inf
+
+    def add(self, second, motion_ratio):
+        if second != self._second:
+            self._emit()
+            self._reset(second)
+        self._count += 1
+        self._total += motion_ratio
+        delta = motion_ratio - self._mean
+        self._mean += delta / self._count
+        self._m2 += delta * (motion_ratio - self._mean)
+        self._min = min(self._min, motion_ratio)
+        self._max = max(self._max, motion_ratio)
+
+    def _emit(self):
+        if self._second is None or self._count == 0:
+            return
+        motion_std = round(math.sqrt(self._m2 / self._count), 6) if self._count > 1 else 0
+        self._on_row(
+            _aggregated_row(
+                self.video_name,
+                self._second,
+                self._total / self._count,
+                motion_std,
+                self._max,
+                self._min,
+            )
+        )
+        self._second = None
+
+    def finish(self):
+        self._emit()
+        return self.rows
+
+
+def aggregate_motion_array(motion, video_name):
+    """Vectorized per-second aggregation of a ``MOTION_DTYPE`` array (e.g. a memory map)."""
+    if len(motion) == 0:
+        return []
+
+    seconds = np.asarray(motion["second"])
+    ratios = np.asarray(motion["motion_ratio"], dtype=np.float64)
+    if np.any(seconds[1:] < seconds[:-1]):
+        order = np.argsort(seconds, kind="stable")
+        seconds = seconds[order]
+        ratios = ratios[order]
+
+    starts = np.flatnonzero(np.r_[True, seconds[1:] != seconds[:-1]])
+    counts = np.diff(np.r_[starts, len(seconds)])
+    means = np.add.reduceat(ratios, starts) / counts
+    squared = np.add.reduceat((ratios - np.repeat(means, counts)) ** 2, starts)
+    stds = np.sqrt(squared / counts)
+    maxima = np.maximum.reduceat(ratios, starts)
+    minima = np.minimum.reduceat(ratios, starts)
+
+    rows = []
+    for sec, count, mean, std, max_ratio, min_ratio in zip(
+        seconds[starts].tolist(),
+        counts.tolist(),
+        means.tolist(),
+        stds.tolist(),
+        maxima.tolist(),
+        minima.tolist(),
+    ):
+        motion_std = round(std, 6) if count > 1 else 0
+        rows.append(_aggregated_row(video_name, sec, mean, motion_std, max_ratio, min_ratio))
+    return rows
+
+
 def aggregate_motion_csv(motion_csv_path, video_name=None):
     if video_name is None:
-        video_name = os.path.basename(motion_csv_path).replace("_motion.csv", "")
+        video_name = motion_video_name(motion_csv_path)
+    if motion_csv_path.endswith(".npy"):
+        return aggregate_motion_array(load_motion_array(motion_csv_path), video_name)
 
     second_data = defaultdict(list)
     with open(motion_csv_path, newline="", encoding="utf-8") as f:
@@ -32,27 +146,40 @@ def aggregate_motion_csv(motion_csv_path, video_name=None):
         ratio_vals = second_data[sec]
         if not ratio_vals:
             continue
-        avg_ratio = round(sum(ratio_vals) / len(ratio_vals), 6)
         motion_std = round(statistics.pstdev(ratio_vals), 6) if len(ratio_vals) > 1 else 0
-        max_ratio = round(max(ratio_vals), 6)
-        min_ratio = round(min(ratio_vals), 6)
-        motion_range = round(max_ratio - min_ratio, 6)
         rows.append(
-            {
-                "video": video_name,
-                "second": sec,
-                "avg_motion_ratio": avg_ratio,
-                "motion_std": motion_std,
-                "max_motion_ratio": max_ratio,
-                "min_motion_ratio": min_ratio,
-                "motion_range": motion_range,
-            }
+            _aggregated_row(
+                video_name,
+                sec,
+                sum(ratio_vals) / len(ratio_vals),
+                motion_std,
+                max(ratio_vals),
+                min(ratio_vals),
+            )
         )
     return rows
 
 
-def upsert_motion_aggregated(rows, output_file=OUTPUT_FILE):
+def upsert_motion_aggregated(rows, output_file=OUTPUT_FILE, db_path=None):
+    if db_path is not None:
+        rows_by_video = defaultdict(list)
+        for row in rows:
+            rows_by_video[row["video"]].append(row)
+        for video_name, video_rows in rows_by_video.items():
+            replace_video_rows("motion_aggregated", video_name, video_rows, db_path=db_path)
+        return db_path
+
     os.makedirs(os.path.dirname(output_file), exist_ok=True)
+    videos = {row["video"] for row in rows}
+    if len(videos) == 1:
+        video_name = videos.pop()
+        video_rows = {int(row["second"]): row for row in read_csv_video_rows(output_file, video_name)}
+        for row in rows:
+            video_rows[int(row["second"])] = {k: row[k] for k in FIELDNAMES}
+        merged_rows = [video_rows[sec] for sec in sorted(video_rows)]
+        if splice_csv_video_rows(output_file, video_name, FIELDNAMES, merged_rows):
+            return output_file
+
     existing = {}
 
     if os.path.exists(output_file):
@@ -75,12 +202,18 @@ def upsert_motion_aggregated(rows, output_file=OUTPUT_FILE):
 
 
 def aggregate_all_motion(input_dir=INPUT_DIR, output_file=OUTPUT_FILE):
-    all_rows = []
-    for file_name in os.listdir(input_dir):
-        if not file_name.endswith(".csv"):
+    # A binary .npy dump is preferred over a CSV of the same video.
+    motion_files = {}
+    for file_name in sorted(os.listdir(input_dir)):
+        if not file_name.endswith((".csv", ".npy")):
             continue
-        file_path = os.path.join(input_dir, file_name)
-        all_rows.extend(aggregate_motion_csv(file_path))
+        video_name = motion_video_name(file_name)
+        if video_name not in motion_files or file_name.endswith(".npy"):
+            motion_files[video_name] = os.path.join(input_dir, file_name)
+
+    all_rows = []
+    for video_name, file_path in motion_files.items():
+        all_rows.extend(aggregate_motion_csv(file_path, video_name=video_name))
     upsert_motion_aggregated(all_rows, output_file=output_file)
     return output_file
 
@@ -0,0 +1,224 @@
+import csv
+import io
+import json
+import os
+import shutil
+
+INDEX_SUFFIX = ".index.json"
+COPY_CHUNK_BYTES = 1 << 20
+
+# Shared CSVs such as motion_aggregated.csv and master_dataset.csv are written
+# sorted by video, so each video occupies one contiguous byte range. A sidecar
+# index maps video -> [start, end) offsets and lets a per-video read or upsert
+# touch only that range instead of parsing the whole archive. The index is
+# tied to the file's size and mtime and rebuilt with one scan when stale.
+# Only the splice/append writers, which run under file_lock, save the
+# sidecar; readers rebuild a stale index in memory from the same open file
+# they then read, so a concurrent writer cannot skew their offsets.
+
+
+def _index_path(csv_path):
+    return f"{csv_path}{INDEX_SUFFIX}"
+
+
+def _signature(csv_path):
+    stat = os.stat(csv_path)
+    return [stat.st_size, stat.st_mtime_ns]
+
+
+def _file_signature(f):
+    stat = os.fstat(f.fileno())
+    return [stat.st_size, stat.st_mtime_ns]
+
+
+def _first_field(line):
+    text = line.decode("utf-8")
+    if text.startswith('"'):
+        return next(csv.reader([text]))[0]
+    return text.split(",", 1)[0]
+
+
+def _save_index(csv_path, index):
+    """Persist ``index`` for the current file; callers must hold ``file_lock``."""
+    index["signature"] = _signature(csv_path)
+    index_path = _index_path(csv_path)
+    tmp_path = f"{index_path}.tmp"
+    with open(tmp_path, "w", encoding="utf-8") as f:
+        json.dump(index, f)
+    os.replace(tmp_path, index_path)
+
+
+def _scan_index(f):
+    """Index the open binary file ``f`` in one pass, tagged with its signature."""
+    signature = _file_signature(f)
+    f.seek(0)
+    videos = {}
+    contiguous = True
+    header = f.readline()
+    offset = len(header)
+    last_video = None
+    for line in f:
+        video = _first_field(line)
+        if video != last_video and video in videos:
+            contiguous = False
+        if video in videos:
+            videos[video][1] = offset + len(line)
+        else:
+            videos[video] = [offset, offset + len(line)]
+        last_video = video
+        offset += len(line)
+
+    return {
+        "header": header.decode("utf-8").strip("\r\n"),
+        "contiguous": contiguous,
+        "videos": videos,
+        "signature": signature,
+    }
+
+
+def build_video_index(csv_path):
+    with open(csv_path, "rb") as f:
+        return _scan_index(f)
+
+
+def _stored_index(csv_path, signature):
+    try:
+        with open(_index_path(csv_path), encoding="utf-8") as f:
+            index = json.load(f)
+    except (OSError, ValueError):
+        return None
+    return index if index.get("signature") == signature else None
+
+
+def load_video_index(csv_path):
+    """The saved index when it matches the file, else a fresh in-memory one (not saved)."""
+    with open(csv_path, "rb") as f:
+        return _stored_index(csv_path, _file_signature(f)) or _scan_index(f)
+
+
+def read_csv_video_rows(csv_path, video_name):
+    """Return the rows of ``video_name`` as ``csv.DictReader`` dicts, reading only its byte range."""
+    try:
+        f = open(csv_path, "rb")
+    except FileNotFoundError:
+        return []
+    with f:
+        # A splice replaces the file, so this handle keeps seeing the
+        # version the index was taken from.
+        index = _stored_index(csv_path, _file_signature(f)) or _scan_index(f)
+        if not index["contiguous"]:
+            f.seek(0)
+            text = io.TextIOWrapper(f, encoding="utf-8", newline="")
+            return [row for row in csv.DictReader(text) if row["video"] == video_name]
+
+        if video_name not in index["videos"]:
+            return []
+        start, end = index["videos"][video_name]
+        f.seek(start)
+        chunk = f.read(end - start).decode("utf-8")
+    fieldnames = next(csv.reader([index["header"]]))
+    return list(csv.DictReader(io.StringIO(chunk, newline=""), fieldnames=fieldnames))
+
+
+def _copy_bytes(src, dst, size):
+    while size > 0:
+        chunk = src.read(min(size, COPY_CHUNK_BYTES))
+        if not chunk:
+            break
+        dst.write(chunk)
+        size -= len(chunk)
+
+
+def splice_csv_video_rows(csv_path, video_name, fieldnames, rows):
+    """Replace the byte range of ``video_name`` with ``rows``, keeping the file sorted by video.
+
+    Other videos are copied as raw bytes without being parsed. Returns False
+    (leaving the file untouched) when the file is not laid out by video or has
+    different columns, so callers can fall back to a full rewrite. Callers
+    hold ``file_lock``, which also covers the index sidecar saved here.
+    """
+    buffer = io.StringIO(newline="")
+    writer = csv.DictWriter(buffer, fieldnames=fieldnames)
+    writer.writerows(rows)
+    new_bytes = buffer.getvalue().encode("utf-8")
+
+    if not os.path.exists(csv_path):
+        os.makedirs(os.path.dirname(csv_path) or ".", exist_ok=True)
+        header = io.StringIO(newline="")
+        csv.writer(header).writerow(fieldnames)
+        with open(csv_path, "wb") as f:
+            f.write(header.getvalue().encode("utf-8"))
+            f.write(new_bytes)
+        _save_index(csv_path, build_video_index(csv_path))
+        return True
+
+    index = load_video_index(csv_path)
+    if not index["contiguous"] or next(csv.reader([index["header"]])) != list(fieldnames):
+        return False
+
+    ranges = index["videos"]
+    file_size = index["signature"][0]
+    if video_name in ranges:
+        start, end = ranges[video_name]
+    else:
+        start = min((s for video, (s, _) in ranges.items() if video > video_name), default=file_size)
+        end = start
+
+    tmp_path = f"{csv_path}.tmp"
+    with open(csv_path, "rb") as src, open(tmp_path, "wb") as dst:
+        _copy_bytes(src, dst, start)
+        dst.write(new_bytes)
+        src.seek(end)
+        shutil.copyfileobj(src, dst, COPY_CHUNK_BYTES)
+    os.replace(tmp_path, csv_path)
+
+    delta = len(new_bytes) - (end - start)
+    for video, span in ranges.items():
+        if span[0] >= end and video != video_name:
+            span[0] += delta
+            span[1] += delta
+    if rows:
+        ranges[video_name] = [start, start + len(new_bytes)]
+    else:
+        ranges.pop(video_name, None)
+    _save_index(csv_path, index)
+    return True
+
+
+def append_csv_video_rows(csv_path, video_name, fieldnames, rows):
+    """Append ``rows`` to the byte range of ``video_name``, writing only the new bytes.
+
+    Used for live streams that add a few rows per second. When the video's
+    range is not at the end of the file (another video was spliced in after
+    it), the range is first moved to the end, so later appends are cheap
+    again. Returns False like ``splice_csv_video_rows`` when the file is not
+    laid out by video or has different columns.
+    """
+    if not os.path.exists(csv_path):
+        return splice_csv_video_rows(csv_path, video_name, fieldnames, rows)
+
+    index = load_video_index(csv_path)
+    if not index["contiguous"] or next(csv.reader([index["header"]])) != list(fieldnames):
+        return False
+
+    span = index["videos"].get(video_name)
+    if span is not None and span[1] != index["signature"][0]:
+        existing = read_csv_video_rows(csv_path, video_name)
+        splice_csv_video_rows(csv_path, video_name, fieldnames, [])
+        index = load_video_index(csv_path)
+        rows = existing + list(rows)
+        span = None
+
+    buffer = io.StringIO(newline="")
+    csv.DictWriter(buffer, fieldnames=fieldnames, extrasaction="ignore").writerows(rows)
+    new_bytes = buffer.getvalue().encode("utf-8")
+    file_size = index["signature"][0]
+    with open(csv_path, "ab") as f:
+        f.write(new_bytes)
+
+    if span is None:
+        index["videos"][video_name] = [file_size, file_size + len(new_bytes)]
+    else:
+        span[1] += len(new_bytes)
+    _save_index(csv_path, index)
+    return True
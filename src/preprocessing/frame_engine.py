@@ -0,0 +1,280 @@
+import math
+import os
+import queue
+import threading
+
+import cv2
+import numpy as np
+
+DEFAULT_FPS = 25
+SKIP_MODES = ("decode", "grab", "seek")
+# Seeking restarts decoding from the previous keyframe, so short gaps are
+# cheaper to step over with grab().
+SEEK_MIN_GAP_FRAMES = 50
+PROGRESS_EVERY_FRAMES = 250
+# Frames decoded ahead of the consumers; 0 decodes on the calling thread.
+# On a single core there is nothing to overlap, so prefetching is off.
+PREFETCH_FRAMES = 8 if (os.cpu_count() or 1) > 1 else 0
+
+
+def open_video(video_path):
+    cap = cv2.VideoCapture(str(video_path))
+    if not cap.isOpened():
+        raise RuntimeError(f"Could not open video: {video_path}")
+    return cap
+
+
+def video_fps(cap, default=DEFAULT_FPS):
+    fps = cap.get(cv2.CAP_PROP_FPS)
+    return fps if fps > 0 else default
+
+
+def video_frame_count(cap):
+    total = int(cap.get(cv2.CAP_PROP_FRAME_COUNT))
+    return total if total > 0 else None
+
+
+def frame_second(frame_id, fps):
+    return int(frame_id / fps + 1e-9)
+
+
+class TimestampSampler:
+    """Select the first frame at or after every ``1 / sample_hz`` seconds of video time.
+
+    Targets are computed from the float frame rate, so 29.97 fps sources stay
+    aligned with wall-clock seconds instead of drifting like ``frame_id % int(fps)``.
+    Sampling starts with the first target at or after ``first_frame``.
+    """
+
+    def __init__(self, fps, sample_hz=1.0, first_frame=1):
+        if sample_hz <= 0:
+            raise ValueError(f"sample_hz must be positive, got {sample_hz}")
+        self.fps = fps
+        self.interval = 1.0 / sample_hz
+        self._target = max(1, math.floor((first_frame - 1) / (self.interval * fps)))
+        self.next_frame = self._frame_for(self._target)
+        while self.next_frame < first_frame:
+            self._target += 1
+            self.next_frame = self._frame_for(self._target)
+
+    def _frame_for(self, target):
+        return max(1, math.ceil(target * self.interval * self.fps - 1e-6))
+
+    def due(self, frame_id):
+        if frame_id < self.next_frame:
+            return False
+        while self.next_frame <= frame_id:
+            self._target += 1
+            self.next_frame = self._frame_for(self._target)
+        return True
+
+
+class _FrameScanner:
+    """Walk the capture once and yield ``(frame_id, frame, interested, warming)`` for wanted frames.
+
+    ``next_buffer()`` supplies the array each resized frame is written into
+    (``None`` lets ``cv2.resize`` allocate). ``frame_id`` holds the last frame
+    read once the scan ends.
+    """
+
+    def __init__(self, cap, consumers, fps, resize, skip_mode, start_frame, end_frame, first_frame):
+        self.cap = cap
+        self.consumers = consumers
+        self.fps = fps
+        self.resize = resize
+        self.skip_mode = skip_mode
+        self.start_frame = start_frame
+        self.end_frame = end_frame
+        self.frame_id = first_frame - 1
+
+    def frames(self, next_buffer=lambda: None):
+        cap = self.cap
+        start_frame, end_frame = self.start_frame, self.end_frame
+        warm_consumers = [c for c in self.consumers if c.warms_up]
+        # Decoded frames are resized into another array straight away, so one
+        # decode buffer is reused for the whole video.
+        decoded = None
+
+        while end_frame is None or self.frame_id < end_frame:
+            if self.skip_mode == "seek" and self.frame_id >= start_frame:
+                target = min(c.next_frame_id(self.frame_id) for c in self.consumers)
+                if end_frame is not None and target > end_frame:
+                    break
+                if target - self.frame_id > SEEK_MIN_GAP_FRAMES:
+                    cap.set(cv2.CAP_PROP_POS_MSEC, (target - 1) * 1000.0 / self.fps)
+                    self.frame_id = target - 1
+
+            if self.skip_mode == "decode":
+                ret, decoded = cap.read(decoded)
+            else:
+                ret = cap.grab()
+            if not ret:
+                break
+
+            self.frame_id += 1
+            warming = self.frame_id < start_frame
+            if warming:
+                interested = warm_consumers
+            else:
+                interested = [c for c in self.consumers if c.wants_frame(self.frame_id)]
+            if not interested:
+                continue
+
+            if self.skip_mode != "decode":
+                ret, decoded = cap.retrieve(decoded)
+                if not ret:
+                    break
+
+            yield self.frame_id, cv2.resize(decoded, self.resize, dst=next_buffer()), interested, warming
+
+
+class _Stopped(Exception):
+    pass
+
+
+class PrefetchReader:
+    """Run a ``_FrameScanner`` on a background thread, decoding and resizing ahead of the consumers.
+
+    Resized frames are written into a ring of ``size`` preallocated arrays;
+    the reader blocks when every slot is in use, and a slot is handed back
+    when the consumer asks for the next frame. A frame is therefore only
+    valid until then.
+    """
+
+    def __init__(self, scanner, size, shape):
+        self.scanner = scanner
+        self._buffers = [np.empty(shape, dtype=np.uint8) for _ in range(max(int(size), 2))]
+        self._free = queue.Queue()
+        for slot in range(len(self._buffers)):
+            self._free.put(slot)
+        self._ready = queue.Queue()
+        self._stop = threading.Event()
+        self._slot = None
+        self._thread = threading.Thread(target=self._run, name="frame-prefetch", daemon=True)
+        self._thread.start()
+
+    def _next_buffer(self):
+        while not self._stop.is_set():
+            try:
+                self._slot = self._free.get(timeout=0.1)
+            except queue.Empty:
+                continue
+            return self._buffers[self._slot]
+        raise _Stopped
+
+    def _run(self):
+        try:
+            for item in self.scanner.frames(self._next_buffer):
+                self._ready.put((item, self._slot))
+        except _Stopped:
+            pass
+        except Exception as exc:
+            self._ready.put((exc, None))
+        finally:
+            self._ready.put(None)
+
+    def __iter__(self):
+        while True:
+            entry = self._ready.get()
+            if entry is None:
+                return
+            item, slot = entry
+            if isinstance(item, Exception):
+                raise item
+            yield item
+            self._free.put(slot)
+
+    def close(self):
+        self._stop.set()
+        self._thread.join()
+
+
+def run_frame_engine(
+    video_path,
+    consumers,
+    resize=(640, 360),
+    skip_mode="decode",
+    progress_callback=None,
+    start_frame=1,
+    end_frame=None,
+    warmup_frames=0,
+    prefetch=PREFETCH_FRAMES,
+):
+    """Decode ``video_path`` once and hand each frame to the registered consumers.
+
+    A consumer exposes ``start(fps, first_frame)``, ``wants_frame(frame_id)``,
+    ``next_frame_id(frame_id)``, ``process(frame_id, frame)``, ``warm_up(frame)``
+    and ``finish()``. Frames are resized once and shared, so consumers must not
+    modify them in place.
+
+    ``skip_mode`` controls how unwanted frames are skipped: ``"decode"`` reads
+    every frame, ``"grab"`` advances with ``grab()`` and only retrieves wanted
+    frames, and ``"seek"`` additionally jumps over long gaps with
+    ``CAP_PROP_POS_MSEC``.
+
+    ``start_frame``/``end_frame`` restrict processing to an inclusive range of
+    1-based frame ids. The ``warmup_frames`` before ``start_frame`` are decoded
+    and passed to ``warm_up`` of consumers with ``warms_up`` set, so stateful
+    stages like MOG2 build background history without writing output.
+
+    With ``prefetch`` above 0, decoding and resizing run on a background
+    thread (see ``PrefetchReader``) into that many reusable frame buffers,
+    overlapping with the consumers' work. ``wants_frame`` and
+    ``next_frame_id`` are then called from that thread, and a frame passed
+    to ``process`` or ``warm_up`` must be copied if it is kept afterwards.
+
+    ``progress_callback(frames_processed, total_frames)`` is called as wanted
+    frames pass each ``PROGRESS_EVERY_FRAMES`` frames and once at the end;
+    ``total_frames`` is ``None`` when the container does not report a frame count.
+    """
+    if skip_mode not in SKIP_MODES:
+        raise ValueError(f"Unknown skip_mode '{skip_mode}', expected one of {SKIP_MODES}")
+
+    cap = open_video(video_path)
+    fps = video_fps(cap)
+    first_frame = max(1, start_frame - warmup_frames)
+    last_frame = video_frame_count(cap)
+    if end_frame is not None:
+        last_frame = min(end_frame, last_frame) if last_frame else end_frame
+    total_frames = last_frame - first_frame + 1 if last_frame else None
+
+    scanner = _FrameScanner(cap, consumers, fps, resize, skip_mode, start_frame, end_frame, first_frame)
+    reader = None
+    processed = 0
+    next_progress = PROGRESS_EVERY_FRAMES
+
+    try:
+        if first_frame > 1:
+            cap.set(cv2.CAP_PROP_POS_FRAMES, first_frame - 1)
+        for consumer in consumers:
+            consumer.start(fps, start_frame)
+
+        if prefetch:
+            reader = PrefetchReader(scanner, prefetch, (resize[1], resize[0], 3))
+            frames = iter(reader)
+        else:
+            frames = scanner.frames()
+
+        for frame_id, frame, interested, warming in frames:
+            processed = frame_id - first_frame + 1
+            if progress_callback is not None and processed >= next_progress:
+                progress_callback(processed, total_frames)
+                next_progress = processed + PROGRESS_EVERY_FRAMES
+
+            if warming:
+                for consumer in interested:
+                    consumer.warm_up(frame)
+                continue
+            for consumer in interested:
+                consumer.process(frame_id, frame)
+    finally:
+        if reader is not None:
+            reader.close()
+        cap.release()
+        for consumer in consumers:
+            consumer.finish()
+
+    processed = scanner.frame_id - first_frame + 1
+    if progress_callback is not None and next_progress - PROGRESS_EVERY_FRAMES != processed:
+        progress_callback(processed, total_frames)
+    return scanner.frame_id
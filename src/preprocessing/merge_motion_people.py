@@ -1,39 +1,78 @@
 import csv
 import os
 
+from src.preprocessing.csv_video_index import read_csv_video_rows, splice_csv_video_rows
+from src.storage.sqlite_store import read_video_rows, replace_video_rows
+
 MOTION_FILE = "data/processed/motion_aggregated.csv"
 PEOPLE_DIR = "data/processed/people_per_second"
 OUTPUT_FILE = "data/processed/master_dataset.csv"
 FIELDNAMES = ["video", "second", "avg_motion_ratio", "motion_std", "people_count"]
 
 
-def _load_motion_data(motion_file=MOTION_FILE):
+def _motion_entry(row):
+    return {
+        "avg_motion_ratio": float(row["avg_motion_ratio"]),
+        "motion_std": float(row["motion_std"]),
+    }
+
+
+def _load_motion_data(motion_file=MOTION_FILE, video_name=None):
+    if video_name is not None:
+        return {
+            (row["video"], int(row["second"])): _motion_entry(row)
+            for row in read_csv_video_rows(motion_file, video_name)
+        }
+
     motion_data = {}
     with open(motion_file, newline="", encoding="utf-8") as f:
         reader = csv.DictReader(f)
         for row in reader:
             key = (row["video"], int(row["second"]))
-            motion_data[key] = {
-                "avg_motion_ratio": float(row["avg_motion_ratio"]),
-                "motion_std": float(row["motion_std"]),
-            }
+            motion_data[key] = _motion_entry(row)
     return motion_data
 
 
-def _load_people_data(people_dir=PEOPLE_DIR):
+def _read_people_csv(file_path, people_data):
+    with open(file_path, newline="", encoding="utf-8") as f:
+        reader = csv.DictReader(f)
+        for row in reader:
+            key = (row["video"], int(row["second"]))
+            people_data[key] = int(row["people_count"])
+
+
+def _load_people_data(people_dir=PEOPLE_DIR, video_name=None):
     people_data = {}
+    if video_name is not None:
+        # people_per_second is already partitioned as one file per video.
+        file_path = os.path.join(people_dir, f"{video_name}_people.csv")
+        if os.path.exists(file_path):
+            _read_people_csv(file_path, people_data)
+        return people_data
+
     for file_name in os.listdir(people_dir):
         if not file_name.endswith(".csv"):
             continue
-        file_path = os.path.join(people_dir, file_name)
-        with open(file_path, newline="", encoding="utf-8") as f:
-            reader = csv.DictReader(f)
-            for row in reader:
-                key = (row["video"], int(row["second"]))
-                people_data[key] = int(row["people_count"])
+        _read_people_csv(os.path.join(people_dir, file_name), people_data)
     return people_data
 
 
+def _master_rows(motion_data, people_data, keys):
+    rows = []
+    for video, second in sorted(keys, key=lambda x: (x[0], x[1])):
+        motion_info = motion_data.get((video, second), {})
+        rows.append(
+            {
+                "video": video,
+                "second": second,
+                "avg_motion_ratio": round(motion_info.get("avg_motion_ratio", 0.0), 6),
+                "motion_std": round(motion_info.get("motion_std", 0.0), 6),
+                "people_count": people_data.get((video, second), 0),
+            }
+        )
+    return rows
+
+
 def _write_master_rows(rows, output_file=OUTPUT_FILE):
     os.makedirs(os.path.dirname(output_file), exist_ok=True)
     with open(output_file, "w", newline="", encoding="utf-8") as f:
@@ -49,60 +88,59 @@ def build_master_dataset(
 ):
     motion_data = _load_motion_data(motion_file)
     people_data = _load_people_data(people_dir)
-    all_keys = set(motion_data.keys()) | set(people_data.keys())
-    sorted_keys = sorted(all_keys, key=lambda x: (x[0], x[1]))
-
-    rows = []
-    for video, second in sorted_keys:
-        motion_info = motion_data.get((video, second), {})
-        rows.append(
-            {
-                "video": video,
-                "second": second,
-                "avg_motion_ratio": round(motion_info.get("avg_motion_ratio", 0.0), 6),
-                "motion_std": round(motion_info.get("motion_std", 0.0), 6),
-                "people_count": people_data.get((video, second), 0),
-            }
-        )
-
+    rows = _master_rows(motion_data, people_data, set(motion_data) | set(people_data))
     _write_master_rows(rows, output_file=output_file)
     return output_file
 
 
+def _video_master_rows(video_name, motion_file, people_dir):
+    motion_data = _load_motion_data(motion_file, video_name=video_name)
+    people_data = _load_people_data(people_dir, video_name=video_name)
+    keys = {key for key in set(motion_data) | set(people_data) if key[0] == video_name}
+    return _master_rows(motion_data, people_data, keys)
+
+
+def _upsert_master_dataset_db(video_name, people_dir, db_path):
+    motion_data = {
+        (row["video"], row["second"]): row
+        for row in read_video_rows("motion_aggregated", video_name, db_path=db_path)
+    }
+    people_data = _load_people_data(people_dir, video_name=video_name)
+    rows = _master_rows(motion_data, people_data, set(motion_data) | set(people_data))
+    replace_video_rows("master_dataset", video_name, rows, db_path=db_path)
+    return db_path
+
+
 def upsert_master_dataset_for_video(
     video_name,
     motion_file=MOTION_FILE,
     people_dir=PEOPLE_DIR,
     output_file=OUTPUT_FILE,
+    db_path=None,
 ):
-    motion_data = _load_motion_data(motion_file)
-    people_data = _load_people_data(people_dir)
-    existing = {}
+    if db_path is not None:
+        return _upsert_master_dataset_db(video_name, people_dir, db_path)
 
-    if os.path.exists(output_file):
-        with open(output_file, newline="", encoding="utf-8") as f:
-            reader = csv.DictReader(f)
-            for row in reader:
-                key = (row["video"], int(row["second"]))
-                if row["video"] != video_name:
-                    existing[key] = {
-                        "video": row["video"],
-                        "second": int(row["second"]),
-                        "avg_motion_ratio": float(row["avg_motion_ratio"]),
-                        "motion_std": float(row["motion_std"]),
-                        "people_count": int(row["people_count"]),
-                    }
-
-    video_keys = {key for key in set(motion_data) | set(people_data) if key[0] == video_name}
-    for video, second in sorted(video_keys, key=lambda x: (x[0], x[1])):
-        motion_info = motion_data.get((video, second), {})
-        existing[(video, second)] = {
-            "video": video,
-            "second": second,
-            "avg_motion_ratio": round(motion_info.get("avg_motion_ratio", 0.0), 6),
-            "motion_std": round(motion_info.get("motion_std", 0.0), 6),
-            "people_count": people_data.get((video, second), 0),
-        }
+    video_rows = _video_master_rows(video_name, motion_file, people_dir)
+    if splice_csv_video_rows(output_file, video_name, FIELDNAMES, video_rows):
+        return output_file
+
+    # The existing file is not laid out by video: fall back to a full rewrite.
+    existing = {}
+    with open(output_file, newline="", encoding="utf-8") as f:
+        reader = csv.DictReader(f)
+        for row in reader:
+            key = (row["video"], int(row["second"]))
+            if row["video"] != video_name:
+                existing[key] = {
+                    "video": row["video"],
+                    "second": int(row["second"]),
+                    "avg_motion_ratio": float(row["avg_motion_ratio"]),
+                    "motion_std": float(row["motion_std"]),
+                    "people_count": int(row["people_count"]),
+                }
+    for row in video_rows:
+        existing[(row["video"], row["second"])] = row
 
     rows = [existing[key] for key in sorted(existing.keys(), key=lambda x: (x[0], x[1]))]
     _write_master_rows(rows, output_file=output_file)
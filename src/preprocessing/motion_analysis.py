@@ -4,8 +4,18 @@ from pathlib import Path
 
 import cv2
 
+from src.preprocessing.frame_engine import frame_second, run_frame_engine
+from src.preprocessing.motion_store import MotionNpyWriter
+
 VIDEO_DIR = "data/raw_videos"
 OUTPUT_DIR = "data/processed/motion_raw"
+RAW_FORMATS = ("csv", "npy")
+
+
+def motion_raw_path(output_dir, video_name, raw_format="csv"):
+    if raw_format not in RAW_FORMATS:
+        raise ValueError(f"Unknown motion raw format '{raw_format}', expected one of {RAW_FORMATS}")
+    return os.path.join(output_dir, f"{video_name}_motion.{raw_format}")
 
 
 def _new_motion_processor():
@@ -18,42 +28,88 @@ def _new_motion_processor():
     return fgbg, kernel
 
 
-def analyze_motion_in_video(video_path, output_csv_path, resize=(640, 360)):
-    cap = cv2.VideoCapture(str(video_path))
-    if not cap.isOpened():
-        raise RuntimeError(f"Could not open video: {video_path}")
-
-    fps = cap.get(cv2.CAP_PROP_FPS)
-    fps = fps if fps > 0 else 25
-    fgbg, kernel = _new_motion_processor()
-    frame_id = 0
-
-    with open(output_csv_path, "w", newline="", encoding="utf-8") as f:
-        writer = csv.writer(f)
-        writer.writerow(["frame", "second", "motion_pixels", "motion_ratio"])
-
-        while True:
-            ret, frame = cap.read()
-            if not ret:
-                break
+class MotionConsumer:
+    """Frame-engine consumer that runs MOG2 on every frame.
+
+    Per-frame rows are written to ``output_csv_path`` when given (as a binary
+    ``.npy`` file if the path ends with ``.npy``), and fed to a
+    ``StreamingMotionAggregator`` when ``aggregator`` is given, and to
+    ``gate.observe`` when a ``MotionGate`` is given.
+    """
+
+    warms_up = True
+
+    def __init__(self, output_csv_path=None, aggregator=None, gate=None):
+        self.output_csv_path = output_csv_path
+        self.aggregator = aggregator
+        self.gate = gate
+        self.fps = None
+        self._file = None
+        self._writer = None
+
+    def start(self, fps, first_frame=1):
+        self.fps = fps
+        self.fgbg, self.kernel = _new_motion_processor()
+        if self.output_csv_path is None:
+            return
+        if str(self.output_csv_path).endswith(".npy"):
+            self._file = self._writer = MotionNpyWriter(self.output_csv_path)
+        else:
+            self._file = open(self.output_csv_path, "w", newline="", encoding="utf-8")
+            self._writer = csv.writer(self._file)
+            self._writer.writerow(["frame", "second", "motion_pixels", "motion_ratio"])
+
+    def wants_frame(self, frame_id):
+        return True
+
+    def next_frame_id(self, frame_id):
+        return frame_id + 1
+
+    def warm_up(self, frame):
+        self.fgbg.apply(frame)
+
+    def process(self, frame_id, frame):
+        second = frame_second(frame_id, self.fps)
+        fgmask = self.fgbg.apply(frame)
+        fgmask = cv2.morphologyEx(fgmask, cv2.MORPH_OPEN, self.kernel)
+        motion_pixels = cv2.countNonZero(fgmask)
+        total_pixels = frame.shape[0] * frame.shape[1]
+        motion_ratio = round(motion_pixels / total_pixels, 6)
+
+        if self._writer is not None:
+            self._writer.writerow([frame_id, second, motion_pixels, motion_ratio])
+        if self.aggregator is not None:
+            self.aggregator.add(second, motion_ratio)
+        if self.gate is not None:
+            self.gate.observe(motion_ratio)
+
+    def finish(self):
+        if self.aggregator is not None:
+            self.aggregator.finish()
+        if self._file is not None:
+            self._file.close()
+            self._file = None
+            self._writer = None
 
-            frame_id += 1
-            second = int(frame_id // fps)
-            frame = cv2.resize(frame, resize)
 
-            fgmask = fgbg.apply(frame)
-            fgmask = cv2.morphologyEx(fgmask, cv2.MORPH_OPEN, kernel)
-            motion_pixels = cv2.countNonZero(fgmask)
-            total_pixels = frame.shape[0] * frame.shape[1]
-            motion_ratio = motion_pixels / total_pixels
+def analyze_motion_in_video(video_path, output_csv_path, resize=(640, 360)):
+    run_frame_engine(video_path, [MotionConsumer(output_csv_path)], resize=resize)
+    return output_csv_path
 
-            writer.writerow([frame_id, second, motion_pixels, round(motion_ratio, 6)])
 
-    cap.release()
-    return output_csv_path
+def process_all_videos(video_dir=VIDEO_DIR, output_dir=OUTPUT_DIR, workers=1, raw_format="csv"):
+    if workers > 1:
+        from src.pipeline.backfill import backfill_videos
 
+        results = backfill_videos(
+            video_dir=video_dir,
+            motion_dir=output_dir,
+            workers=workers,
+            stages=("motion",),
+            motion_format=raw_format,
+        )
+        return [result["motion_csv"] for result in results]
 
-def process_all_videos(video_dir=VIDEO_DIR, output_dir=OUTPUT_DIR):
     os.makedirs(output_dir, exist_ok=True)
     outputs = []
 
@@ -62,7 +118,7 @@ def process_all_videos(video_dir=VIDEO_DIR, output_dir=OUTPUT_DIR):
             continue
 
         video_path = os.path.join(video_dir, video_name)
-        output_csv = os.path.join(output_dir, f"{Path(video_name).stem}_motion.csv")
+        output_csv = motion_raw_path(output_dir, Path(video_name).stem, raw_format)
         print(f"Processing: {video_name}")
         analyze_motion_in_video(video_path, output_csv)
         outputs.append(output_csv)
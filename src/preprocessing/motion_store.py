@@ -0,0 +1,102 @@
+import argparse
+import csv
+import os
+
+import numpy as np
+
+INPUT_DIR = "data/processed/motion_raw"
+CHUNK_ROWS = 65536
+
+# 20 bytes per frame versus ~25-30 for a motion_raw CSV row, and no parsing on
+# read. motion_ratio stays float64 so values round-trip the 6-decimal CSV exactly.
+MOTION_DTYPE = np.dtype(
+    [
+        ("frame", "<u4"),
+        ("second", "<u4"),
+        ("motion_pixels", "<u4"),
+        ("motion_ratio", "<f8"),
+    ]
+)
+
+
+class MotionNpyWriter:
+    """Collect per-frame motion rows in fixed-width chunks and save them as one ``.npy`` file."""
+
+    def __init__(self, path, chunk_rows=CHUNK_ROWS):
+        self.path = path
+        self.chunk_rows = chunk_rows
+        self._chunks = []
+        self._current = np.empty(chunk_rows, dtype=MOTION_DTYPE)
+        self._size = 0
+
+    def writerow(self, row):
+        if self._size == self.chunk_rows:
+            self._chunks.append(self._current)
+            self._current = np.empty(self.chunk_rows, dtype=MOTION_DTYPE)
+            self._size = 0
+        self._current[self._size] = tuple(row)
+        self._size += 1
+
+    def close(self):
+        if self._current is None:
+            return
+        self._chunks.append(self._current[:self._size])
+        np.save(self.path, np.concatenate(self._chunks))
+        self._chunks = []
+        self._current = None
+
+
+def load_motion_array(path, mmap=True):
+    return np.load(path, mmap_mode="r" if mmap else None)
+
+
+def motion_video_name(path):
+    name = os.path.basename(path)
+    for suffix in ("_motion.npy", "_motion.csv"):
+        if name.endswith(suffix):
+            return name[: -len(suffix)]
+    return os.path.splitext(name)[0]
+
+
+def convert_motion_csv_to_npy(csv_path, npy_path=None, remove_csv=False):
+    if npy_path is None:
+        npy_path = os.path.splitext(csv_path)[0] + ".npy"
+
+    writer = MotionNpyWriter(npy_path)
+    with open(csv_path, newline="", encoding="utf-8") as f:
+        reader = csv.DictReader(f)
+        for row in reader:
+            writer.writerow(
+                (
+                    int(row["frame"]),
+                    int(float(row["second"])),
+                    int(row["motion_pixels"]),
+                    float(row["motion_ratio"]),
+                )
+            )
+    writer.close()
+
+    if remove_csv:
+        os.remove(csv_path)
+    return npy_path
+
+
+def convert_all_motion_csv(input_dir=INPUT_DIR, remove_csv=False):
+    converted = []
+    for file_name in sorted(os.listdir(input_dir)):
+        if not file_name.endswith("_motion.csv"):
+            continue
+        converted.append(
+            convert_motion_csv_to_npy(os.path.join(input_dir, file_name), remove_csv=remove_csv)
+        )
+    return converted
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Convert motion_raw CSVs to the binary .npy format.")
+    parser.add_argument("--input-dir", default=INPUT_DIR)
+    parser.add_argument("--remove-csv", action="store_true", help="delete each CSV after converting it")
+    args = parser.parse_args()
+
+    outputs = convert_all_motion_csv(args.input_dir, remove_csv=args.remove_csv)
+    print(f"Converted {len(outputs)} motion files to .npy.")
@@ -0,0 +1,213 @@
+import argparse
+import csv
+import os
+import sqlite3
+from contextlib import closing
+
+DB_PATH = "data/processed/smart_park.sqlite"
+PROCESSED_DIR = "data/processed"
+
+# name -> (columns with SQLite types, primary key, CSV file in PROCESSED_DIR).
+# Every table leads with `video`, so the primary key doubles as the per-video
+# index used by replace_video_rows.
+TABLES = {
+    "motion_aggregated": (
+        [
+            ("video", "TEXT"),
+            ("second", "INTEGER"),
+            ("avg_motion_ratio", "REAL"),
+            ("motion_std", "REAL"),
+            ("max_motion_ratio", "REAL"),
+            ("min_motion_ratio", "REAL"),
+            ("motion_range", "REAL"),
+        ],
+        ("video", "second"),
+        "motion_aggregated.csv",
+    ),
+    "master_dataset": (
+        [
+            ("video", "TEXT"),
+            ("second", "INTEGER"),
+            ("avg_motion_ratio", "REAL"),
+            ("motion_std", "REAL"),
+            ("people_count", "INTEGER"),
+        ],
+        ("video", "second"),
+        "master_dataset.csv",
+    ),
+    "activity_ml_predictions": (
+        [
+            ("video", "TEXT"),
+            ("second", "INTEGER"),
+            ("avg_motion_ratio", "REAL"),
+            ("motion_std", "REAL"),
+            ("people_count", "INTEGER"),
+            ("predicted_activity", "TEXT"),
+        ],
+        ("video", "second"),
+        "activity_ml_predictions.csv",
+    ),
+    "activity_distribution": (
+        [
+            ("video", "TEXT"),
+            ("sitting_percent", "REAL"),
+            ("walking_percent", "REAL"),
+            ("high_activity_percent", "REAL"),
+            ("dominant_activity", "TEXT"),
+        ],
+        ("video",),
+        "activity_distribution.csv",
+    ),
+    "crowd_statistics": (
+        [
+            ("video", "TEXT"),
+            ("avg_people", "REAL"),
+            ("max_people", "INTEGER"),
+            ("peak_second", "INTEGER"),
+        ],
+        ("video",),
+        "crowd_statistics.csv",
+    ),
+    "congestion_windows": (
+        [
+            ("video", "TEXT"),
+            ("start_second", "INTEGER"),
+            ("end_second", "INTEGER"),
+            ("duration_seconds", "INTEGER"),
+            ("max_people", "INTEGER"),
+        ],
+        ("video", "start_second"),
+        "congestion_windows.csv",
+    ),
+}
+
+
+def table_columns(table):
+    return [name for name, _ in TABLES[table][0]]
+
+
+def _create_tables(conn):
+    for table, (columns, key, _) in TABLES.items():
+        column_sql = ", ".join(f"{name} {sql_type}" for name, sql_type in columns)
+        conn.execute(
+            f"CREATE TABLE IF NOT EXISTS {table} ({column_sql}, PRIMARY KEY ({', '.join(key)}))"
+        )
+
+
+def connect(db_path=DB_PATH):
+    os.makedirs(os.path.dirname(db_path) or ".", exist_ok=True)
+    conn = sqlite3.connect(db_path, timeout=30)
+    conn.row_factory = sqlite3.Row
+    # WAL lets the dashboard read while a pipeline run is writing.
+    conn.execute("PRAGMA journal_mode=WAL")
+    conn.execute("PRAGMA synchronous=NORMAL")
+    _create_tables(conn)
+    return conn
+
+
+def replace_video_rows(table, video_name, rows, db_path=DB_PATH):
+    """Atomically replace every row of ``video_name`` in ``table`` with ``rows``."""
+    columns = table_columns(table)
+    placeholders = ", ".join("?" for _ in columns)
+    values = [tuple(row[name] for name in columns) for row in rows]
+
+    with closing(connect(db_path)) as conn:
+        with conn:
+            conn.execute(f"DELETE FROM {table} WHERE video = ?", (video_name,))
+            conn.executemany(
+                f"INSERT INTO {table} ({', '.join(columns)}) VALUES ({placeholders})",
+                values,
+            )
+    return len(values)
+
+
+def upsert_rows(table, rows, db_path=DB_PATH):
+    """Insert ``rows`` into ``table``, replacing rows with the same primary key."""
+    columns = table_columns(table)
+    placeholders = ", ".join("?" for _ in columns)
+    values = [tuple(row[name] for name in columns) for row in rows]
+
+    with closing(connect(db_path)) as conn:
+        with conn:
+            conn.executemany(
+                f"INSERT OR REPLACE INTO {table} ({', '.join(columns)}) VALUES ({placeholders})",
+                values,
+            )
+    return len(values)
+
+
+def read_video_rows(table, video_name, db_path=DB_PATH):
+    key = TABLES[table][1]
+    with closing(connect(db_path)) as conn:
+        cursor = conn.execute(
+            f"SELECT * FROM {table} WHERE video = ? ORDER BY {', '.join(key)}",
+            (video_name,),
+        )
+        return [dict(row) for row in cursor]
+
+
+def count_video_rows(table, video_name, db_path=DB_PATH):
+    with closing(connect(db_path)) as conn:
+        return conn.execute(f"SELECT COUNT(*) FROM {table} WHERE video = ?", (video_name,)).fetchone()[0]
+
+
+def export_table_csv(table, output_file=None, db_path=DB_PATH, processed_dir=PROCESSED_DIR):
+    if output_file is None:
+        output_file = os.path.join(processed_dir, TABLES[table][2])
+    columns = table_columns(table)
+    key = TABLES[table][1]
+
+    os.makedirs(os.path.dirname(output_file) or ".", exist_ok=True)
+    with closing(connect(db_path)) as conn, open(output_file, "w", newline="", encoding="utf-8") as f:
+        writer = csv.writer(f)
+        writer.writerow(columns)
+        writer.writerows(conn.execute(f"SELECT {', '.join(columns)} FROM {table} ORDER BY {', '.join(key)}"))
+    return output_file
+
+
+def export_all_csv(processed_dir=PROCESSED_DIR, db_path=DB_PATH, tables=None):
+    return [
+        export_table_csv(table, db_path=db_path, processed_dir=processed_dir)
+        for table in (tables or TABLES)
+    ]
+
+
+def import_table_csv(table, csv_path, db_path=DB_PATH):
+    columns = table_columns(table)
+    placeholders = ", ".join("?" for _ in columns)
+    with open(csv_path, newline="", encoding="utf-8") as f:
+        reader = csv.DictReader(f)
+        values = [tuple(row.get(name) for name in columns) for row in reader]
+
+    with closing(connect(db_path)) as conn:
+        with conn:
+            conn.executemany(
+                f"INSERT OR REPLACE INTO {table} ({', '.join(columns)}) VALUES ({placeholders})",
+                values,
+            )
+    return len(values)
+
+
+def import_processed_csvs(processed_dir=PROCESSED_DIR, db_path=DB_PATH):
+    imported = {}
+    for table, (_, _, file_name) in TABLES.items():
+        csv_path = os.path.join(processed_dir, file_name)
+        if os.path.exists(csv_path):
+            imported[table] = import_table_csv(table, csv_path, db_path=db_path)
+    return imported
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Import or export the SQLite analysis store.")
+    parser.add_argument("action", choices=("import", "export"))
+    parser.add_argument("--db-path", default=DB_PATH)
+    parser.add_argument("--processed-dir", default=PROCESSED_DIR)
+    args = parser.parse_args()
+
+    if args.action == "import":
+        counts = import_processed_csvs(args.processed_dir, db_path=args.db_path)
+        for table, count in counts.items():
+            print(f"Imported {count} rows into {table}.")
+    else:
+        for path in export_all_csv(args.processed_dir, db_path=args.db_path):
+            print(f"Exported {path}")
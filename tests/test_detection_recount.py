@@ -0,0 +1,97 @@
+import csv
+
+import numpy as np
+import pytest
+
+from src.benchmarks.synthetic_video import write_synthetic_video
+from src.detection.detection_store import detections_npz_path, recount_all, recount_people_csv
+from src.detection.motion_gate import MotionGate
+from src.detection.people_tracker import PeopleTracker
+from src.detection.yolo_people_detection import detect_people_in_video
+
+
+class _Boxes:
+    def __init__(self, count):
+        self.cls = np.zeros(count, dtype=np.float32)
+        self.conf = np.full(count, 0.9, dtype=np.float32)
+        self.xyxy = np.array([[10 + 40 * i, 10, 40 + 40 * i, 80] for i in range(count)], dtype=np.float32)
+
+    def __len__(self):
+        return len(self.cls)
+
+
+class _Result:
+    def __init__(self, count):
+        self.boxes = _Boxes(count)
+
+
+class CyclingModel:
+    """Stands in for YOLO: the n-th frame it sees has ``n % 4`` people."""
+
+    def __init__(self):
+        self.calls = 0
+
+    def __call__(self, frames, **kwargs):
+        results = []
+        for _ in frames:
+            results.append(_Result(self.calls % 4))
+            self.calls += 1
+        return results
+
+
+def _rows(path):
+    with open(path, newline="", encoding="utf-8") as f:
+        return list(csv.DictReader(f))
+
+
+@pytest.fixture(scope="module")
+def clip(tmp_path_factory):
+    return write_synthetic_video(tmp_path_factory.mktemp("clip") / "clip.mp4", seconds=12, fps=10.0, size=(160, 96))
+
+
+def test_recount_reproduces_plain_run(clip, tmp_path):
+    live = detect_people_in_video(
+        clip, tmp_path / "live.csv", CyclingModel(), resize=(160, 96), detections_path=tmp_path / "d.npz"
+    )
+    recounted = recount_people_csv(tmp_path / "d.npz", tmp_path / "recount.csv", video_name="clip")
+    assert _rows(recounted) == _rows(live)
+
+
+def test_recount_holds_count_over_gated_samples(clip, tmp_path):
+    # A threshold no frame reaches: YOLO only runs when the reuse limit forces it.
+    gate = MotionGate(motion_threshold=2.0, max_reuse_seconds=3)
+    live = detect_people_in_video(
+        clip,
+        tmp_path / "live.csv",
+        CyclingModel(),
+        resize=(160, 96),
+        detections_path=tmp_path / "d.npz",
+        motion_gate=gate,
+    )
+    assert gate.stats()["inferences_saved"] > 0
+
+    recounted = recount_people_csv(tmp_path / "d.npz", tmp_path / "recount.csv", video_name="clip")
+    live_rows = _rows(live)
+    assert {row["source"] for row in live_rows} == {"detected", "inferred"}
+    assert _rows(recounted) == live_rows
+
+
+def test_recount_skips_tracked_run(clip, tmp_path):
+    detections_dir = tmp_path / "detections"
+    people_dir = tmp_path / "people"
+    people_dir.mkdir()
+    live = detect_people_in_video(
+        clip,
+        people_dir / "clip_people.csv",
+        CyclingModel(),
+        resize=(160, 96),
+        detections_path=detections_npz_path(detections_dir, "clip"),
+        tracker=PeopleTracker(detect_every_seconds=5),
+    )
+    live_rows = _rows(live)
+
+    with pytest.raises(ValueError):
+        recount_people_csv(detections_npz_path(detections_dir, "clip"), tmp_path / "recount.csv")
+    assert recount_all(detections_dir, people_dir) == []
+    assert _rows(live) == live_rows
+    assert len(live_rows) >= 12 and "unique_tracks" in live_rows[0]
@@ -0,0 +1,31 @@
+import csv
+
+import pytest
+
+from src.benchmarks.synthetic_video import write_synthetic_video
+from src.pipeline.sharded_analysis import analyze_video_sharded
+from src.preprocessing.motion_analysis import analyze_motion_in_video
+
+# Same drift allowance as src/benchmarks/sharding_parity.py.
+MOTION_TOLERANCE = 0.005
+
+
+def _read_motion(path):
+    with open(path, newline="", encoding="utf-8") as f:
+        return [(int(r["frame"]), int(r["second"]), float(r["motion_ratio"])) for r in csv.DictReader(f)]
+
+
+@pytest.fixture(scope="module")
+def clip(tmp_path_factory):
+    return write_synthetic_video(tmp_path_factory.mktemp("clip") / "clip.mp4", seconds=40)
+
+
+def test_sharded_motion_matches_single_pass(clip, tmp_path):
+    single_csv = analyze_motion_in_video(clip, tmp_path / "single.csv")
+    result = analyze_video_sharded(clip, motion_csv=tmp_path / "sharded.csv", shards=2)
+    assert result["shards"] == 2
+
+    single = _read_motion(single_csv)
+    sharded = _read_motion(result["motion_csv"])
+    assert [row[:2] for row in sharded] == [row[:2] for row in single]
+    assert max(abs(a[2] - b[2]) for a, b in zip(single, sharded)) <= MOTION_TOLERANCE